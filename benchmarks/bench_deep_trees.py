@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+# Rune tree walker benchmark
+# Copyright 2024-2025 HyperifyIO <info@hyperify.io>
+"""Benchmark the explicit-stack tree walkers on deep and large documents.
+
+Runs `parse_html_element`, `embed_images` and `transform_tsx_node` on a
+deeply nested document (default 10k levels) and on a large, shallow
+document (default 1M nodes), and compares them with the recursive
+implementations they replaced.
+
+The original recursive HTML walker neither interned names nor parsed
+JSON class lists, so `parse_html_element` is also compared with a
+recursive walk that converts each element with the same
+`convert_html_element`. That comparison isolates the cost of the
+explicit stack. The remaining per-element difference from the original
+walker is the cost of interning.
+
+Usage:
+
+    python3 benchmarks/bench_deep_trees.py [--depth N] [--nodes N]
+"""
+
+import argparse
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+from bs4 import BeautifulSoup
+
+from hyperify_rune import convert_html_element, embed_images, parse_html_element, transform_tsx_node
+
+
+# Recursive reference implementations, as they were before the rewrite. The
+# original error handler formatted str(element) at every level, which exhausts
+# memory on deep failures, so only the tag name is reported here.
+
+def recursive_parse_html_element(element):
+    try:
+        if isinstance(element, str):
+            text = element.strip()
+            return text if text else None
+        result = {"type": element.name}
+        for attr, value in element.attrs.items():
+            if attr == 'class':
+                result['classes'] = value.split() if isinstance(value, str) else value
+            elif attr == 'onClick':
+                try:
+                    result['onClick'] = json.loads(value)
+                except json.JSONDecodeError:
+                    result['onClick'] = value
+            else:
+                result[attr] = value
+        children = []
+        for child in element.contents:
+            if isinstance(child, str):
+                text = child.strip()
+                if text:
+                    children.append(text)
+            else:
+                parsed_child = recursive_parse_html_element(child)
+                if parsed_child:
+                    children.append(parsed_child)
+        if children:
+            result["body"] = children
+        return result
+    except Exception as e:
+        raise ValueError(f"Error parsing HTML element: {element.name}. Error: {e}") from e
+
+
+def recursive_convert_html_element(element):
+    result = convert_html_element(element, None, None, False, None)
+    children = []
+    for child in element.contents:
+        if isinstance(child, str):
+            text = child.strip()
+            if text:
+                children.append(text)
+        else:
+            children.append(recursive_convert_html_element(child))
+    if children:
+        result["body"] = children
+    return result
+
+
+def recursive_embed_images(data):
+    def embed_image_property(item):
+        for key, value in item.items():
+            if isinstance(value, dict):
+                embed_image_property(value)
+            elif isinstance(value, list):
+                for sub_item in value:
+                    if isinstance(sub_item, dict):
+                        embed_image_property(sub_item)
+            elif (key == 'image' or key.endswith('Image') or key.startswith('Image') or key == 'src') and isinstance(value, str) and (not value.startswith('Component.Param.')):
+                raise AssertionError("benchmark data has no assets")
+
+    for obj in data:
+        embed_image_property(obj)
+    return data
+
+
+def recursive_transform_tsx_node(node):
+    if node.type == "JSXElement":
+        opening_tag = recursive_transform_tsx_node(node.openingElement)
+        children = "".join(recursive_transform_tsx_node(child) for child in node.children)
+        closing_tag = recursive_transform_tsx_node(node.closingElement)
+        return f"{opening_tag}{children}{closing_tag}"
+    elif node.type == "JSXOpeningElement":
+        return f"<{node.name.name} >"
+    elif node.type == "JSXClosingElement":
+        return f"</{node.name.name}>"
+    return node.value.strip()
+
+
+# Document generators
+
+def deep_html(depth: int) -> str:
+    return "<root>" + '<div class="level">' * depth + "leaf" + "</div>" * depth + "</root>"
+
+
+def wide_html(nodes: int) -> str:
+    # Sections of 100 paragraphs; each paragraph is an element plus a text node
+    sections = max(1, nodes // 200)
+    section = '<section class="s">' + '<p class="x">text</p>' * 100 + "</section>"
+    return "<root><div>" + section * sections + "</div></root>"
+
+
+def deep_data(depth: int):
+    node = {"type": "span", "body": ["leaf"]}
+    for _ in range(depth):
+        node = {"type": "div", "classes": ["level"], "body": [node]}
+    return [node]
+
+
+def wide_data(nodes: int):
+    sections = max(1, nodes // 200)
+    return [{
+        "type": "div",
+        "body": [
+            {"type": "section", "body": [{"type": "p", "classes": ["x"], "body": ["text"]} for _ in range(100)]}
+            for _ in range(sections)
+        ],
+    }]
+
+
+def _jsx_element(children):
+    name = SimpleNamespace(type="JSXIdentifier", name="div")
+    return SimpleNamespace(
+        type="JSXElement",
+        openingElement=SimpleNamespace(type="JSXOpeningElement", name=name, attributes=[]),
+        children=children,
+        closingElement=SimpleNamespace(type="JSXClosingElement", name=name),
+    )
+
+
+def deep_jsx(depth: int):
+    node = SimpleNamespace(type="JSXText", value="leaf")
+    for _ in range(depth):
+        node = _jsx_element([node])
+    return node
+
+
+def wide_jsx(nodes: int):
+    sections = max(1, nodes // 200)
+    return _jsx_element([
+        _jsx_element([_jsx_element([SimpleNamespace(type="JSXText", value="text")]) for _ in range(100)])
+        for _ in range(sections)
+    ])
+
+
+def timed(label: str, func, *args) -> None:
+    start = time.perf_counter()
+    try:
+        func(*args)
+    except (RecursionError, ValueError) as exc:
+        if not isinstance(exc, RecursionError) and not isinstance(exc.__cause__, (RecursionError, ValueError)):
+            raise
+        print(f"  {label:<12} RecursionError")
+        return
+    print(f"  {label:<12} {time.perf_counter() - start:8.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Rune tree walkers on deep and large trees.")
+    parser.add_argument("--depth", type=int, default=10_000, help="Nesting depth of the deep documents.")
+    parser.add_argument("--nodes", type=int, default=1_000_000, help="Approximate node count of the large documents.")
+    args = parser.parse_args()
+
+    print(f"Python recursion limit: {sys.getrecursionlimit()}")
+
+    for label, html in ((f"{args.depth}-deep", deep_html(args.depth)), (f"{args.nodes}-node", wide_html(args.nodes))):
+        root = BeautifulSoup(html, "lxml-xml").root.div
+        print(f"parse_html_element, {label} HTML")
+        timed("iterative", parse_html_element, root)
+        timed("recursive", recursive_convert_html_element, root)
+        timed("original", recursive_parse_html_element, root)
+        del root
+
+    for label, data in ((f"{args.depth}-deep", deep_data(args.depth)), (f"{args.nodes}-node", wide_data(args.nodes))):
+        print(f"embed_images, {label} data")
+        timed("iterative", embed_images, data, ".", "benchmark")
+        timed("recursive", recursive_embed_images, data)
+
+    for label, ast in ((f"{args.depth}-deep", deep_jsx(args.depth)), (f"{args.nodes}-node", wide_jsx(args.nodes))):
+        print(f"transform_tsx_node, {label} AST")
+        timed("iterative", transform_tsx_node, ast)
+        timed("recursive", recursive_transform_tsx_node, ast)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+# Rune parse memory benchmark
+# Copyright 2024-2025 HyperifyIO <info@hyperify.io>
+"""Compare peak memory of dictionary and compact `Node` parse results.
+
+Writes a synthetic corpus of HTML files (default about 1M nodes) and parses
+it with `merge_html_files` in a fresh subprocess for each mode, so that the
+peak RSS of one mode does not hide the other. The time to convert the
+compact tree to dictionaries with `to_plain` is reported separately, since
+the output writers convert one node at a time instead.
+
+Usage:
+
+    python3 benchmarks/bench_node_memory.py [--nodes N] [--files N]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def write_corpus(directory: str, nodes: int, files: int) -> list:
+    # Each card is a div, an h2, a p and two text nodes
+    cards_per_file = max(1, nodes // (5 * files))
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"View{i}.html")
+        with open(path, "w") as f:
+            f.write(f'<View name="View{i}">')
+            for j in range(cards_per_file):
+                f.write(
+                    f'<div class="card card-body shadow" id="card{j}">'
+                    f'<h2 class="card-title">view{i}.card{j}.title</h2>'
+                    f'<p class="card-text">view{i}.card{j}.content</p>'
+                    "</div>"
+                )
+            f.write("</View>")
+        paths.append(path)
+    return paths
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(mode: str, paths: list) -> None:
+    from hyperify_rune import merge_html_files
+    from hyperify_rune.nodes import to_plain
+
+    baseline = peak_rss_mib()
+    start = time.perf_counter()
+    data = merge_html_files(paths, compact=(mode == "compact"))
+    elapsed = time.perf_counter() - start
+    # Parsing peaks while the BeautifulSoup tree of the last file is alive;
+    # drop it so the second reading shows what the parse result retains
+    import gc
+    gc.collect()
+    print(f"  {mode:<8} parse {elapsed:6.2f} s   peak RSS {peak_rss_mib():8.1f} MiB  (after import {baseline:.1f} MiB)")
+    if mode == "compact":
+        start = time.perf_counter()
+        to_plain(data)
+        print(f"  {'':<8} to_plain {time.perf_counter() - start:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory use of parsed Rune trees.")
+    parser.add_argument("--nodes", type=int, default=1_000_000, help="Approximate node count of the corpus.")
+    parser.add_argument("--files", type=int, default=200, help="Number of HTML files in the corpus.")
+    parser.add_argument("--measure", choices=("dict", "compact"), help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.paths)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = write_corpus(tmpdir, args.nodes, args.files)
+        print(f"{args.nodes} nodes in {len(paths)} files")
+        for mode in ("dict", "compact"):
+            subprocess.run([sys.executable, __file__, "--measure", mode, *paths], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+# Rune pipelined I/O benchmark
+# Copyright 2024-2025 HyperifyIO <info@hyperify.io>
+"""Compare sequential and pipelined builds on slow storage.
+
+Writes a synthetic corpus of HTML files which each reference an image, and
+builds it with `process_files` while every file read sleeps for ``--latency``
+milliseconds, as on a network file system. With ``--io-workers 0`` each read
+waits on the main thread; with worker threads the reads of the next files
+overlap with parsing, and output is written on a background thread.
+
+Usage:
+
+    python3 benchmarks/bench_pipeline_io.py [--files N] [--latency MS] [--workers N]
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+
+def write_corpus(directory: str, files: int) -> None:
+    images = os.path.join(directory, "images")
+    os.makedirs(images)
+    for i in range(files):
+        with open(os.path.join(images, f"image{i}.png"), "wb") as f:
+            f.write(os.urandom(2048))
+        with open(os.path.join(directory, f"View{i}.html"), "w") as f:
+            f.write(f'<View name="View{i}"><img src="images/image{i}.png"/>')
+            for j in range(50):
+                f.write(f'<div class="card"><h2>view{i}.card{j}.title</h2><p>view{i}.card{j}.text</p></div>')
+            f.write("</View>")
+
+
+def build(directory: str, workers: int, latency: float) -> float:
+    from hyperify_rune import pipeline, process_files
+    from hyperify_rune.config import config as rune_config
+
+    read_file = pipeline._read_file
+
+    def slow_read_file(path):
+        time.sleep(latency)
+        return read_file(path)
+
+    rune_config.ioWorkers = workers
+    start = time.perf_counter()
+    with patch.object(pipeline, "_read_file", slow_read_file), redirect_stdout(io.StringIO()):
+        process_files(directory, "json", os.path.join(directory, "translations"))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipelined reading on slow storage.")
+    parser.add_argument("--files", type=int, default=200, help="Number of HTML files in the corpus.")
+    parser.add_argument("--latency", type=float, default=5.0, help="Simulated latency of each file read in milliseconds.")
+    parser.add_argument("--workers", type=int, default=8, help="I/O worker threads of the pipelined build.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_corpus(tmpdir, args.files)
+        print(f"{args.files} files and {args.files} images, {args.latency:g} ms per read")
+        with patch.object(sys, "stderr", io.StringIO()):
+            sequential = build(tmpdir, 0, args.latency / 1000)
+            pipelined = build(tmpdir, args.workers, args.latency / 1000)
+        print(f"  sequential           {sequential:6.2f} s")
+        print(f"  pipelined ({args.workers} workers) {pipelined:6.2f} s  ({sequential / pipelined:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# Rune YAML loading benchmark
+# Copyright 2024-2025 HyperifyIO <info@hyperify.io>
+"""Compare the YAML loading paths on the given files.
+
+For each file, measures:
+
+- ``safe_load``: the pure-Python ``yaml.safe_load`` Rune used before
+- ``CSafeLoader``: the libyaml loader (when PyYAML was built with it)
+
+Parsed files are cached across builds by ``--cache-dir``; see
+`hyperify_rune.cache`.
+
+When no files are given, the largest ``*.yml`` files under the current
+directory are used, and a synthetic document is generated if there are none.
+
+Usage:
+
+    python3 benchmarks/bench_yaml_loading.py [FILE ...] [--repeat N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import yaml
+
+from hyperify_rune.yaml_loader import load_yaml_file
+
+
+def find_largest_yaml_files(base_dir: str, count: int = 5):
+    files = []
+    for root, dirs, names in os.walk(base_dir):
+        # Skip .git, .github and other tool directories
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        files.extend(os.path.join(root, name) for name in names if name.endswith(".yml"))
+    return sorted(files, key=os.path.getsize, reverse=True)[:count]
+
+
+def write_synthetic_yaml(path: str, views: int = 200) -> None:
+    with open(path, "w") as f:
+        for i in range(views):
+            f.write(f"- type: View\n  name: View{i}\n  body:\n")
+            for j in range(20):
+                f.write(
+                    f"  - type: div\n    classes:\n    - card\n    - card-{j}\n    body:\n"
+                    f"    - type: h2\n      body:\n      - view{i}.card{j}.title\n"
+                    f"    - type: p\n      body:\n      - view{i}.card{j}.content\n"
+                )
+
+
+def best_of(repeat: int, func, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def pure_python_load(path: str):
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=yaml.SafeLoader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Rune YAML loading paths.")
+    parser.add_argument("files", nargs="*", help="YAML files to load.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the best is reported.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = args.files or find_largest_yaml_files(".")
+        if not files:
+            synthetic = os.path.join(tmpdir, "synthetic.yml")
+            write_synthetic_yaml(synthetic)
+            files = [synthetic]
+
+        print(f"libyaml available: {getattr(yaml, '__with_libyaml__', False)}")
+        for path in files:
+            size_kb = os.path.getsize(path) / 1024
+            print(f"{path} ({size_kb:.0f} KiB)")
+
+            pure = best_of(args.repeat, pure_python_load, path)
+            print(f"  {'safe_load':<12} {pure * 1000:10.2f} ms")
+
+            if getattr(yaml, "__with_libyaml__", False):
+                fast = best_of(args.repeat, load_yaml_file, path)
+                print(f"  {'CSafeLoader':<12} {fast * 1000:10.2f} ms  ({pure / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,33 @@
 # Rune Preprocessor
 # Copyright 2024-2025 HyperifyIO <info@hyperify.io>
 
+import io
 import os
+import hashlib
+import shutil
 import sys
-import yaml
 import base64
 import argparse
 import json
-from typing import List, Dict, Any
+import mimetypes
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from collections import defaultdict
-from bs4 import BeautifulSoup
-import mistune
-import esprima
+from itertools import chain
+from contextlib import nullcontext
+# bs4, mistune and esprima are imported on first use: they take most of the
+# import time, which a CLI handing its build to `rune daemon` does not need
+from .config import config as rune_config
+from .asset_optimizer import optimize_asset, is_optimizable
+from .asset_rules import AssetKeyMatcher, compile_asset_key_rules, is_asset_path
+from .yaml_loader import load_yaml, load_yaml_file
+from .assets import DeferredAsset
+from .output import EncodedItems, ListWriter, spooled_output, write_output
+from .dedupe import HashConsTable, to_shared_output
+from .nodes import Node, intern_tuple, to_plain
+from .cache import ArtifactCache, record_dependencies, record_dependency
+from .components import ComponentExpander
+from .prerender import TranslationLookup, prerender, report_missing_translations
+from .pipeline import BackgroundWriter, Prefetcher, read_asset_bytes, using_prefetched_assets
 
 
 # Load the translation file
@@ -26,18 +42,97 @@ def translate(key, translations):
     return translations.get(key, f"[{key} not found]")
 
 
+def get_artifact_cache() -> Optional[ArtifactCache]:
+    """
+    Returns the artifact cache configured with rune_config.cacheDir. Without a cache directory,
+    returns the cache set with use_memory_cache, or None when caching is disabled.
+    """
+    if not rune_config.cacheDir:
+        return _memory_cache
+    key = (rune_config.cacheDir, rune_config.cacheMaxSize)
+    cache = _artifact_caches.get(key)
+    if cache is None:
+        cache = _artifact_caches[key] = ArtifactCache(rune_config.cacheDir, rune_config.cacheMaxSize)
+    return cache
+
+
+_artifact_caches: Dict[Any, ArtifactCache] = {}
+_memory_cache: Optional[ArtifactCache] = None
+
+
+def use_memory_cache(cache: Optional[ArtifactCache]) -> None:
+    """
+    Sets the cache used by builds without a cache directory, e.g. the MemoryArtifactCache
+    of a build daemon, which keeps it between builds. None disables it again.
+    """
+    global _memory_cache
+    _memory_cache = cache
+
+
+def read_source_text(file: str, content: Optional[bytes] = None) -> str:
+    """
+    Returns the text of a source file. When content was already read (see hyperify_rune.pipeline),
+    it is decoded the same way as when the file is opened in text mode.
+    """
+    if content is None:
+        with open(file, 'r') as f:
+            return f.read()
+    return io.TextIOWrapper(io.BytesIO(content)).read()
+
+
+def source_cache_key(cache: ArtifactCache, parse, file: str, args: tuple, content: Optional[bytes] = None) -> str:
+    """
+    Returns the cache key of parse(file, *args): the file path and content and the options affecting parsing.
+    """
+    digest = hashlib.sha256(content).hexdigest() if content is not None else cache.file_digest(file)
+    return cache.key(
+        "parse", parse.__name__, file, digest, args,
+        rune_config.assetKeyRules, rune_config.optimizeAssets, rune_config.deferAssets,
+    )
+
+
+def parse_source_file(parse, file: str, *args, content: Optional[bytes] = None):
+    """
+    Calls parse(file, *args, content=content), reusing the result from the artifact cache when one
+    is configured. Cached results are keyed by the file path and content and the options affecting
+    parsing, and are only used while the asset files they embed are unchanged.
+    """
+    cache = get_artifact_cache()
+    if cache is None:
+        return parse(file, *args, content=content)
+
+    key = source_cache_key(cache, parse, file, args, content)
+    entry = cache.get("parse", key)
+    if entry is not None:
+        dependencies, data = entry
+        if cache.dependencies_valid(dependencies):
+            for path, _ in dependencies:
+                record_dependency(path)
+            return data
+
+    with record_dependencies() as dependencies:
+        data = parse(file, *args, content=content)
+    cache.put("parse", key, (cache.digest_dependencies(dependencies), data))
+    return data
+
+
+def parse_yaml_file(file: str, content: Optional[bytes] = None) -> List[Dict[str, Any]]:
+    file_dir = os.path.dirname(file)
+    data = load_yaml_file(file) if content is None else load_yaml(content, file)
+    if isinstance(data, list):
+        return embed_images(data, file_dir, file)
+    raise ValueError(f"YAML file {file} does not contain a list at the root level.")
+
+
 # Merge YAML files to single list
-def merge_yaml_files(yaml_files: List[str]) -> List[Dict[str, Any]]:
+# When sources is given, the source file of each item is appended to it
+def merge_yaml_files(yaml_files: List[str], sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     merged_data = []
     for file in yaml_files:
-        file_dir = os.path.dirname(file)
-        with open(file, 'r') as f:
-            data = yaml.safe_load(f)
-            if isinstance(data, list):
-                data = embed_images(data, file_dir, file)
-                merged_data.extend(data)
-            else:
-                raise ValueError(f"YAML file {file} does not contain a list at the root level.")
+        data = parse_source_file(parse_yaml_file, file)
+        merged_data.extend(data)
+        if sources is not None:
+            sources.extend([file] * len(data))
     return merged_data
 
 # Merge JSON files to single list
@@ -53,35 +148,108 @@ def merge_json_files(yaml_files: List[str]) -> List[Dict[str, Any]]:
     return merged_data
 
 
+def get_asset_key_matcher() -> AssetKeyMatcher:
+    """
+    Returns the compiled matcher for the asset key rules in the current configuration.
+    """
+    return compile_asset_key_rules(tuple(rune_config.assetKeyRules))
+
+
+def is_asset_reference(matcher: AssetKeyMatcher, node_type: Any, key: str, value: Any) -> bool:
+    """
+    Checks if a property value should be resolved as an asset file reference.
+    """
+    return (
+        isinstance(value, str)
+        and matcher.matches(node_type if isinstance(node_type, str) else None, key)
+        and is_asset_path(value)
+    )
+
+
 # Embed images mentioned in the YAML
-def embed_images(data: List[Dict[str, Any]], base_dir: str, source_file: str) -> List[Dict[str, Any]]:
-    def embed_image_property(item: Dict[str, Any]):
+def embed_images(data: List[Dict[str, Any]], base_dir: str, source_file: str, matcher: Optional[AssetKeyMatcher] = None) -> List[Dict[str, Any]]:
+    if matcher is None:
+        matcher = get_asset_key_matcher()
+
+    # Walk with an explicit stack instead of recursion, so deeply nested
+    # documents do not hit the recursion limit. Lists are pushed as a whole and
+    # anything that is not a dictionary is skipped when popped.
+    stack = list(data)
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, dict):
+            continue
+        node_type = item.get('type')
         for key, value in item.items():
             if isinstance(value, dict):
-                embed_image_property(value)
+                stack.append(value)
             elif isinstance(value, list):
-                for sub_item in value:
-                    if isinstance(sub_item, dict):
-                        embed_image_property(sub_item)
-            elif (key == 'image' or key.endswith('Image') or key.startswith('Image') or key == 'src') and isinstance(value, str) and (not value.startswith('Component.Param.')):
-                image_path = os.path.join(base_dir, value)
-                if os.path.isfile(image_path):
-                    with open(image_path, 'rb') as image_file:
-                        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                        mime_type = get_data_url_mime_type(os.path.splitext(image_path)[1][1:])
-                        data_url = f"data:{mime_type};base64,{encoded_string}"
-                        item[key] = data_url
-                else:
-                    raise FileNotFoundError(f"Image file not found (from '{source_file}'): {value}")
-
-    for obj in data:
-        embed_image_property(obj)
+                stack.extend(value)
+            elif is_asset_reference(matcher, node_type, key, value):
+                item[key] = load_asset_data_url(value, base_dir, source_file)
 
     return data
 
+
+def load_asset_data_url(value: str, base_dir: str, source_file: str) -> Union[str, DeferredAsset]:
+    """
+    Read an asset referenced from a source file and encode it as a data URL.
+    In deferred mode the file is not read; a DeferredAsset placeholder is returned
+    and the output writer streams the data URL from disk instead.
+    :param value: Asset path relative to base_dir.
+    :param base_dir: Directory of the file referencing the asset.
+    :param source_file: The referencing file, used in error messages.
+    :return: A base64 data URL with the asset content, or a DeferredAsset.
+    """
+    image_path = os.path.join(base_dir, value)
+    if not os.path.isfile(image_path):
+        raise FileNotFoundError(f"Image file not found (from '{source_file}'): {value}")
+
+    record_dependency(image_path)
+    extension = os.path.splitext(image_path)[1][1:]
+    mime_type = get_data_url_mime_type(extension)
+    optimize = rune_config.optimizeAssets and is_optimizable(extension)
+    if rune_config.deferAssets and not optimize:
+        return DeferredAsset(image_path, mime_type)
+
+    image_bytes = read_asset_bytes(image_path)
+    if optimize:
+        image_bytes = optimize_and_report(image_bytes, extension, image_path, get_artifact_cache())
+    encoded_string = base64.b64encode(image_bytes).decode('utf-8')
+    return f"data:{mime_type};base64,{encoded_string}"
+
+
+def optimize_and_report(data: bytes, extension: str, path: str, cache: Optional[ArtifactCache] = None) -> bytes:
+    """
+    Optimize asset bytes and log the byte savings to stderr.
+    :param data: Original file content.
+    :param extension: File extension without the leading dot.
+    :param path: Path of the asset, used in the log message.
+    :param cache: Artifact cache to reuse optimized bytes from, if any.
+    :return: Optimized bytes, or the original bytes if nothing was saved.
+    """
+    if cache is not None:
+        key = cache.key("asset", extension.lower(), hashlib.sha256(data).digest())
+        optimized = cache.get_bytes("assets", key)
+        if optimized is None:
+            # Kept in the artifact cache only, not in the optimizer's own cache as well
+            optimized = optimize_asset(data, extension, cache=False)
+            cache.put_bytes("assets", key, optimized)
+    else:
+        optimized = optimize_asset(data, extension)
+    saved = len(data) - len(optimized)
+    percent = (saved / len(data) * 100) if data else 0.0
+    print(f"Optimized asset '{path}': {len(data)} -> {len(optimized)} bytes (saved {saved} bytes, {percent:.1f}%)", file=sys.stderr)
+    return optimized
+
+
 def get_data_url_mime_type (type: str) -> str:
     if type.startswith("svg"):
         return "image/svg+xml"
+    # Other files, such as downloads linked with a.href, keep their own type
+    guessed, _ = mimetypes.guess_type("asset." + type)
+    if guessed is not None and not guessed.startswith("image/"):
+        return guessed
     return "image/" + type
 
 
@@ -95,7 +263,8 @@ def get_all_translations(language_dir: str) -> Dict[str, Dict[str, Any]]:
     translations_by_language = defaultdict(dict)
 
     # Loop through all files in the language directory
-    for file in os.listdir(language_dir):
+    # Sorted, so that later files override earlier ones in the same order everywhere
+    for file in sorted(os.listdir(language_dir)):
         if file.endswith(".json"):
             file_parts = file.rsplit('.', 3)
             if len(file_parts) >= 3:
@@ -115,104 +284,203 @@ def get_all_translations(language_dir: str) -> Dict[str, Dict[str, Any]]:
     if not translations_by_language:
         print(f"No .json translation files found in the language directory: {language_dir}", file=sys.stderr)
 
-    return translations_by_language
+    return dict(translations_by_language)
+
+
+def html_element_to_node(element, base_dir: Optional[str] = None, source_file: Optional[str] = None, compact: bool = False, matcher: Optional[AssetKeyMatcher] = None) -> Union[Dict[str, Any], Node]:
+    """
+    Converts a single HTML element and its attributes into a dictionary, without children.
+    Tag names, attribute names and class names are interned, so repeated names share one string.
+    :param element: A BeautifulSoup Tag.
+    :param base_dir: When set, asset references in attributes are embedded relative to this directory.
+    :param source_file: The file being parsed, used in error messages.
+    :param compact: If True, returns a Node instead of a dictionary.
+    :param matcher: Asset key rules; compiled from the configuration when not given.
+    :return: A dictionary (or Node) with the element type and attributes.
+    """
+    if not hasattr(element, 'name'):  # Handle cases where element has no tag name
+        raise ValueError("Invalid HTML element: Missing 'name' attribute.")
+
+    if base_dir is None:
+        matcher = None
+    elif matcher is None:
+        matcher = get_asset_key_matcher()
+    return convert_html_element(element, base_dir, source_file, compact, matcher)
 
 
-def parse_html_element(element):
+def convert_html_element(element, base_dir: Optional[str], source_file: Optional[str], compact: bool, matcher: Optional[AssetKeyMatcher]) -> Union[Dict[str, Any], Node]:
+    """
+    Converts a BeautifulSoup Tag as html_element_to_node does, without checking the arguments.
+    The matcher must be None when base_dir is None. Called once per element by parse_html_element.
     """
-    Recursively parses an HTML element into a structured dictionary.
+    intern = sys.intern
+    name = intern(element.name)
+    element_attrs = element.attrs
+    if not element_attrs:
+        return Node(name, ()) if compact else {"type": name}
+
+    # Attributes are collected in the result dictionary, or in a dictionary of their own for a Node
+    result = {} if compact else {"type": name}
+    for attr, value in element_attrs.items():
+        if attr == 'class':
+            if isinstance(value, str) and not (value.startswith('[') and value.endswith(']')):
+                classes = list(map(intern, value.split()))
+            else:
+                if isinstance(value, str):
+                    value = json.loads(value)
+                elif not isinstance(value, list):
+                    continue
+                classes = [intern(token) if isinstance(token, str) else token for token in value]
+            if compact:
+                try:
+                    classes = intern_tuple(tuple(classes))
+                except TypeError:
+                    # Unhashable class values from a JSON list are kept as a list
+                    pass
+            result['classes'] = classes
+        elif attr == 'onClick':
+            # Assuming onClick attribute contains JSON string
+            try:
+                on_click = json.loads(value)
+            except json.JSONDecodeError:
+                on_click = value
+            else:
+                if matcher is not None and isinstance(on_click, (dict, list)):
+                    embed_images(on_click if isinstance(on_click, list) else [on_click], base_dir, source_file, matcher)
+            result['onClick'] = on_click
+        elif matcher is not None and is_asset_reference(matcher, name, attr, value):
+            result[intern(attr)] = load_asset_data_url(value, base_dir, source_file)
+        else:
+            result[intern(attr)] = value
+
+    if compact:
+        return Node(name, tuple(chain.from_iterable(result.items())))
+    return result
+
+
+def describe_html_element(element) -> str:
+    """
+    Describes an element by its opening tag only, for use in error messages.
+    """
+    name = getattr(element, 'name', None)
+    if not name:
+        return repr(element)
+    attrs = "".join(f' {key}="{value}"' for key, value in (element.attrs or {}).items())
+    return f"<{name}{attrs}>"
+
+
+def parse_html_element(element, base_dir: Optional[str] = None, source_file: Optional[str] = None, compact: bool = False, matcher: Optional[AssetKeyMatcher] = None):
+    """
+    Parses an HTML element into a structured dictionary.
+    The tree is walked with an explicit stack, so documents of any depth can be parsed.
+    Asset references are embedded during the same pass when base_dir is given.
     :param element: A BeautifulSoup Tag or NavigableString.
-    :return: A dictionary representing the element or raw text if it's a string.
+    :param base_dir: Directory to resolve asset references against, or None to leave them as-is.
+    :param source_file: The file being parsed, used in error messages.
+    :param compact: If True, elements are returned as Node objects instead of dictionaries.
+    :param matcher: Asset key rules; compiled from the configuration when not given.
+    :return: A dictionary (or Node) representing the element or raw text if it's a string.
     """
+    if isinstance(element, str):  # Handle plain strings
+        text = element.strip()
+        return text if text else None
+    if base_dir is not None and matcher is None:
+        matcher = get_asset_key_matcher()
+
+    current = element
     try:
-        if isinstance(element, str):  # Handle plain strings
-            text = element.strip()
-            return text if text else None
-
-        if not hasattr(element, 'name'):  # Handle cases where element has no tag name
-            raise ValueError("Invalid HTML element: Missing 'name' attribute.")
-
-        result = {"type": element.name}
-
-        # Handle attributes
-        if element.attrs:
-            for attr, value in element.attrs.items():
-                if attr == 'class':
-                    if isinstance(value, list):
-                        result['classes'] = value
-                    elif isinstance(value, str):
-                        if value.startswith('[') and value.endswith(']'):
-                            result['classes'] = json.loads(value)
-                        else:
-                            result['classes'] = value.split()
-                elif attr == 'onClick':
-                    # Assuming onClick attribute contains JSON string
-                    try:
-                        result['onClick'] = json.loads(value)
-                    except json.JSONDecodeError:
-                        result['onClick'] = value
+        result = html_element_to_node(element, base_dir, source_file, compact, matcher)
+        if base_dir is None:
+            matcher = None
+        stack = [(element, result)]
+        push = stack.append
+        pop = stack.pop
+        while stack:
+            parent, node = pop()
+
+            # Handle children. Tags are the only children that are not strings.
+            children = []
+            for child in parent.contents:
+                if isinstance(child, str):
+                    text = child.strip()
+                    if text:
+                        children.append(text)
                 else:
-                    result[attr] = value
-
-        # Handle children
-        children = []
-        for child in element.contents:
-            if isinstance(child, str):
-                text = child.strip()
-                if text:
-                    children.append(text)
-            else:
-                parsed_child = parse_html_element(child)
-                if parsed_child:
-                    children.append(parsed_child)
-
-        if children:
-            result["body"] = children
+                    current = child
+                    child_node = convert_html_element(child, base_dir, source_file, compact, matcher)
+                    children.append(child_node)
+                    if child.contents:
+                        push((child, child_node))
+
+            if children:
+                if compact:
+                    node.body = tuple(children)
+                else:
+                    node["body"] = children
 
         return result
+    except FileNotFoundError:
+        raise
     except Exception as e:
-        raise ValueError(f"Error parsing HTML element: {element}. Error: {e}")
+        raise ValueError(f"Error parsing HTML element: {describe_html_element(current)}. Error: {e}")
 
 
-def html_to_data_structure(html_content):
+def make_soup(markup: str):
+    """
+    Parses markup with the lxml XML parser of BeautifulSoup.
+    """
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(markup, 'lxml-xml')
+
+
+def html_to_data_structure(html_content, base_dir: Optional[str] = None, source_file: Optional[str] = None, compact: bool = False):
     wrapped_html = f"<root>{html_content}</root>"
-    soup = BeautifulSoup(wrapped_html, 'lxml-xml')
+    soup = make_soup(wrapped_html)
     root_elements = soup.root.find_all(recursive=False)
-    data_structure = [parse_html_element(el) for el in root_elements]
+    matcher = get_asset_key_matcher() if base_dir is not None else None
+    data_structure = [parse_html_element(el, base_dir, source_file, compact, matcher) for el in root_elements]
+    # Free the parse tree now instead of waiting for the cycle collector
+    soup.decompose()
     return data_structure
 
 
-def merge_html_files(html_files: List[str]) -> List[Dict[str, Any]]:
+def parse_html_file(file: str, compact: bool = False, content: Optional[bytes] = None) -> List[Union[Dict[str, Any], Node]]:
+    file_dir = os.path.dirname(file)
+    html_content = read_source_text(file, content)
+    return html_to_data_structure(html_content, file_dir, file, compact)
+
+
+def merge_html_files(html_files: List[str], compact: bool = False, sources: Optional[List[str]] = None) -> List[Union[Dict[str, Any], Node]]:
     merged_data = []
     for file in html_files:
-        file_dir = os.path.dirname(file)
-        with open(file, 'r') as f:
-            html_content = f.read()
-            data = html_to_data_structure(html_content)
-            data = embed_images(data, file_dir, file)
-            merged_data.extend(data)
+        data = parse_source_file(parse_html_file, file, compact)
+        merged_data.extend(data)
+        if sources is not None:
+            sources.extend([file] * len(data))
     return merged_data
 
 
 def parse_markdown (text: str) -> str:
+    import mistune
     return mistune.html(text)
 
 
 # Parse Markdown file into data structure
-def markdown_to_data_structure(file_path: str, is_component: bool) -> Dict[str, Any]:
+def markdown_to_data_structure(file_path: str, is_component: bool, compact: bool = False, content: Optional[bytes] = None) -> Dict[str, Any]:
     """
     Converts Markdown content into structured data for Rune with enhanced error reporting.
     :param file_path: The path to the Markdown file.
     :param is_component: If True, treats the Markdown as a component.
-    :return: A structured dictionary for Rune.
+    :param compact: If True, the elements in the body are Node objects.
+    :param content: The file content, if already read.
+    :return: A structured dictionary for Rune, with asset references embedded.
     """
     try:
-        with open(file_path, 'r') as f:
-            markdown_content = f.read()
+        markdown_content = read_source_text(file_path, content)
 
         html_content = parse_markdown(markdown_content)
         wrapped_html = f"<root>{html_content}</root>"
-        soup = BeautifulSoup(wrapped_html, 'lxml-xml')
+        soup = make_soup(wrapped_html)
 
         # Extract the name from the file name
         file_name = os.path.basename(file_path)
@@ -225,7 +493,10 @@ def markdown_to_data_structure(file_path: str, is_component: bool) -> Dict[str,
         }
 
         root_elements = soup.root.find_all(recursive=False)
-        data_structure = [parse_html_element(el) for el in root_elements]
+        file_dir = os.path.dirname(file_path)
+        matcher = get_asset_key_matcher()
+        data_structure = [parse_html_element(el, file_dir, file_path, compact, matcher) for el in root_elements]
+        soup.decompose()
 
         for element in data_structure:
             if element:
@@ -237,16 +508,16 @@ def markdown_to_data_structure(file_path: str, is_component: bool) -> Dict[str,
 
 
 # Process Markdown files
-def merge_markdown_files(markdown_files: List[str]) -> List[Dict[str, Any]]:
+def merge_markdown_files(markdown_files: List[str], compact: bool = False, sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     merged_data = []
     has_errors = False
     for file in markdown_files:
         try:
-            file_dir = os.path.dirname(file)
             is_component = file.endswith(".Component.md")
-            data = markdown_to_data_structure(file, is_component)
-            data["body"] = embed_images(data["body"], file_dir, file)
+            data = parse_source_file(markdown_to_data_structure, file, is_component, compact)
             merged_data.append(data)
+            if sources is not None:
+                sources.append(file)
         except Exception as e:
             print(f"Error: Failed to process Markdown file '{file}': {e}", file=sys.stderr)
             has_errors = True
@@ -256,134 +527,151 @@ def merge_markdown_files(markdown_files: List[str]) -> List[Dict[str, Any]]:
 
 
 # Collect all files recursively from subdirectories
+# Directories and files are visited in sorted order, so the output does not depend on the file system
 def get_all_files_with_extension(base_dir: str, extension: str) -> List[str]:
-    return [
-        os.path.join(root, file)
-        for root, _, files in os.walk(base_dir)
-        for file in files if file.endswith(extension)
-    ]
+    result = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs.sort()
+        result.extend(os.path.join(root, file) for file in sorted(files) if file.endswith(extension))
+    return result
 
 
 def parse_tsx_to_html(tsx_code: str) -> str:
     """
     Parse TSX code into HTML. Elements that cannot be rendered directly are wrapped in HTML comments.
     """
+    import esprima
     ast = esprima.parseModule(tsx_code, jsx=True)
+    return transform_tsx_node(ast)
 
-    def transform_node(node):
-        if not node:
-            return ""
 
-        if node.type == "Program":
-            return "".join(transform_node(child) for child in node.body)
+def transform_tsx_node(root) -> str:
+    """
+    Transforms a TSX AST into HTML using an explicit stack, so ASTs of any depth can be rendered.
+    The stack holds AST nodes and literal HTML strings in reverse output order. Nodes are replaced
+    by their parts, and strings are appended to the output, so no intermediate strings are built.
+    Missing nodes render as an empty string.
+    """
+    out: List[str] = []
+    stack = [root]
+    push = stack.append
+    pop = stack.pop
+    emit = out.append
+    while stack:
+        node = pop()
+        if node.__class__ is str:
+            emit(node)
+            continue
+        if not node:
+            continue
 
-        elif node.type == "ExpressionStatement":
-            return transform_node(node.expression)
+        node_type = node.type
+        if node_type == "JSXText":
+            emit(node.value.strip())
 
-        elif node.type == "JSXElement":
-            opening_tag = transform_node(node.openingElement)
-            children = "".join(transform_node(child) for child in node.children)
-            closing_tag = transform_node(node.closingElement) if node.closingElement else ""
-            return f"{opening_tag}{children}{closing_tag}"
+        elif node_type == "JSXElement":
+            push(node.closingElement)
+            stack.extend(reversed(node.children))
+            push(node.openingElement)
 
-        elif node.type == "JSXOpeningElement":
-            attributes = " ".join(transform_node(attr) for attr in node.attributes)
+        elif node_type == "JSXOpeningElement":
             tag_name = node.name.name if node.name.type == "JSXIdentifier" else "unknown_JSXOpeningElement"
-            return f"<{tag_name} {attributes}>".strip()
+            attributes = node.attributes
+            if attributes:
+                push(">")
+                for index in range(len(attributes) - 1, 0, -1):
+                    push(attributes[index])
+                    push(" ")
+                push(attributes[0])
+                emit(f"<{tag_name} ")
+            else:
+                emit(f"<{tag_name} >")
 
-        elif node.type == "JSXClosingElement":
+        elif node_type == "JSXClosingElement":
             tag_name = node.name.name if node.name.type == "JSXIdentifier" else "unknown_JSXClosingElement"
-            return f"</{tag_name}>"
+            emit(f"</{tag_name}>")
+
+        elif node_type == "Program":
+            stack.extend(reversed(node.body))
 
-        elif node.type == "JSXText":
-            return node.value.strip()
+        elif node_type == "ExpressionStatement":
+            push(node.expression)
 
-        elif node.type == "Literal":
-            return str(node.value)
+        elif node_type == "Literal":
+            emit(str(node.value))
 
-        elif node.type == "JSXExpressionContainer":
-            expression = transform_node(node.expression)
-            return f"<!-- JSX Expression: {expression} -->"
+        elif node_type == "JSXExpressionContainer":
+            push(" -->")
+            push(node.expression)
+            emit("<!-- JSX Expression: ")
 
-        elif node.type == "JSXAttribute":
-            name = node.name.name
-            value = transform_node(node.value) if node.value else ""
-            return f"{name}={value}"
+        elif node_type == "JSXAttribute":
+            push(node.value)
+            emit(f"{node.name.name}=")
 
-        elif node.type == "JSXSpreadAttribute":
-            return "<!-- Spread attributes are not supported: {...props} -->"
+        elif node_type == "JSXSpreadAttribute":
+            emit("<!-- Spread attributes are not supported: {...props} -->")
 
-        elif node.type == "JSXFragment":
-            children = "".join(transform_node(child) for child in node.children)
-            return f"<!-- Fragment start -->{children}<!-- Fragment end -->"
+        elif node_type == "JSXFragment":
+            push("<!-- Fragment end -->")
+            stack.extend(reversed(node.children))
+            emit("<!-- Fragment start -->")
 
-        elif node.type == "Identifier":
-            return node.name
+        elif node_type == "Identifier":
+            emit(node.name)
 
-        elif node.type == "JSXIdentifier":
-            return node.name
+        elif node_type == "JSXIdentifier":
+            emit(node.name)
 
-        elif node.type == "BinaryExpression":
-            left = transform_node(node.left)
-            right = transform_node(node.right)
-            operator = node.operator
-            return f"({left} {operator} {right})"
+        elif node_type == "BinaryExpression":
+            push(")")
+            push(node.right)
+            push(f" {node.operator} ")
+            push(node.left)
+            emit("(")
 
-        elif node.type == "CallExpression":
-            callee = transform_node(node.callee)
-            args = ", ".join(transform_node(arg) for arg in node.arguments)
-            return f"<!-- Function call: {callee}({args}) -->"
+        elif node_type == "CallExpression":
+            push(") -->")
+            arguments = node.arguments
+            for index in range(len(arguments) - 1, -1, -1):
+                push(arguments[index])
+                if index:
+                    push(", ")
+            push("(")
+            push(node.callee)
+            emit("<!-- Function call: ")
 
-        elif node.type == "VariableDeclaration":
-            return "<!-- Variable declaration: Not rendered in HTML -->"
+        elif node_type == "VariableDeclaration":
+            emit("<!-- Variable declaration: Not rendered in HTML -->")
 
-        elif node.type == "FunctionDeclaration":
-            return "<!-- Function declaration: Not rendered in HTML -->"
+        elif node_type == "FunctionDeclaration":
+            emit("<!-- Function declaration: Not rendered in HTML -->")
 
-        elif node.type == "ImportDeclaration":
-            return f"<!-- Import: {transform_node(node.source)} -->"
+        elif node_type == "ImportDeclaration":
+            push(" -->")
+            push(node.source)
+            emit("<!-- Import: ")
 
         # Add more node types here as needed
         else:
-            return f"<!-- Unsupported node type: {node.type} -->"
+            emit(f"<!-- Unsupported node type: {node_type} -->")
+    return "".join(out)
 
-    return transform_node(ast)
 
-
-def merge_tsx_files(tsx_files: List[str]) -> List[Dict[str, Any]]:
+def merge_tsx_files(tsx_files: List[str], compact: bool = False, sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
     """
     Parse TSX files and convert them to a structured data format for components or views.
+    When compact is True, the elements in each body are Node objects.
+    When sources is given, the source file of each item is appended to it.
     """
     merged_data = []
     has_errors = False
     for file in tsx_files:
         try:
-            with open(file, 'r') as f:
-                tsx_code = f.read()
-                html_content = parse_tsx_to_html(tsx_code)
-                wrapped_html = f"<root>{html_content}</root>"
-                soup = BeautifulSoup(wrapped_html, 'lxml-xml')
-
-                # Extract the name from the file name
-                file_name = os.path.basename(file)
-                name = file_name.replace(".Component.tsx", "").replace(".tsx", "")
-                is_component = file_name.endswith(".Component.tsx")
-
-                result = {
-                    "type": "Component" if is_component else "View",
-                    "name": name,
-                    "body": []
-                }
-
-                # Parse the root elements
-                root_elements = soup.root.find_all(recursive=False)
-                data_structure = [parse_html_element(el) for el in root_elements]
-
-                for element in data_structure:
-                    if element:
-                        result["body"].append(element)
-
-                merged_data.append(result)
+            data = parse_source_file(parse_tsx_file, file, compact)
+            merged_data.append(data)
+            if sources is not None:
+                sources.append(file)
         except Exception as e:
             print(f"Error: Failed to process TSX file '{file}': {e}", file=sys.stderr)
             has_errors = True
@@ -392,6 +680,256 @@ def merge_tsx_files(tsx_files: List[str]) -> List[Dict[str, Any]]:
     return merged_data
 
 
+def parse_tsx_file(file: str, compact: bool = False, content: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Parse one TSX file into a Component or View.
+    """
+    tsx_code = read_source_text(file, content)
+    html_content = parse_tsx_to_html(tsx_code)
+    wrapped_html = f"<root>{html_content}</root>"
+    soup = make_soup(wrapped_html)
+
+    # Extract the name from the file name
+    file_name = os.path.basename(file)
+    name = file_name.replace(".Component.tsx", "").replace(".tsx", "")
+    is_component = file_name.endswith(".Component.tsx")
+
+    result = {
+        "type": "Component" if is_component else "View",
+        "name": name,
+        "body": []
+    }
+
+    # Parse the root elements
+    root_elements = soup.root.find_all(recursive=False)
+    data_structure = [parse_html_element(el, compact=compact) for el in root_elements]
+    soup.decompose()
+
+    for element in data_structure:
+        if element:
+            result["body"].append(element)
+
+    return result
+
+
+class SourceItems(list):
+    """
+    Parsed items of one source file, with the cache key and dependencies of their encoded form.
+    """
+
+    def __init__(self, items: List[Any], fragment_key: str, dependencies: List[Tuple[str, str]]) -> None:
+        super().__init__(items)
+        self.fragment_key = fragment_key
+        self.dependencies = dependencies
+
+
+def iter_source_items(yaml_files: List[str], html_files: List[str], markdown_files: List[str], tsx_files: List[str], compact: bool = False, output_type: Optional[str] = None) -> Iterator[Tuple[str, Union[List[Any], EncodedItems]]]:
+    """
+    Parses the source files in the order of the merge_* functions and yields (file, items) for each.
+    Files and the assets they reference are read ahead on rune_config.ioWorkers threads.
+    Errors are handled as in the merge_* functions: YAML and HTML errors are raised, while
+    Markdown and TSX errors are reported for every file before exiting.
+
+    When output_type is given and an artifact cache is configured, the items of a file whose
+    encoded items are cached are yielded as EncodedItems, without parsing the file. Other files
+    yield SourceItems, so that the writer can cache their encoded form (see write_streamed_bundle).
+    """
+    cache = get_artifact_cache()
+    if rune_config.deferAssets:
+        # Encoded items would hold the deferred assets in memory
+        output_type = None
+    jobs = (
+        [(file, 'YAML', parse_yaml_file, ()) for file in yaml_files]
+        + [(file, 'HTML', parse_html_file, (compact,)) for file in html_files]
+        + [(file, 'Markdown', markdown_to_data_structure, (file.endswith(".Component.md"), compact)) for file in markdown_files]
+        + [(file, 'TSX', parse_tsx_file, (compact,)) for file in tsx_files]
+    )
+    # Deferred assets are not read while parsing
+    matcher = None if rune_config.deferAssets else get_asset_key_matcher()
+    prefetcher = Prefetcher([job[0] for job in jobs], matcher, rune_config.ioWorkers)
+
+    failed_kind = None
+    for (file, kind, parse, args), prefetched in zip(jobs, prefetcher):
+        if failed_kind is not None and kind != failed_kind:
+            sys.exit(1)
+
+        fragment_key = None
+        if cache is not None and output_type is not None and prefetched.content is not None:
+            fragment_key = cache.key("fragment", output_type, source_cache_key(cache, parse, file, args, prefetched.content))
+            entry = cache.get("fragments", fragment_key)
+            if entry is not None:
+                dependencies, text, count = entry
+                if cache.dependencies_valid(dependencies):
+                    for path, _ in dependencies:
+                        record_dependency(path)
+                    yield file, EncodedItems(text, count)
+                    continue
+
+        with using_prefetched_assets(prefetched.assets), record_dependencies() as recorded:
+            if kind in ('YAML', 'HTML'):
+                data = parse_source_file(parse, file, *args, content=prefetched.content)
+            else:
+                try:
+                    data = [parse_source_file(parse, file, *args, content=prefetched.content)]
+                except Exception as e:
+                    print(f"Error: Failed to process {kind} file '{file}': {e}", file=sys.stderr)
+                    failed_kind = kind
+                    continue
+        if fragment_key is not None:
+            data = SourceItems(data, fragment_key, cache.digest_dependencies(recorded))
+        yield file, data
+    if failed_kind is not None:
+        sys.exit(1)
+
+
+def finish_bundle(merged_data: List[Any], translations: Dict[str, Dict[str, Any]]) -> List[Any]:
+    """
+    Applies the output passes to the merged data and appends the i18n table.
+    :param merged_data: The merged views and components.
+    :param translations: The translation tables to include, by language code.
+    :return: The list to write out.
+    """
+    if rune_config.dedupe:
+        merged_data = to_plain(merged_data)
+        table = HashConsTable()
+        merged_data = to_shared_output(table.intern(merged_data), table.stats)
+        print(table.stats, file=sys.stderr)
+
+    # Structure the output in the desired format
+    i18n_data = {
+        "type": "i18n",
+        "data": translations
+    }
+
+    return merged_data + [i18n_data]
+
+
+def write_bundle(bundle: List[Any], output_type: str, stream, cache: Optional[ArtifactCache] = None, cache_key: Optional[str] = None):
+    """
+    Writes a bundle to the stream, and into the artifact cache under cache_key when a cache is given.
+    """
+    if cache is None:
+        write_output(bundle, output_type, stream)
+        return
+    with cache.tee("bundles", cache_key, stream) as out:
+        write_output(bundle, output_type, out)
+
+
+def write_streamed_bundle(source_items: Iterator[Tuple[str, Union[List[Any], EncodedItems]]], translations: Dict[str, Dict[str, Any]], output_type: str, stream, cache: Optional[ArtifactCache] = None):
+    """
+    Writes the items of each parsed source file as soon as it is parsed, followed by the i18n table.
+    The output is the same as write_output(finish_bundle(...)) without any passes over the whole tree.
+    Unless rune_config.ioWorkers is 0, items are written on a background thread while parsing continues.
+    The encoded form of SourceItems is stored in the cache, for iter_source_items to reuse.
+    """
+    writer = ListWriter(output_type, stream)
+
+    def write_items(items):
+        if isinstance(items, EncodedItems):
+            writer.write_encoded(items)
+        elif isinstance(items, SourceItems) and cache is not None:
+            encoded = writer.encode(items)
+            writer.write_encoded(encoded)
+            cache.put("fragments", items.fragment_key, (items.dependencies, encoded.text, encoded.count))
+        else:
+            for item in items:
+                writer.write(item)
+
+    if rune_config.ioWorkers <= 0:
+        for _, items in source_items:
+            write_items(items)
+    else:
+        background = BackgroundWriter(write_items)
+        try:
+            for _, items in source_items:
+                background.put(items)
+        finally:
+            background.close()
+    writer.write({"type": "i18n", "data": translations})
+    writer.close()
+
+
+def write_prerendered_bundles(merged_data: List[Any], translations: Dict[str, Dict[str, Any]], output_type: str, cache: Optional[ArtifactCache] = None, outputs_key: Optional[str] = None):
+    """
+    Writes one bundle per language in rune_config.prerenderLanguages, with translation keys
+    replaced at build time. Each bundle only includes the i18n table of its own language.
+    Missing translations are reported to stderr.
+    """
+    lookups = [TranslationLookup(translations, language) for language in rune_config.prerenderLanguages]
+    if rune_config.dedupe:
+        # Bundles share untranslated subtrees, so convert them once up front
+        merged_data = to_plain(merged_data)
+
+    for lookup in lookups:
+        bundle = finish_bundle(prerender(merged_data, lookup), {lookup.language: translations[lookup.language]})
+        report_missing_translations(lookup, sys.stderr)
+        output_file = rune_config.prerenderOutput.format(lang=lookup.language, ext=output_type)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            write_bundle(bundle, output_type, f, cache, cache.key(outputs_key, lookup.language) if cache else None)
+        print(f"Wrote {output_file}", file=sys.stderr)
+
+
+# Options which change the output of a build, and so are part of its cache key
+BUILD_KEY_OPTIONS = (
+    "assetsPrefix", "assetsDir", "optimizeAssets", "assetKeyRules",
+    "dedupe", "expandComponents", "prerenderLanguages",
+)
+
+
+def build_cache_key(cache: ArtifactCache, source_files: List[str], language_dir: str, output_type: str) -> str:
+    """
+    Returns the cache key of a build: the source and translation files with their content,
+    the output type and the options in BUILD_KEY_OPTIONS.
+    """
+    translation_files = []
+    if os.path.isdir(language_dir):
+        translation_files = [
+            os.path.join(language_dir, file)
+            for file in sorted(os.listdir(language_dir)) if file.endswith(".json")
+        ]
+    options = [(name, getattr(rune_config, name)) for name in BUILD_KEY_OPTIONS]
+    return cache.key(
+        "build", output_type, options,
+        [(file, cache.file_digest(file)) for file in source_files],
+        [(file, cache.file_digest(file)) for file in translation_files],
+    )
+
+
+def write_cached_build(cache: ArtifactCache, build_key: str, output_type: str) -> bool:
+    """
+    Writes the outputs of an earlier identical build from the artifact cache.
+    :return: False if the build is not cached or the assets it embeds have changed.
+    """
+    dependencies = cache.get("manifests", build_key)
+    if dependencies is None or not cache.dependencies_valid(dependencies):
+        return False
+    outputs_key = cache.key(build_key, dependencies)
+    languages = rune_config.prerenderLanguages or [None]
+    entries = [cache.open("bundles", cache.key(outputs_key, language)) for language in languages]
+    if any(entry is None for entry in entries):
+        for entry in entries:
+            if entry is not None:
+                entry.close()
+        return False
+
+    for language, entry in zip(languages, entries):
+        with entry:
+            if language is None:
+                sys.stdout.flush()
+                target = getattr(sys.stdout, 'buffer', None)
+                if target is None:
+                    sys.stdout.write(entry.read().decode('utf-8'))
+                else:
+                    shutil.copyfileobj(entry, target)
+                    target.flush()
+            else:
+                output_file = rune_config.prerenderOutput.format(lang=language, ext=output_type)
+                with open(output_file, 'wb') as f:
+                    shutil.copyfileobj(entry, f)
+                print(f"Wrote {output_file} (cached)", file=sys.stderr)
+    return True
+
+
 def process_files(directory: str, output_type: str, language_dir: str):
     # Get all files with respective extensions
     yaml_files = get_all_files_with_extension(directory, '.yml')
@@ -403,46 +941,71 @@ def process_files(directory: str, output_type: str, language_dir: str):
         print(f"No .yml, .html, .md, or .tsx files found in the directory: {directory}", file=sys.stderr)
         sys.exit(1)
 
-    try:
-        if os.path.isdir(language_dir):
-            translations = get_all_translations(language_dir)
-        else:
-            print(f"Translation directory '{language_dir}' does not exist. Skipping translations.", file=sys.stderr)
-            translations = {}
-
-        # Merge YAML and HTML data
-        merged_data = []
-        if yaml_files:
-            yaml_data = merge_yaml_files(yaml_files)
-            merged_data.extend(yaml_data)
-
-        if html_files:
-            html_data = merge_html_files(html_files)
-            merged_data.extend(html_data)
-
-        if markdown_files:
-            markdown_data = merge_markdown_files(markdown_files)
-            merged_data.extend(markdown_data)
-
-        if tsx_files:
-            tsx_data = merge_tsx_files(tsx_files)
-            merged_data.extend(tsx_data)
-
-        # Structure the output in the desired format
-        i18n_data = {
-            "type": "i18n",
-            "data": translations
-        }
+    if output_type not in ('json', 'yml'):
+        print(f"Unsupported output type: '{output_type}'. Please use 'json' or 'yml'.", file=sys.stderr)
+        sys.exit(1)
 
-        merged_data.append(i18n_data)
+    try:
+        cache = get_artifact_cache()
+        if cache is not None:
+            build_key = build_cache_key(cache, yaml_files + html_files + markdown_files + tsx_files, language_dir, output_type)
+            if write_cached_build(cache, build_key, output_type):
+                cache.evict()
+                return
+
+        # Passes over the whole tree need all files parsed before anything is written
+        streamed = not (rune_config.dedupe or rune_config.expandComponents or rune_config.prerenderLanguages)
+
+        # Asset files read while building, which the cached outputs depend on
+        with record_dependencies() as recorded:
+            if os.path.isdir(language_dir):
+                translations = get_all_translations(language_dir)
+            else:
+                print(f"Translation directory '{language_dir}' does not exist. Skipping translations.", file=sys.stderr)
+                translations = {}
+
+            # Parsed elements are kept as compact Nodes until they are written out
+            source_items = iter_source_items(
+                yaml_files, html_files, markdown_files, tsx_files,
+                compact=True, output_type=output_type if streamed else None,
+            )
+
+            if streamed:
+                # Written to stdout once every file is parsed, so failed builds leave no partial output
+                with spooled_output(sys.stdout) as spool, \
+                        cache.tee("bundles", None, spool) if cache is not None else nullcontext(spool) as out:
+                    write_streamed_bundle(source_items, translations, output_type, out, cache)
+                    if cache is not None:
+                        dependencies = cache.digest_dependencies(recorded)
+                        out.key = cache.key(cache.key(build_key, dependencies), None)
+            else:
+                # Merge the items, and the source file of each item
+                merged_data = []
+                sources = []
+                for file, items in source_items:
+                    merged_data.extend(items)
+                    sources.extend([file] * len(items))
+
+                if rune_config.expandComponents:
+                    merged_data = to_plain(merged_data)
+                    expander = ComponentExpander(merged_data, sources, get_asset_key_matcher(), load_asset_data_url)
+                    merged_data = expander.expand(merged_data, sources)
+                    print(expander.stats, file=sys.stderr)
+
+        if not streamed:
+            outputs_key = None
+            if cache is not None:
+                dependencies = cache.digest_dependencies(recorded)
+                outputs_key = cache.key(build_key, dependencies)
+
+            if rune_config.prerenderLanguages:
+                write_prerendered_bundles(merged_data, translations, output_type, cache, outputs_key)
+            else:
+                write_bundle(finish_bundle(merged_data, translations), output_type, sys.stdout, cache, cache.key(outputs_key, None) if cache else None)
 
-        if output_type == 'json':
-            print(json.dumps(merged_data, indent=2))
-        elif output_type == 'yml':
-            print(yaml.dump(merged_data, default_flow_style=False))
-        else:
-            print(f"Unsupported output type: '{output_type}'. Please use 'json' or 'yml'.", file=sys.stderr)
-            sys.exit(1)
+        if cache is not None:
+            cache.put("manifests", build_key, dependencies)
+            cache.evict()
 
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -5,8 +5,13 @@
 import sys
 import os
 import argparse
-from . import process_files
+from typing import List
+from . import process_files, use_memory_cache
 from .config import config as rune_config
+from .asset_rules import DEFAULT_ASSET_KEY_RULES
+from .cache import MemoryArtifactCache, parse_size
+from .daemon import NO_DAEMON_VARIABLE, BuildDaemon, run_in_daemon, stop_daemon
+from .pipeline import DEFAULT_READ_WORKERS
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -43,17 +48,176 @@ def create_parser() -> argparse.ArgumentParser:
         default=None,
         help="Prefix to add to emitted asset URLs (e.g. /static).",
     )
+    parser.add_argument(
+        "--optimize-assets",
+        dest="optimize_assets",
+        action="store_true",
+        help="Minify SVG and losslessly recompress PNG assets before embedding.",
+    )
+    parser.add_argument(
+        "--defer-assets",
+        dest="defer_assets",
+        action="store_true",
+        help=(
+            "Stream asset data URLs from disk while writing the output instead of "
+            "holding them in memory; recommended for large assets."
+        ),
+    )
+    parser.add_argument(
+        "--dedupe",
+        dest="dedupe",
+        action="store_true",
+        help=(
+            "Emit identical subtrees once in a 'shared' table and reference them "
+            "with 'ref' nodes."
+        ),
+    )
+    parser.add_argument(
+        "--expand-components",
+        dest="expand_components",
+        action="store_true",
+        help=(
+            "Expand Component usages with static parameters at build time, so clients "
+            "receive ready-to-render trees. Component definitions are kept."
+        ),
+    )
+    parser.add_argument(
+        "--asset-key",
+        dest="asset_keys",
+        action="append",
+        default=None,
+        metavar="RULE",
+        help=(
+            "Additional property that references an asset file, e.g. 'icon', "
+            "'*Icon' or 'a.href'. May be given multiple times."
+        ),
+    )
+    parser.add_argument(
+        "--no-default-asset-keys",
+        dest="no_default_asset_keys",
+        action="store_true",
+        help="Do not use the default asset rules (image, *Image, Image*, src).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        type=str,
+        default=None,
+        help=(
+            "Directory for caching parsed files, optimized assets and build outputs; "
+            "may be shared between machines."
+        ),
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        dest="cache_max_size",
+        type=str,
+        default="1G",
+        metavar="SIZE",
+        help="Evict least recently used cache entries beyond SIZE, e.g. 500M or 2G (default: 1G; 0 for no limit).",
+    )
+    parser.add_argument(
+        "--prerender-lang",
+        dest="prerender_lang",
+        type=str,
+        default=None,
+        metavar="LANGS",
+        help=(
+            "Comma-separated language codes, e.g. 'fi,en'. Writes one bundle per language "
+            "with translation keys replaced at build time."
+        ),
+    )
+    parser.add_argument(
+        "--prerender-output",
+        dest="prerender_output",
+        type=str,
+        default="rune.{lang}.{ext}",
+        metavar="PATTERN",
+        help="Output path for pre-rendered bundles (default: rune.{lang}.{ext}).",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        dest="no_daemon",
+        action="store_true",
+        help=(
+            "Build in this process even when a Rune daemon is running (see 'rune daemon --help'). "
+            "Setting the RUNE_NO_DAEMON environment variable to a non-empty value does the same."
+        ),
+    )
+    parser.add_argument(
+        "--daemon-socket",
+        dest="daemon_socket",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Socket of the Rune daemon to use (default: the socket 'rune daemon' listens on by default).",
+    )
+    parser.add_argument(
+        "--io-workers",
+        dest="io_workers",
+        type=int,
+        default=DEFAULT_READ_WORKERS,
+        metavar="N",
+        help=(
+            "Read source and asset files on N threads ahead of the parser, and write output "
+            f"while parsing continues (default: {DEFAULT_READ_WORKERS}; 0 reads and writes on the main thread)."
+        ),
+    )
     return parser
 
 
-def main():
-    try:
-        parser = create_parser()
-        args = parser.parse_args()
+def create_daemon_parser() -> argparse.ArgumentParser:
+    """Create and return the argument parser of `rune daemon`."""
+    parser = argparse.ArgumentParser(
+        prog="rune daemon",
+        description=(
+            "Keep Rune loaded in the background and run the builds of other rune commands, "
+            "with parse results and outputs cached in memory."
+        ),
+    )
+    parser.add_argument(
+        "--socket",
+        dest="socket",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Unix socket to listen on (default: a per-user socket in $XDG_RUNTIME_DIR or the temp directory).",
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        dest="cache_max_size",
+        type=str,
+        default="1G",
+        metavar="SIZE",
+        help="Evict least recently used in-memory cache entries beyond SIZE (default: 1G; 0 for no limit).",
+    )
+    parser.add_argument(
+        "--stop",
+        dest="stop",
+        action="store_true",
+        help="Stop the running daemon.",
+    )
+    return parser
 
+
+def build(args: argparse.Namespace) -> None:
+    """Update the configuration from parsed CLI arguments and run the build."""
+    try:
         # Update global configuration from CLI flags
         rune_config.assetsPrefix = args.assets_prefix if args.assets_prefix else None
         rune_config.assetsDir = args.assets_dir if getattr(args, "assets_dir", None) else None
+        rune_config.optimizeAssets = bool(getattr(args, "optimize_assets", False))
+        rune_config.deferAssets = bool(getattr(args, "defer_assets", False))
+        rune_config.dedupe = bool(getattr(args, "dedupe", False))
+        rune_config.expandComponents = bool(getattr(args, "expand_components", False))
+        asset_key_rules = [] if args.no_default_asset_keys else list(DEFAULT_ASSET_KEY_RULES)
+        rune_config.assetKeyRules = asset_key_rules + (args.asset_keys or [])
+        rune_config.cacheDir = args.cache_dir if args.cache_dir else None
+        cache_max_size = parse_size(args.cache_max_size)
+        rune_config.cacheMaxSize = cache_max_size if cache_max_size > 0 else None
+        rune_config.prerenderLanguages = [lang.strip() for lang in (args.prerender_lang or "").split(",") if lang.strip()]
+        rune_config.prerenderOutput = args.prerender_output
+        rune_config.ioWorkers = max(0, args.io_workers)
 
         process_files(
             args.directory,
@@ -64,5 +228,47 @@ def main():
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
+
+def daemon_main(argv: List[str]) -> None:
+    """Entry point of `rune daemon`."""
+    args = create_daemon_parser().parse_args(argv)
+    if args.stop:
+        if not stop_daemon(args.socket):
+            print("Error: No Rune daemon is running.", file=sys.stderr)
+            sys.exit(1)
+        return
+
+    try:
+        cache_max_size = parse_size(args.cache_max_size)
+        daemon = BuildDaemon(args.socket, lambda build_argv: build(create_parser().parse_args(build_argv)))
+        # Load the parser libraries now instead of in the first build
+        import bs4, esprima, mistune  # noqa: F401
+        use_memory_cache(MemoryArtifactCache(cache_max_size if cache_max_size > 0 else None))
+        daemon.serve()
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def main():
+    argv = sys.argv[1:]
+    if argv[:1] == ["daemon"]:
+        daemon_main(argv[1:])
+        return
+
+    try:
+        parser = create_parser()
+        args = parser.parse_args(argv)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # Hand the build to a running daemon, if any
+    if not args.no_daemon and not os.environ.get(NO_DAEMON_VARIABLE):
+        status = run_in_daemon(argv, args.daemon_socket)
+        if status is not None:
+            sys.exit(status)
+    build(args)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,307 @@
+"""Content-aware optimization of assets before they are embedded.
+
+This module provides lossless size reductions for the asset types Rune
+embeds most often:
+
+- SVG: comments, processing instructions, ``<metadata>`` blocks, editor
+  specific elements/attributes (Inkscape, Sodipodi, Sketch, Illustrator)
+  and insignificant whitespace are removed. Documents declaring entities in
+  their DOCTYPE are left unchanged, since it is dropped from the output
+- PNG: all IDAT chunks are merged and recompressed with zlib at the maximum
+  compression level, and ancillary chunks which do not affect rendering
+  (text, timestamps, physical dimensions, ...) are dropped
+
+Optimization results are cached by the SHA-256 of the source bytes so each
+asset version is processed only once per process, up to `CACHE_MAX_SIZE`
+bytes of results. Any input that cannot be parsed, or which does not get
+smaller, is returned unchanged.
+
+The primary entry point is `optimize_asset`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from lxml import etree
+
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+
+# Namespaces used by editors to store private state in saved SVG files
+_EDITOR_NAMESPACES = frozenset({
+    "http://www.inkscape.org/namespaces/inkscape",
+    "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+    "http://www.bohemiancoding.com/sketch/ns",
+    "http://ns.adobe.com/AdobeIllustrator/10.0/",
+    "http://ns.adobe.com/Graphs/1.0/",
+    "http://ns.adobe.com/AdobeSVGViewerExtensions/3.0/",
+    "http://ns.adobe.com/Extensibility/1.0/",
+    "http://ns.adobe.com/Flows/1.0/",
+    "http://ns.adobe.com/ImageReplacement/1.0/",
+    "http://ns.adobe.com/SaveForWeb/1.0/",
+    "http://ns.adobe.com/Variables/1.0/",
+    "http://ns.adobe.com/xap/1.0/",
+    "http://purl.org/dc/elements/1.1/",
+    "http://creativecommons.org/ns#",
+    "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+})
+
+# Elements where whitespace in text content is significant
+_SVG_TEXT_ELEMENTS = frozenset({
+    "text", "tspan", "textPath", "title", "desc", "style", "script",
+    "foreignObject",
+})
+
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Ancillary PNG chunks which change how the image is rendered and must be kept
+_PNG_RENDERING_CHUNKS = frozenset({
+    b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"sBIT",
+})
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _namespace(name: str) -> str:
+    if name.startswith("{"):
+        return name[1:].split("}", 1)[0]
+    return ""
+
+
+def _is_whitespace(text: Optional[str]) -> bool:
+    return text is not None and not text.strip()
+
+
+def _preserves_whitespace(el, inherited: bool) -> bool:
+    """Whether whitespace directly inside ``el`` is significant."""
+    space = el.get(_XML_SPACE)
+    if space is not None:
+        return space == "preserve"
+    if inherited:
+        return True
+    # Text content, and content of other vocabularies such as XHTML in <foreignObject>
+    return _local_name(el.tag) in _SVG_TEXT_ELEMENTS or _namespace(el.tag) not in ("", SVG_NAMESPACE)
+
+
+def optimize_svg(data: bytes) -> bytes:
+    """Return a minified copy of the SVG document in ``data``.
+
+    Documents declaring entities are returned unchanged. Raises ValueError
+    when the input is not well-formed XML.
+    """
+    parser = etree.XMLParser(
+        remove_comments=True,
+        remove_pis=True,
+        resolve_entities=False,
+        no_network=True,
+    )
+    try:
+        root = etree.fromstring(data, parser)
+    except etree.XMLSyntaxError as exc:
+        raise ValueError(f"Invalid SVG document: {exc}") from exc
+
+    # The DOCTYPE is not written back, so references to its entities would be left undefined
+    dtd = root.getroottree().docinfo.internalDTD
+    if dtd is not None and any(True for _ in dtd.iterentities()):
+        return data
+
+    # Collect first, mutate afterwards; removing while iterating skips nodes
+    removals = []
+    for el in root.iter():
+        if not isinstance(el.tag, str):
+            continue
+        if _namespace(el.tag) in _EDITOR_NAMESPACES or _local_name(el.tag) == "metadata":
+            removals.append(el)
+            continue
+        for attr in list(el.attrib):
+            if _namespace(attr) in _EDITOR_NAMESPACES:
+                del el.attrib[attr]
+
+    for el in removals:
+        parent = el.getparent()
+        if parent is None:
+            continue
+        # Keep text following the removed element attached to the document
+        if el.tail and el.tail.strip():
+            previous = el.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or "") + el.tail
+            else:
+                parent.text = (parent.text or "") + el.tail
+        parent.remove(el)
+
+    # Drop whitespace-only text between elements outside of text content
+    stack = [(root, False)]
+    while stack:
+        el, inherited = stack.pop()
+        preserve = _preserves_whitespace(el, inherited)
+        if not preserve and len(el) and _is_whitespace(el.text):
+            el.text = None
+        for child in el:
+            if not preserve and _is_whitespace(child.tail):
+                child.tail = None
+            if isinstance(child.tag, str):
+                stack.append((child, preserve))
+
+    # Namespace declarations which are no longer referenced
+    etree.cleanup_namespaces(root)
+
+    return etree.tostring(root, encoding="utf-8", xml_declaration=False)
+
+
+def _iter_png_chunks(data: bytes):
+    """Yield (chunk_type, chunk_data) pairs from a PNG byte string.
+
+    Raises ValueError for truncated files and CRC mismatches.
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("Invalid PNG: missing signature")
+    pos = len(PNG_SIGNATURE)
+    end = len(data)
+    while pos < end:
+        if pos + 8 > end:
+            raise ValueError("Invalid PNG: truncated chunk header")
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        data_start = pos + 8
+        data_end = data_start + length
+        if data_end + 4 > end:
+            raise ValueError("Invalid PNG: truncated chunk")
+        chunk_data = data[data_start:data_end]
+        (crc,) = struct.unpack(">I", data[data_end:data_end + 4])
+        if zlib.crc32(chunk_type + chunk_data) & 0xFFFFFFFF != crc:
+            raise ValueError(f"Invalid PNG: CRC mismatch in {chunk_type!r} chunk")
+        yield chunk_type, chunk_data
+        pos = data_end + 4
+        if chunk_type == b"IEND":
+            break
+
+
+def _png_chunk(chunk_type: bytes, chunk_data: bytes) -> bytes:
+    crc = zlib.crc32(chunk_type + chunk_data) & 0xFFFFFFFF
+    return struct.pack(">I", len(chunk_data)) + chunk_type + chunk_data + struct.pack(">I", crc)
+
+
+def _deflate_max(raw: bytes) -> bytes:
+    """Compress with zlib at level 9, trying the strategies that suit PNG data."""
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, 9, strategy)
+        candidate = compressor.compress(raw) + compressor.flush()
+        if best is None or len(candidate) < len(best):
+            best = candidate
+    return best
+
+
+def optimize_png(data: bytes) -> bytes:
+    """Return a losslessly recompressed copy of the PNG image in ``data``.
+
+    Animated PNGs are returned unchanged since their frame data lives outside
+    of the IDAT stream. Raises ValueError when the input is not a valid PNG.
+    """
+    chunks = list(_iter_png_chunks(data))
+    if not chunks or chunks[0][0] != b"IHDR":
+        raise ValueError("Invalid PNG: IHDR must be the first chunk")
+    if any(chunk_type == b"acTL" for chunk_type, _ in chunks):
+        return data
+
+    idat = b"".join(chunk_data for chunk_type, chunk_data in chunks if chunk_type == b"IDAT")
+    if not idat:
+        raise ValueError("Invalid PNG: no IDAT chunks")
+    try:
+        raw = zlib.decompress(idat)
+    except zlib.error as exc:
+        raise ValueError(f"Invalid PNG: corrupt image data: {exc}") from exc
+    compressed = _deflate_max(raw)
+
+    out = [PNG_SIGNATURE]
+    idat_written = False
+    for chunk_type, chunk_data in chunks:
+        if chunk_type == b"IDAT":
+            if not idat_written:
+                out.append(_png_chunk(b"IDAT", compressed))
+                idat_written = True
+            continue
+        # Critical chunks have an uppercase first letter
+        is_critical = chunk_type[:1].isupper()
+        if is_critical or chunk_type in _PNG_RENDERING_CHUNKS:
+            out.append(_png_chunk(chunk_type, chunk_data))
+    return b"".join(out)
+
+
+_OPTIMIZERS: Dict[str, Callable[[bytes], bytes]] = {
+    "svg": optimize_svg,
+    "png": optimize_png,
+}
+
+# Bytes of optimized data kept in the cache; least recently used results are dropped beyond it
+CACHE_MAX_SIZE = 32 * 1024 * 1024
+
+# Cache of (extension, sha256 of source) -> optimized bytes, least recently used first
+_cache: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+_cache_size = 0
+
+
+def is_optimizable(extension: str) -> bool:
+    """Return True when ``extension`` (without the dot) has an optimizer."""
+    return extension.lower() in _OPTIMIZERS
+
+
+def optimize_asset(data: bytes, extension: str, cache: bool = True) -> bytes:
+    """Optimize ``data`` according to its file ``extension`` (without the dot).
+
+    Returns the optimized bytes, or ``data`` unchanged when the type is not
+    supported, the content cannot be parsed, or optimization would not make
+    it smaller. Results are cached by content hash unless ``cache`` is False,
+    e.g. when the caller keeps them in an artifact cache of its own.
+    """
+    global _cache_size
+    ext = extension.lower()
+    optimizer = _OPTIMIZERS.get(ext)
+    if optimizer is None:
+        return data
+
+    key = (ext, hashlib.sha256(data).hexdigest())
+    cached = _cache.get(key)
+    if cached is not None:
+        _cache.move_to_end(key)
+        return cached
+
+    try:
+        result = optimizer(data)
+    except ValueError:
+        result = data
+    if len(result) >= len(data):
+        result = data
+
+    if cache and len(result) <= CACHE_MAX_SIZE:
+        _cache[key] = result
+        _cache_size += len(result)
+        while _cache_size > CACHE_MAX_SIZE:
+            _, dropped = _cache.popitem(last=False)
+            _cache_size -= len(dropped)
+    return result
+
+
+def clear_cache() -> None:
+    """Forget all cached optimization results."""
+    global _cache_size
+    _cache.clear()
+    _cache_size = 0
+
+
+__all__ = [
+    "optimize_asset",
+    "optimize_svg",
+    "optimize_png",
+    "is_optimizable",
+    "clear_cache",
+]
@@ -0,0 +1,124 @@
+"""Rules deciding which properties of a node reference asset files.
+
+A rule is a property name pattern, optionally restricted to one node type:
+
+- ``src`` matches the ``src`` property of any node
+- ``*Image`` and ``Image*`` match by suffix and prefix
+- ``img.src`` or ``a.href`` match only on nodes of type ``img`` or ``a``
+
+Rules are compiled into an `AssetKeyMatcher`, which answers lookups with set
+membership and tuple-based ``startswith``/``endswith`` checks, and memoizes
+the answer for every (node type, key) pair it has seen.
+
+Only values accepted by `is_asset_path` are resolved as files, so rules such
+as ``a.href`` leave URLs, fragments and component parameters as they are.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+
+DEFAULT_ASSET_KEY_RULES: Tuple[str, ...] = ("image", "*Image", "Image*", "src")
+
+# A URL scheme such as "https:", "mailto:" or "data:"; one letter is a Windows drive
+_URL_SCHEME_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]+:")
+
+
+class _PatternSet:
+    """Compiled set of untyped key patterns."""
+
+    __slots__ = ("exact", "prefixes", "suffixes", "match_all")
+
+    def __init__(self) -> None:
+        self.exact = set()
+        self.prefixes: Tuple[str, ...] = ()
+        self.suffixes: Tuple[str, ...] = ()
+        self.match_all = False
+
+    def add(self, pattern: str) -> None:
+        if pattern == "*":
+            self.match_all = True
+        elif pattern.endswith("*") and "*" not in pattern[:-1]:
+            self.prefixes += (pattern[:-1],)
+        elif pattern.startswith("*") and "*" not in pattern[1:]:
+            self.suffixes += (pattern[1:],)
+        elif "*" not in pattern:
+            self.exact.add(pattern)
+        else:
+            raise ValueError(f"Unsupported asset key pattern: '{pattern}'")
+
+    def matches(self, key: str) -> bool:
+        return (
+            self.match_all
+            or key in self.exact
+            or key.startswith(self.prefixes)
+            or key.endswith(self.suffixes)
+        )
+
+
+class AssetKeyMatcher:
+    """Compiled form of a list of asset key rules.
+
+    Attributes
+    -----------
+    rules: Tuple[str, ...]
+        The rules this matcher was compiled from.
+    """
+
+    def __init__(self, rules: Iterable[str]) -> None:
+        self.rules = tuple(rules)
+        self._any_type = _PatternSet()
+        self._by_type: Dict[str, _PatternSet] = {}
+        self._cache: Dict[Optional[str], Dict[str, bool]] = {}
+
+        for rule in self.rules:
+            if not rule:
+                raise ValueError("Asset key rule must be a non-empty string")
+            node_type, sep, pattern = rule.rpartition(".")
+            if not pattern:
+                raise ValueError(f"Asset key rule is missing a property name: '{rule}'")
+            if sep:
+                self._by_type.setdefault(node_type, _PatternSet()).add(pattern)
+            else:
+                self._any_type.add(pattern)
+
+    def matches(self, node_type: Optional[str], key: str) -> bool:
+        """Return True when property ``key`` of a ``node_type`` node is an asset reference."""
+        cache = self._cache.get(node_type)
+        if cache is None:
+            cache = self._cache[node_type] = {}
+        result = cache.get(key)
+        if result is None:
+            typed = self._by_type.get(node_type) if node_type is not None else None
+            result = self._any_type.matches(key) or (typed is not None and typed.matches(key))
+            cache[key] = result
+        return result
+
+
+def is_asset_path(value: str) -> bool:
+    """Return True when ``value`` can be a path to an asset file.
+
+    URLs with a scheme, protocol-relative URLs, fragments and component
+    parameter placeholders are not.
+    """
+    return bool(value) and not (
+        value.startswith(("#", "//", "Component.Param."))
+        or _URL_SCHEME_RE.match(value)
+    )
+
+
+@lru_cache(maxsize=16)
+def compile_asset_key_rules(rules: Tuple[str, ...]) -> AssetKeyMatcher:
+    """Return a (cached) matcher for the given rules."""
+    return AssetKeyMatcher(rules)
+
+
+__all__ = [
+    "AssetKeyMatcher",
+    "DEFAULT_ASSET_KEY_RULES",
+    "compile_asset_key_rules",
+    "is_asset_path",
+]
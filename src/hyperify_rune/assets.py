@@ -7,15 +7,20 @@ assets directory using deterministic, content-addressed filenames.
 The primary entry point is `extract_data_url_to_assets_dir` which accepts a
 data URL string, an output directory, and an optional suggested original
 filename to preserve the extension when available.
+
+For large files, `DeferredAsset` stands in for a data URL inside the parsed
+tree, and `stream_data_url` writes the encoded data URL in bounded chunks
+straight from a memory map when the output is produced.
 """
 
 from __future__ import annotations
 
 import base64
 import hashlib
+import mmap
 import os
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import Callable, Tuple, Optional
 from urllib.parse import unquote_to_bytes
 
 
@@ -90,6 +95,29 @@ def _sha256_hex(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def write_bytes_atomic(path: str | os.PathLike[str], data: bytes) -> None:
+    """Write `data` to `path` so readers never observe a partial file.
+
+    The content is written to a uniquely named temporary file next to the
+    target and then moved into place with `os.replace`, which is atomic on
+    POSIX and Windows. This also makes concurrent writers of the same path
+    (e.g. several builds sharing a directory) safe: the last one wins.
+    """
+    target_path = Path(path)
+    tmp_path = target_path.with_name(f"{target_path.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp")
+    try:
+        with open(tmp_path, "xb") as f:
+            f.write(data)
+        os.replace(tmp_path, target_path)
+    finally:
+        # Best-effort cleanup of tmp in case of exceptions before replace
+        if tmp_path.exists():
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+
+
 def extract_data_url_to_assets_dir(
     data_url: str,
     assets_dir: str | os.PathLike[str],
@@ -119,22 +147,72 @@ def extract_data_url_to_assets_dir(
         return str(target_path)
 
     # Write atomically; avoid partial files on crashes
-    tmp_path = target_path.with_suffix(target_path.suffix + ".tmp")
-    try:
-        with open(tmp_path, "xb") as f:
-            f.write(data_bytes)
-        os.replace(tmp_path, target_path)
-    finally:
-        # Best-effort cleanup of tmp in case of exceptions before replace
-        if tmp_path.exists():
-            try:
-                tmp_path.unlink()
-            except OSError:
-                pass
+    write_bytes_atomic(target_path, data_bytes)
 
     return str(target_path)
 
 
+# Must be a multiple of 3 so that chunks encode without base64 padding
+STREAM_CHUNK_SIZE = 3 * 256 * 1024
+
+
+class DeferredAsset:
+    """Placeholder for an asset whose data URL is produced only on output.
+
+    Attributes
+    -----------
+    path: str
+        File system path of the asset.
+    mime_type: str
+        MIME type to use in the data URL.
+    """
+
+    __slots__ = ("path", "mime_type")
+
+    def __init__(self, path: str, mime_type: str) -> None:
+        self.path = path
+        self.mime_type = mime_type
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, DeferredAsset):
+            return NotImplemented
+        return self.path == other.path and self.mime_type == other.mime_type
+
+    def __hash__(self) -> int:
+        return hash((self.path, self.mime_type))
+
+    def __repr__(self) -> str:
+        return f"DeferredAsset({self.path!r}, {self.mime_type!r})"
+
+
+def stream_data_url(
+    asset: DeferredAsset,
+    write: Callable[[str], object],
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> None:
+    """Write the base64 data URL for `asset` using the `write` callable.
+
+    The file is memory-mapped and encoded `chunk_size` bytes at a time, so at
+    most one encoded chunk exists in memory regardless of the file size.
+    """
+    if chunk_size <= 0 or chunk_size % 3:
+        raise ValueError("chunk_size must be a positive multiple of 3")
+
+    write(f"data:{asset.mime_type};base64,")
+    with open(asset.path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # Empty files cannot be memory-mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                for offset in range(0, size, chunk_size):
+                    write(base64.b64encode(view[offset:offset + chunk_size]).decode("ascii"))
+
+
 __all__ = [
+    "DeferredAsset",
     "extract_data_url_to_assets_dir",
+    "stream_data_url",
+    "write_bytes_atomic",
 ]
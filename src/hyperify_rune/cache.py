@@ -0,0 +1,458 @@
+"""Content-addressed build artifact cache.
+
+The cache is a plain directory, so it can live on a shared mount or be synced
+between CI runners. Artifacts are stored under ``<directory>/<namespace>/<hh>/<key>``
+where the key is a SHA-256 over the inputs of the artifact, the Rune version,
+the cache format version and the options that affect it:
+
+- ``parse``: the parse result of one source file
+- ``fragments``: the encoded output of the items of one source file
+- ``assets``: optimized asset bytes
+- ``manifests`` and ``bundles``: the final output of a build
+
+Parse results and bundles may also depend on asset files referenced from the
+sources. Those are recorded while building (see `record_dependencies`) and
+stored with the artifact together with their content hashes, which are
+verified before the artifact is used.
+
+Entries are written atomically with a temporary file and `os.replace`, so
+concurrent builds sharing a cache never observe partial entries. Reading an
+entry updates its modification time, and `ArtifactCache.evict` removes the
+least recently used entries once the cache grows beyond its size limit.
+`MemoryArtifactCache` keeps the same entries in memory, for the build daemon.
+
+Structured artifacts are pickled. Loading only accepts the few Rune classes
+which can appear in parse results, so a shared cache cannot be used to run
+arbitrary code.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import io
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from .assets import DeferredAsset, write_bytes_atomic
+from .nodes import Node
+
+
+# Bump when the layout or the content of cached artifacts changes
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_SIZE = 1024 ** 3
+
+# Temporary files older than this are left over from interrupted writes
+_STALE_TMP_AGE = 3600
+
+_PICKLE_PROTOCOL = 4
+
+_TEE_BATCH_SIZE = 256 * 1024
+
+_ALLOWED_CLASSES = {
+    (Node.__module__, Node.__qualname__): Node,
+    (DeferredAsset.__module__, DeferredAsset.__qualname__): DeferredAsset,
+    # YAML timestamps
+    ("datetime", "date"): datetime.date,
+    ("datetime", "datetime"): datetime.datetime,
+    ("datetime", "timedelta"): datetime.timedelta,
+    ("datetime", "timezone"): datetime.timezone,
+}
+
+
+@lru_cache(maxsize=None)
+def rune_version() -> str:
+    """The installed hyperify-rune version, or ``"unknown"``."""
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # Python 3.7
+        return "unknown"
+    try:
+        return version("hyperify-rune")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+class _RestrictedUnpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str) -> Any:
+        cls = _ALLOWED_CLASSES.get((module, name))
+        if cls is None:
+            raise pickle.UnpicklingError(f"Unexpected class in cache entry: {module}.{name}")
+        return cls
+
+
+# Dependency lists of the active `record_dependencies` blocks
+_recorders: List[List[str]] = []
+
+
+@contextmanager
+def record_dependencies() -> Iterator[List[str]]:
+    """Collect the paths passed to `record_dependency` within the block."""
+    recorded: List[str] = []
+    _recorders.append(recorded)
+    try:
+        yield recorded
+    finally:
+        # By identity; lists with the same paths compare equal
+        for index, active in enumerate(_recorders):
+            if active is recorded:
+                del _recorders[index]
+                break
+
+
+def record_dependency(path: str) -> None:
+    """Record that the artifact being built depends on the file at ``path``."""
+    for recorded in _recorders:
+        recorded.append(path)
+
+
+class _TeeStream:
+    """Text stream copying everything written to it into a binary cache file."""
+
+    def __init__(self, stream: TextIO, file: Optional[BinaryIO], key: Optional[str]) -> None:
+        self.stream = stream
+        self.file = file
+        self.complete = file is not None
+        # The entry to store the copy as; may be set while writing
+        self.key = key
+        # Output writers emit many small chunks; encode them in batches
+        self._pending: List[str] = []
+        self._pending_size = 0
+
+    def write(self, text: str) -> int:
+        written = self.stream.write(text)
+        if self.file is not None:
+            self._pending.append(text)
+            self._pending_size += len(text)
+            if self._pending_size >= _TEE_BATCH_SIZE:
+                self.flush_file()
+        return written
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def flush_file(self) -> None:
+        if self.file is not None and self._pending:
+            try:
+                self.file.write("".join(self._pending).encode("utf-8"))
+            except OSError:
+                self.file = None
+                self.complete = False
+        self._pending = []
+        self._pending_size = 0
+
+
+class ArtifactCache:
+    """A content-addressed artifact cache in ``directory``.
+
+    Attributes
+    -----------
+    directory: str
+        The cache directory.
+    max_size: Optional[int]
+        Size limit in bytes enforced by `evict`; None disables eviction.
+    """
+
+    def __init__(self, directory: str, max_size: Optional[int] = DEFAULT_MAX_SIZE) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self._salt = (
+            f"rune-cache:{CACHE_FORMAT_VERSION}:{rune_version()}:"
+            f"{sys.version_info[0]}.{sys.version_info[1]}"
+        ).encode("utf-8")
+        # path -> ((mtime_ns, size, inode, device), digest)
+        self._digests: Dict[str, Tuple[Tuple[int, ...], str]] = {}
+
+    def key(self, *parts: Any) -> str:
+        """Hash ``parts`` (bytes, or values with a stable repr) into a cache key."""
+        digest = hashlib.sha256(self._salt)
+        for part in parts:
+            data = part if isinstance(part, bytes) else repr(part).encode("utf-8")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.directory, namespace, key[:2], key)
+
+    def get_bytes(self, namespace: str, key: str) -> Optional[bytes]:
+        """Return the entry ``key`` in ``namespace``, or None on a miss."""
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        return data
+
+    def open(self, namespace: str, key: str) -> Optional[BinaryIO]:
+        """Open the entry ``key`` in ``namespace`` for reading, or return None on a miss."""
+        path = self._path(namespace, key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            return None
+        self._touch(path)
+        return f
+
+    def put_bytes(self, namespace: str, key: str, data: bytes) -> None:
+        """Store ``data``; failures are ignored since the cache is only an optimization."""
+        path = self._path(namespace, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_bytes_atomic(path, data)
+        except OSError:
+            pass
+
+    def get(self, namespace: str, key: str) -> Any:
+        """Return the unpickled entry, or None on a miss or an unreadable entry."""
+        data = self.get_bytes(namespace, key)
+        if data is None:
+            return None
+        try:
+            return _RestrictedUnpickler(io.BytesIO(data)).load()
+        except Exception:
+            return None
+
+    def put(self, namespace: str, key: str, value: Any) -> None:
+        """Pickle and store ``value``."""
+        try:
+            data = pickle.dumps(value, protocol=_PICKLE_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        self.put_bytes(namespace, key, data)
+
+    @contextmanager
+    def tee(self, namespace: str, key: Optional[str], stream: TextIO) -> Iterator[_TeeStream]:
+        """Yield a stream writing to ``stream`` and, UTF-8 encoded, into the entry ``key``.
+
+        The entry is stored when the block succeeds. When the key depends on
+        what is written, pass None and set the ``key`` attribute of the
+        yielded stream before the block ends. Errors writing the entry only
+        disable caching; errors writing to ``stream`` are raised.
+        """
+        directory = os.path.join(self.directory, namespace)
+        tmp_path = os.path.join(directory, f"{os.getpid()}.{os.urandom(8).hex()}.tmp")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            f = open(tmp_path, "xb")
+        except OSError:
+            yield _TeeStream(stream, None, key)
+            return
+
+        tee = _TeeStream(stream, f, key)
+        try:
+            try:
+                yield tee
+            finally:
+                tee.flush_file()
+                try:
+                    f.close()
+                except OSError:
+                    tee.complete = False
+            if tee.complete and tee.key is not None:
+                path = self._path(namespace, tee.key)
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                except OSError:
+                    pass
+        finally:
+            if os.path.exists(tmp_path):
+                self._remove(tmp_path)
+
+    def file_digest(self, path: str) -> str:
+        """SHA-256 of the file content, memoized while the file is unchanged."""
+        st = os.stat(path)
+        # The inode tells copies with preserved timestamps apart, e.g. in a
+        # long-running daemon building several checkouts
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino, st.st_dev)
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        self._digests[path] = (stamp, digest.hexdigest())
+        return digest.hexdigest()
+
+    def digest_dependencies(self, paths: List[str]) -> List[Tuple[str, str]]:
+        """Return sorted (path, digest) pairs for the distinct ``paths``."""
+        return [(path, self.file_digest(path)) for path in sorted(set(paths))]
+
+    def dependencies_valid(self, dependencies: List[Tuple[str, str]]) -> bool:
+        """Check that every dependency still has the recorded content."""
+        try:
+            return all(self.file_digest(path) == digest for path, digest in dependencies)
+        except OSError:
+            return False
+
+    def _touch(self, path: str) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits in ``max_size``.
+
+        Temporary files of interrupted writes are removed as well.
+        :return: The number of bytes removed.
+        """
+        if self.max_size is None:
+            return 0
+        now = time.time()
+        entries = []
+        total = 0
+        removed = 0
+        stack = [self.directory]
+        while stack:
+            try:
+                scanner = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with scanner:
+                for entry in scanner:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry.name.endswith(".tmp"):
+                        if now - st.st_mtime > _STALE_TMP_AGE and self._remove(entry.path):
+                            removed += st.st_size
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+
+        if total <= self.max_size:
+            return removed
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if self._remove(path):
+                total -= size
+                removed += size
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+
+class _BoundedBuffer(io.BytesIO):
+    """In-memory file which fails writes beyond ``limit`` bytes and drops its content."""
+
+    def __init__(self, limit: Optional[int]) -> None:
+        super().__init__()
+        self.limit = limit
+
+    def write(self, data) -> int:
+        if self.limit is not None and self.tell() + len(data) > self.limit:
+            # The entry would be evicted right away; stop holding it
+            self.seek(0)
+            self.truncate()
+            raise OSError("Cache entry is larger than the cache")
+        return super().write(data)
+
+
+class MemoryArtifactCache(ArtifactCache):
+    """An `ArtifactCache` kept in memory, for processes running many builds.
+
+    Entries are the same as in a cache directory, but are lost when the
+    process exits. `evict` drops the least recently used entries beyond
+    ``max_size``. Entries may be read and stored from several threads, such
+    as the output writer of a streamed build.
+    """
+
+    def __init__(self, max_size: Optional[int] = DEFAULT_MAX_SIZE) -> None:
+        super().__init__("<memory>", max_size)
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_bytes(self, namespace: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get((namespace, key))
+            if data is not None:
+                self._entries.move_to_end((namespace, key))
+        return data
+
+    def open(self, namespace: str, key: str) -> Optional[BinaryIO]:
+        data = self.get_bytes(namespace, key)
+        return io.BytesIO(data) if data is not None else None
+
+    def put_bytes(self, namespace: str, key: str, data: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop((namespace, key), None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[(namespace, key)] = data
+            self._size += len(data)
+
+    @contextmanager
+    def tee(self, namespace: str, key: Optional[str], stream: TextIO) -> Iterator[_TeeStream]:
+        # Outputs larger than the whole cache are not buffered, e.g. with deferred assets
+        buffer = _BoundedBuffer(self.max_size)
+        tee = _TeeStream(stream, buffer, key)
+        yield tee
+        tee.flush_file()
+        if tee.complete and tee.key is not None:
+            self.put_bytes(namespace, tee.key, buffer.getvalue())
+
+    def evict(self) -> int:
+        if self.max_size is None:
+            return 0
+        removed = 0
+        with self._lock:
+            while self._size > self.max_size and self._entries:
+                _, data = self._entries.popitem(last=False)
+                self._size -= len(data)
+                removed += len(data)
+        return removed
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as ``500M`` or ``2G`` (binary units) into bytes."""
+    units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    text = value.strip().upper()
+    if text.endswith("B"):
+        text = text[:-1]
+    unit = text[-1:] if text[-1:] in units and not text[-1:].isdigit() else ""
+    number = text[:-1] if unit else text
+    try:
+        size = float(number) * units[unit]
+    except ValueError:
+        raise ValueError(f"Invalid size: '{value}'")
+    if size < 0:
+        raise ValueError(f"Invalid size: '{value}'")
+    return int(size)
+
+
+__all__ = [
+    "ArtifactCache",
+    "CACHE_FORMAT_VERSION",
+    "DEFAULT_MAX_SIZE",
+    "MemoryArtifactCache",
+    "parse_size",
+    "record_dependencies",
+    "record_dependency",
+    "rune_version",
+]
@@ -0,0 +1,378 @@
+"""Build-time expansion of Component usages.
+
+A component is defined once and used by name::
+
+    <Component name="NavItem">
+      <Component.Param name="href"></Component.Param>
+      <li><a href="Component.Param.href"><Component.Children></Component.Children></a></li>
+    </Component>
+
+    <NavItem href="/home">nav.home</NavItem>
+
+Clients normally expand every usage at render time. `ComponentExpander`
+expands the usages whose parameters are static while the bundle is built:
+
+1. The template is instantiated with the parameters: ``Component.Param.<name>``
+   values and ``<Component.Param.<name>>`` elements are replaced, asset
+   references which received a parameter value are resolved, and component
+   usages inside the template are expanded in turn. Instances are memoized
+   on (component, parameters), so each distinct usage is instantiated once.
+2. ``<Component.Children>`` in the instance is replaced with the body of the
+   usage, which has already been expanded.
+
+A usage is left as it is when one of its attributes is not a declared
+parameter of the component, is not a static value (e.g. still refers to a
+``Component.Param`` of an enclosing component), or when a parameter used by
+the template is missing. Component definitions are kept in the output, so
+clients can still expand the usages that were left.
+
+Expanded trees share unchanged subtrees (and memoized instances) with each
+other and with the component definitions; they must not be modified in place.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .asset_rules import AssetKeyMatcher, is_asset_path
+
+
+COMPONENT_TYPE = "Component"
+PARAM_TYPE = "Component.Param"
+CHILDREN_TYPE = "Component.Children"
+PARAM_PREFIX = "Component.Param."
+
+# (value, source file the value was written in)
+_Param = Tuple[Any, Optional[str]]
+
+
+class _Splice(list):
+    """Elements replacing one element of the parent list."""
+
+
+class ComponentDefinition:
+    """Compiled form of one ``Component`` item.
+
+    Attributes
+    -----------
+    name: str
+        The component name.
+    params: frozenset
+        Declared parameter names.
+    referenced: frozenset
+        Parameter names the template refers to.
+    template: List[Any]
+        The body of the component without the parameter declarations.
+    source: Optional[str]
+        The file the component was defined in.
+    """
+
+    __slots__ = ("name", "params", "referenced", "template", "source")
+
+    def __init__(self, item: Dict[str, Any], source: Optional[str] = None) -> None:
+        body = item.get("body")
+        if not isinstance(body, list):
+            body = [] if body is None else [body]
+        self.name = item["name"]
+        self.source = source
+        self.params = frozenset(
+            child["name"] for child in body
+            if isinstance(child, dict) and child.get("type") == PARAM_TYPE and isinstance(child.get("name"), str)
+        )
+        self.template = [
+            child for child in body
+            if not (isinstance(child, dict) and child.get("type") == PARAM_TYPE)
+        ]
+        self.referenced = frozenset(_referenced_params(self.template))
+
+
+class ExpansionStats:
+    """Counters describing one expansion pass.
+
+    Attributes
+    -----------
+    expanded: int
+        Number of usages replaced with their expansion.
+    cached: int
+        Number of expansions whose instance came from the memo.
+    skipped: int
+        Number of usages left as they are.
+    """
+
+    def __init__(self) -> None:
+        self.expanded = 0
+        self.cached = 0
+        self.skipped = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Expanded {self.expanded} component usages ({self.cached} from cache), "
+            f"left {self.skipped} as-is"
+        )
+
+
+def _param_name(value: Any) -> Optional[str]:
+    if isinstance(value, str) and value.startswith(PARAM_PREFIX):
+        return value[len(PARAM_PREFIX):]
+    return None
+
+
+def _referenced_params(template: List[Any]):
+    stack = [template]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            for key, child in value.items():
+                name = _param_name(child)
+                if name is not None:
+                    yield name
+                elif isinstance(child, (dict, list)):
+                    stack.append(child)
+        else:
+            for child in value:
+                name = _param_name(child)
+                if name is not None:
+                    yield name
+                elif isinstance(child, (dict, list)):
+                    stack.append(child)
+
+
+def _is_static(value: Any) -> bool:
+    return not isinstance(value, (dict, list)) and _param_name(value) is None
+
+
+def _rebuild(
+    root: Any,
+    on_string: Optional[Callable[[str], Any]],
+    on_element: Callable[[Dict[str, Any], Dict[str, Any]], Any],
+) -> Any:
+    """Rebuild ``root`` bottom-up.
+
+    ``on_string`` maps string values (other than ``type``). ``on_element`` is
+    called with the original and the rebuilt version of every dictionary, and
+    returns the replacement, or a `_Splice` of elements to insert in its place
+    when the dictionary is an item of a list. Only containers with a changed
+    descendant are copied. The tree is walked with an explicit stack.
+    """
+    done: Dict[int, Any] = {}
+    stack = [(root, False)]
+    while stack:
+        value, children_done = stack.pop()
+        if id(value) in done:
+            continue
+        if not children_done:
+            stack.append((value, True))
+            for child in (value.values() if isinstance(value, dict) else value):
+                if isinstance(child, (dict, list)) and id(child) not in done:
+                    stack.append((child, False))
+            continue
+
+        changed = False
+        if isinstance(value, dict):
+            new = {}
+            for key, child in value.items():
+                if isinstance(child, (dict, list)):
+                    new_child = done[id(child)]
+                    if isinstance(new_child, _Splice):
+                        # Only list items can be replaced with several elements
+                        new_child = child
+                elif on_string is not None and isinstance(child, str) and key != "type":
+                    new_child = on_string(child)
+                else:
+                    new_child = child
+                new[key] = new_child
+                changed = changed or new_child is not child
+            result = on_element(value, new if changed else value)
+        else:
+            new = []
+            for child in value:
+                if isinstance(child, (dict, list)):
+                    new_child = done[id(child)]
+                    if isinstance(new_child, _Splice):
+                        new.extend(new_child)
+                        changed = True
+                        continue
+                elif on_string is not None and isinstance(child, str):
+                    new_child = on_string(child)
+                else:
+                    new_child = child
+                new.append(new_child)
+                changed = changed or new_child is not child
+            result = new if changed else value
+        done[id(value)] = result
+    return done[id(root)]
+
+
+class ComponentExpander:
+    """Expands static Component usages in merged Rune data.
+
+    :param items: The merged top-level items, including the Component definitions.
+    :param sources: The source file of each item in ``items``, used to resolve
+        asset paths passed as parameters. When None, such values are left as they are.
+    :param matcher: Asset key rules deciding which properties reference assets.
+    :param resolve_asset: Called as ``resolve_asset(value, base_dir, source_file)`` to
+        load an asset reference which received its value from a parameter.
+    """
+
+    def __init__(
+        self,
+        items: List[Any],
+        sources: Optional[List[Optional[str]]] = None,
+        matcher: Optional[AssetKeyMatcher] = None,
+        resolve_asset: Optional[Callable[[str, str, str], Any]] = None,
+    ) -> None:
+        self.stats = ExpansionStats()
+        self._matcher = matcher
+        self._resolve_asset = resolve_asset
+        self._definitions: Dict[str, ComponentDefinition] = {}
+        for index, item in enumerate(items):
+            if self._is_definition(item):
+                source = sources[index] if sources is not None else None
+                self._definitions[item["name"]] = ComponentDefinition(item, source)
+        self._memo: Dict[Tuple, List[Any]] = {}
+        self._active: set = set()
+        self._reported_cycles: set = set()
+
+    @staticmethod
+    def _is_definition(item: Any) -> bool:
+        return isinstance(item, dict) and item.get("type") == COMPONENT_TYPE and isinstance(item.get("name"), str)
+
+    def expand(self, items: List[Any], sources: Optional[List[Optional[str]]] = None) -> List[Any]:
+        """Return a copy of ``items`` with static usages expanded; ``items`` is not modified."""
+        result: List[Any] = []
+        for index, item in enumerate(items):
+            if self._is_definition(item) or not isinstance(item, (dict, list)):
+                result.append(item)
+                continue
+            source = sources[index] if sources is not None else None
+
+            def expand_element(original, element, source=source):
+                definition = self._definitions.get(element.get("type"))
+                if definition is None:
+                    return element
+                expansion = self._expand_usage(definition, element, lambda key: source)
+                return element if expansion is None else _Splice(expansion)
+
+            expanded = _rebuild(item, None, expand_element)
+            if isinstance(expanded, _Splice):
+                result.extend(expanded)
+            else:
+                result.append(expanded)
+        return result
+
+    def _expand_usage(
+        self,
+        definition: ComponentDefinition,
+        usage: Dict[str, Any],
+        source_of: Callable[[str], Optional[str]],
+    ) -> Optional[List[Any]]:
+        params: Dict[str, _Param] = {}
+        for key, value in usage.items():
+            if key == "type" or key == "body":
+                continue
+            if key not in definition.params or not _is_static(value):
+                self.stats.skipped += 1
+                return None
+            params[key] = (value, source_of(key))
+        if not definition.referenced <= params.keys():
+            self.stats.skipped += 1
+            return None
+
+        # The type keeps 1 and True apart; the source matters for asset paths
+        memo_key = (definition.name, tuple(sorted(
+            (key, type(value), value, source) for key, (value, source) in params.items()
+        )))
+        instance = self._memo.get(memo_key)
+        if instance is not None:
+            self.stats.cached += 1
+        else:
+            if definition.name in self._active:
+                if definition.name not in self._reported_cycles:
+                    self._reported_cycles.add(definition.name)
+                    print(f"Component '{definition.name}' uses itself; leaving the inner usage as-is", file=sys.stderr)
+                self.stats.skipped += 1
+                return None
+            self._active.add(definition.name)
+            try:
+                instance = self._instantiate(definition, params)
+            finally:
+                self._active.discard(definition.name)
+            self._memo[memo_key] = instance
+
+        children = usage.get("body")
+        if children is None:
+            children = []
+        elif not isinstance(children, list):
+            children = [children]
+
+        def fill_children(original, element):
+            if element.get("type") == CHILDREN_TYPE:
+                return _Splice(children)
+            return element
+
+        self.stats.expanded += 1
+        return list(_rebuild(instance, None, fill_children))
+
+    def _instantiate(self, definition: ComponentDefinition, params: Dict[str, _Param]) -> List[Any]:
+        matcher = self._matcher
+        resolve_asset = self._resolve_asset
+
+        def substitute(value):
+            name = _param_name(value)
+            if name is not None and name in params:
+                return params[name][0]
+            return value
+
+        def param_source(original, key):
+            name = _param_name(original.get(key))
+            if name is not None and name in params:
+                return params[name][1]
+            return definition.source
+
+        def instantiate_element(original, element):
+            element_type = element.get("type")
+            name = _param_name(element_type)
+            if name is not None and name in params:
+                # <Component.Param.label /> is replaced with the value itself
+                return _Splice([params[name][0]])
+
+            if matcher is not None and resolve_asset is not None:
+                for key, value in original.items():
+                    name = _param_name(value)
+                    if (
+                        name is None or key == "type" or name not in params
+                        or not isinstance(element[key], str)
+                        or not is_asset_path(element[key])
+                        or not matcher.matches(element_type if isinstance(element_type, str) else None, key)
+                        # Parameters which are asset keys themselves were resolved when parsed
+                        or matcher.matches(definition.name, name)
+                    ):
+                        continue
+                    source = params[name][1]
+                    if source is None:
+                        continue
+                    if element is original:
+                        element = dict(element)
+                    element[key] = resolve_asset(element[key], os.path.dirname(source), source)
+
+            nested = self._definitions.get(element_type)
+            if nested is not None:
+                expansion = self._expand_usage(nested, element, lambda key: param_source(original, key))
+                if expansion is not None:
+                    return _Splice(expansion)
+            return element
+
+        return list(_rebuild(definition.template, substitute, instantiate_element))
+
+
+__all__ = [
+    "CHILDREN_TYPE",
+    "COMPONENT_TYPE",
+    "ComponentDefinition",
+    "ComponentExpander",
+    "ExpansionStats",
+    "PARAM_PREFIX",
+    "PARAM_TYPE",
+]
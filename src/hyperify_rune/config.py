@@ -1,6 +1,10 @@
 """Global configuration for Rune CLI and library."""
 
-from typing import Optional
+from typing import List, Optional
+
+from .asset_rules import DEFAULT_ASSET_KEY_RULES
+from .cache import DEFAULT_MAX_SIZE
+from .pipeline import DEFAULT_READ_WORKERS
 
 
 class RuneConfig:
@@ -10,11 +14,50 @@ class RuneConfig:
     -----------
     assetsPrefix: Optional[str]
         Prefix to prepend to emitted asset URLs. When None, no prefixing is applied.
+    optimizeAssets: bool
+        When True, SVG and PNG assets are losslessly optimized before embedding.
+    assetKeyRules: List[str]
+        Rules selecting the properties which reference asset files, e.g. ``src``,
+        ``*Image`` or ``img.src``. See `hyperify_rune.asset_rules`.
+    deferAssets: bool
+        When True, assets are not read while parsing; their data URLs are streamed
+        from disk in chunks when the output is written.
+    dedupe: bool
+        When True, identical subtrees are shared in memory and emitted once in a
+        ``shared`` table, with ``ref`` nodes at each occurrence.
+    cacheDir: Optional[str]
+        Directory of the build artifact cache (parsed files, optimized assets and outputs),
+        which may be shared between machines. When None, nothing is cached.
+    cacheMaxSize: Optional[int]
+        Size limit of the cache directory in bytes; least recently used entries are
+        evicted beyond it. When None, the cache is not limited.
+    expandComponents: bool
+        When True, Component usages with static parameters are expanded at build time.
+    prerenderLanguages: List[str]
+        Language codes to write pre-translated bundles for. When empty, a single bundle
+        with all translations is written to stdout.
+    prerenderOutput: str
+        Output path pattern for pre-translated bundles; ``{lang}`` and ``{ext}`` are replaced
+        with the language code and the output type.
+    ioWorkers: int
+        Number of threads reading source and asset files ahead of the parser. Output
+        is written on a separate thread while parsing continues. When 0, files are
+        read and output is written on the main thread.
     """
 
     def __init__(self) -> None:
         self.assetsPrefix: Optional[str] = None
         self.assetsDir: Optional[str] = None
+        self.optimizeAssets: bool = False
+        self.assetKeyRules: List[str] = list(DEFAULT_ASSET_KEY_RULES)
+        self.deferAssets: bool = False
+        self.dedupe: bool = False
+        self.cacheDir: Optional[str] = None
+        self.cacheMaxSize: Optional[int] = DEFAULT_MAX_SIZE
+        self.expandComponents: bool = False
+        self.prerenderLanguages: List[str] = []
+        self.prerenderOutput: str = "rune.{lang}.{ext}"
+        self.ioWorkers: int = DEFAULT_READ_WORKERS
 
 
 # Singleton config used across the package
@@ -0,0 +1,437 @@
+"""Build daemon running Rune builds for the CLI.
+
+Each ``rune`` invocation normally starts Python, imports the parser libraries
+and reads every source file before it can write anything. ``rune daemon``
+does that once and then serves builds on a local Unix socket:
+
+- The CLI sends its arguments and working directory to the daemon, which
+  runs the build there and streams stdout, stderr and the exit status back.
+  When no daemon is running, or ``RUNE_NO_DAEMON`` is set, the CLI builds
+  in-process as before.
+- The daemon keeps parse results, optimized assets and complete outputs in a
+  `hyperify_rune.cache.MemoryArtifactCache`, together with the content
+  hashes of the files they were built from, which are re-checked with a
+  ``stat`` per file. An unchanged build is answered from memory, and a build
+  with one changed file only parses that file again.
+
+Builds are run one at a time. The socket is only accessible to the user
+running the daemon. The daemon and its clients only use a socket in a
+directory owned by the current user and inaccessible to others, and clients
+only connect to a socket owned by their own user; otherwise the daemon
+refuses to start and clients build in-process. A client which does not send
+its request in time is dropped, so an idle connection cannot block other
+builds. Output is sent as fast as the client reads it, without a time limit,
+so a build piped into a pager is not cut short. When the installed Rune code
+changes, the daemon refuses further builds and exits, so clients never use
+outdated code. SIGTERM and SIGINT stop the daemon; a build running at that
+moment is interrupted and reported to its client as failed.
+
+Messages in both directions are frames of a one byte kind, a four byte
+big-endian length and the payload.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import tempfile
+from typing import Callable, List, Optional, Tuple
+
+
+# Client to daemon: a JSON request
+REQUEST = b"q"
+# Daemon to client: output, the exit status, or a request to build in-process
+STDOUT = b"o"
+STDERR = b"e"
+EXIT = b"x"
+FALLBACK = b"f"
+
+_HEADER = struct.Struct(">cI")
+
+# Output is sent in frames of up to this size
+_OUTPUT_BUFFER_SIZE = 256 * 1024
+
+# Seconds to wait for a client to send its request
+DEFAULT_CLIENT_TIMEOUT = 10.0
+
+# Environment variable which, when set to a non-empty value, makes the CLI build in-process
+NO_DAEMON_VARIABLE = "RUNE_NO_DAEMON"
+
+
+class DaemonStopped(BaseException):
+    """Raised in the daemon when it is asked to stop by a signal.
+
+    Derives from BaseException, like KeyboardInterrupt, so that error
+    handling in the build does not catch it.
+    """
+
+
+def default_socket_path() -> str:
+    """The socket of the current user's daemon."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "rune", "daemon.sock")
+    return os.path.join(tempfile.gettempdir(), f"rune-{os.getuid()}", "daemon.sock")
+
+
+def code_fingerprint() -> str:
+    """Identifies the installed Rune code, from the size and modification time of its modules."""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256(sys.version.encode("utf-8"))
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith(".py"):
+            st = os.stat(os.path.join(package_dir, name))
+            digest.update(f"{name}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def send_frame(sock: socket.socket, kind: bytes, payload: bytes) -> None:
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise EOFError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[bytes, bytes]:
+    kind, size = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return kind, _recv_exactly(sock, size)
+
+
+class _FrameWriter(io.RawIOBase):
+    """Binary stream sending everything written to it as frames of one kind."""
+
+    def __init__(self, sock: socket.socket, kind: bytes) -> None:
+        super().__init__()
+        self.sock: Optional[socket.socket] = sock
+        self.kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        if self.sock is not None:
+            send_frame(self.sock, self.kind, bytes(data))
+        return len(data)
+
+
+def _exit_status(code) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    # sys.exit("message")
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _private_directory(directory: str) -> bool:
+    """Whether ``directory`` is owned by the current user and inaccessible to other users,
+    so that nobody else can create or replace a socket in it."""
+    try:
+        st = os.lstat(directory)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _owned_socket(path: str) -> bool:
+    if not _private_directory(os.path.dirname(path) or "."):
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_uid == os.getuid()
+
+
+def _listen(path: str) -> socket.socket:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not _private_directory(directory):
+        raise RuntimeError(
+            f"The directory of the daemon socket, '{directory}', must be owned by the current user "
+            "and not accessible to other users"
+        )
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            # Left over from a daemon which did not exit cleanly
+            os.unlink(path)
+        else:
+            raise RuntimeError(f"A Rune daemon is already listening on '{path}'")
+        finally:
+            probe.close()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Only the current user may connect
+    umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    except OSError:
+        listener.close()
+        raise
+    finally:
+        os.umask(umask)
+    listener.listen(16)
+    return listener
+
+
+class BuildDaemon:
+    """Serves builds on a Unix socket.
+
+    :param socket_path: The socket to listen on; defaults to `default_socket_path`.
+    :param build: Runs one build with CLI arguments in the current directory,
+        writing to `sys.stdout` and `sys.stderr`; may raise `SystemExit`.
+    :param client_timeout: Seconds to wait for a client to send its request.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[str],
+        build: Callable[[List[str]], None],
+        client_timeout: Optional[float] = DEFAULT_CLIENT_TIMEOUT,
+    ) -> None:
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("The Rune daemon requires Unix domain sockets")
+        self.socket_path = socket_path or default_socket_path()
+        self.build = build
+        self.client_timeout = client_timeout
+        self.fingerprint = code_fingerprint()
+        # Set by a signal; the daemon exits after the current connection
+        self.stopping = False
+        # Whether a signal may raise DaemonStopped, i.e. while waiting for a
+        # connection or running a build; elsewhere it only sets `stopping`
+        self._interruptible = False
+        # The connection being handled
+        self._connection: Optional[socket.socket] = None
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+        if self._interruptible:
+            self._interruptible = False
+            raise DaemonStopped()
+        if self._connection is not None:
+            # Output has no time limit, so a client which stopped reading it
+            # would keep the daemon from exiting
+            try:
+                self._connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def serve(self) -> None:
+        """Serve builds until stopped by a client, SIGTERM or SIGINT."""
+        listener = _listen(self.socket_path)
+        socket_stat = os.stat(self.socket_path)
+        signals = [getattr(signal, name) for name in ("SIGTERM", "SIGINT") if hasattr(signal, name)]
+        previous_handlers = [(signum, signal.signal(signum, self._stop)) for signum in signals]
+        print(f"Rune daemon listening on {self.socket_path}", file=sys.stderr)
+        try:
+            while not self.stopping:
+                self._interruptible = True
+                try:
+                    conn, _ = listener.accept()
+                finally:
+                    self._interruptible = False
+                with conn:
+                    self._connection = conn
+                    try:
+                        if not self.handle(conn):
+                            break
+                    finally:
+                        self._connection = None
+        except DaemonStopped:
+            pass
+        finally:
+            for signum, handler in previous_handlers:
+                signal.signal(signum, handler)
+            listener.close()
+            # Unless another daemon has replaced the socket since
+            try:
+                st = os.stat(self.socket_path)
+                if (st.st_ino, st.st_dev) == (socket_stat.st_ino, socket_stat.st_dev):
+                    os.unlink(self.socket_path)
+            except OSError:
+                pass
+        print("Rune daemon stopped", file=sys.stderr)
+
+    def handle(self, conn: socket.socket) -> bool:
+        """Handle one connection; returns False when the daemon should stop."""
+        conn.settimeout(self.client_timeout)
+        try:
+            kind, payload = recv_frame(conn)
+            request = json.loads(payload.decode("utf-8")) if kind == REQUEST else None
+        except (OSError, EOFError, ValueError):
+            return True
+        if not isinstance(request, dict):
+            return True
+        # The client reads the output at its own pace, e.g. through a pager
+        conn.settimeout(None)
+
+        try:
+            if request.get("command") == "stop":
+                send_frame(conn, EXIT, b"0")
+                return False
+            if request.get("fingerprint") != self.fingerprint:
+                send_frame(conn, FALLBACK, b"Rune was updated after the daemon started")
+                return False
+            status = self.run(conn, request)
+            send_frame(conn, EXIT, str(status).encode("ascii"))
+        except OSError:
+            # The client went away
+            pass
+        return not self.stopping
+
+    def run(self, conn: socket.socket, request: dict) -> int:
+        """Run the build of ``request``, sending its output to ``conn``; returns the exit status."""
+        raw_stdout = _FrameWriter(conn, STDOUT)
+        raw_stderr = _FrameWriter(conn, STDERR)
+        stdout = io.TextIOWrapper(
+            io.BufferedWriter(raw_stdout, _OUTPUT_BUFFER_SIZE),
+            encoding=request.get("stdout_encoding") or "utf-8",
+        )
+        stderr = io.TextIOWrapper(
+            io.BufferedWriter(raw_stderr, _OUTPUT_BUFFER_SIZE),
+            encoding=request.get("stderr_encoding") or "utf-8",
+            errors="backslashreplace",
+            line_buffering=True,
+        )
+        saved = (sys.stdout, sys.stderr, os.getcwd())
+        sys.stdout, sys.stderr = stdout, stderr
+        status = 0
+        try:
+            os.chdir(request["cwd"])
+            self._interruptible = True
+            try:
+                if self.stopping:
+                    raise DaemonStopped()
+                self.build(list(request["argv"]))
+            finally:
+                self._interruptible = False
+        except SystemExit as e:
+            status = _exit_status(e.code)
+        except DaemonStopped:
+            # The client may have stopped reading, which would keep the daemon from exiting
+            conn.settimeout(self.client_timeout)
+            print("Error: The Rune daemon was stopped during the build", file=sys.stderr)
+            status = 1
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            status = 1
+        finally:
+            for stream in (stdout, stderr):
+                try:
+                    stream.flush()
+                except OSError:
+                    status = status or 1
+            # The streams may be flushed again when collected
+            raw_stdout.sock = raw_stderr.sock = None
+            sys.stdout, sys.stderr = saved[0], saved[1]
+            os.chdir(saved[2])
+        return status
+
+
+def run_in_daemon(argv: List[str], socket_path: Optional[str] = None) -> Optional[int]:
+    """Run the build with CLI arguments ``argv`` in the daemon listening on ``socket_path``.
+
+    Output is written to `sys.stdout` and `sys.stderr`.
+    :param socket_path: The daemon socket; defaults to `default_socket_path`.
+    :return: The exit status, or None when no daemon is available and the build should run in-process.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    socket_path = socket_path or default_socket_path()
+    if not _owned_socket(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(socket_path)
+            send_frame(sock, REQUEST, json.dumps({
+                "argv": argv,
+                "cwd": os.getcwd(),
+                "fingerprint": code_fingerprint(),
+                "stdout_encoding": getattr(sys.stdout, "encoding", None),
+                "stderr_encoding": getattr(sys.stderr, "encoding", None),
+            }).encode("utf-8"))
+        except OSError:
+            return None
+
+        stdout = getattr(sys.stdout, "buffer", None)
+        stderr = getattr(sys.stderr, "buffer", None)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        received = False
+        try:
+            while True:
+                kind, payload = recv_frame(sock)
+                if kind == STDOUT:
+                    received = True
+                    if stdout is not None:
+                        stdout.write(payload)
+                    else:
+                        sys.stdout.write(payload.decode(sys.stdout.encoding or "utf-8"))
+                elif kind == STDERR:
+                    received = True
+                    if stderr is not None:
+                        stderr.write(payload)
+                        stderr.flush()
+                    else:
+                        sys.stderr.write(payload.decode(sys.stderr.encoding or "utf-8"))
+                elif kind == EXIT:
+                    sys.stdout.flush()
+                    return int(payload)
+                elif kind == FALLBACK:
+                    return None
+        except (OSError, EOFError, ValueError):
+            if not received:
+                return None
+            sys.stdout.flush()
+            print("Error: Lost the connection to the Rune daemon", file=sys.stderr)
+            return 1
+
+
+def stop_daemon(socket_path: Optional[str] = None) -> bool:
+    """Ask the daemon listening on ``socket_path`` to exit; returns False if none is running."""
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    socket_path = socket_path or default_socket_path()
+    if not _owned_socket(socket_path):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+            send_frame(sock, REQUEST, json.dumps({"command": "stop"}).encode("utf-8"))
+            return recv_frame(sock)[0] == EXIT
+        except (OSError, EOFError):
+            return False
+
+
+__all__ = [
+    "BuildDaemon",
+    "DEFAULT_CLIENT_TIMEOUT",
+    "DaemonStopped",
+    "NO_DAEMON_VARIABLE",
+    "code_fingerprint",
+    "default_socket_path",
+    "recv_frame",
+    "run_in_daemon",
+    "send_frame",
+    "stop_daemon",
+]
@@ -0,0 +1,243 @@
+"""Hash-consing of identical subtrees in parsed Rune data.
+
+Generated views repeat the same structures (buttons, icons, footers) many
+times. `HashConsTable.intern` walks a tree bottom-up and replaces every
+dictionary, list and leaf value with one canonical object per distinct
+structure, so identical subtrees share memory. Each node is keyed by its own
+keys/leaf values plus the integer ids of its already-interned children, which
+keeps the pass linear in the size of the tree.
+
+`to_shared_output` then emits every shared subtree once in a
+``{"type": "shared", "data": [...]}`` table and replaces its occurrences with
+``{"type": "ref", "index": N}`` nodes, where N is the position in the table.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+SHARED_TYPE = "shared"
+REF_TYPE = "ref"
+
+# Subtrees with fewer nodes than this are cheaper to repeat than to reference
+DEFAULT_MIN_SHARED_SIZE = 4
+
+
+class DedupeStats:
+    """Counters describing one deduplication pass.
+
+    Attributes
+    -----------
+    total_nodes: int
+        Number of node occurrences in the input trees.
+    unique_nodes: int
+        Number of distinct nodes after hash-consing.
+    shared_subtrees: int
+        Number of subtrees emitted in the shared table.
+    """
+
+    def __init__(self) -> None:
+        self.total_nodes = 0
+        self.unique_nodes = 0
+        self.shared_subtrees = 0
+
+    @property
+    def ratio(self) -> float:
+        """Node occurrences per distinct node; 1.0 means nothing was deduplicated."""
+        return self.total_nodes / self.unique_nodes if self.unique_nodes else 1.0
+
+    def __str__(self) -> str:
+        return (
+            f"Deduplicated {self.total_nodes} nodes into {self.unique_nodes} unique nodes "
+            f"(ratio {self.ratio:.2f}x), {self.shared_subtrees} shared subtrees"
+        )
+
+
+class HashConsTable:
+    """Table of canonical nodes, shared by all trees interned through it."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[Tuple, int] = {}
+        self._nodes: List[Any] = []
+        self.stats = DedupeStats()
+
+    def _leaf_id(self, value: Any) -> int:
+        # The type is part of the key so that 1, 1.0 and True stay distinct
+        key = (type(value), value)
+        try:
+            node_id = self._ids.get(key)
+        except TypeError:
+            # Unhashable leaves (e.g. YAML sets) are kept as they are
+            self._nodes.append(value)
+            return len(self._nodes) - 1
+        if node_id is None:
+            node_id = self._ids[key] = len(self._nodes)
+            self._nodes.append(value)
+        return node_id
+
+    def intern(self, root: Any) -> Any:
+        """Return the canonical version of ``root``.
+
+        Containers are updated in place so that their children point to the
+        canonical objects. Canonical nodes may be referenced from several
+        places afterwards, so interned trees must not be mutated.
+        """
+        if not isinstance(root, (dict, list)):
+            self.stats.total_nodes += 1
+            node = self._nodes[self._leaf_id(root)]
+            self.stats.unique_nodes = len(self._nodes)
+            return node
+
+        ids = self._ids
+        nodes = self._nodes
+        stats = self.stats
+        # id(container) -> canonical node id, for containers finished in this call
+        done: Dict[int, int] = {}
+
+        stats.total_nodes += 1
+        stack: List[Tuple[Any, bool]] = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if id(node) in done:
+                continue
+            if not children_done:
+                stack.append((node, True))
+                for child in (node.values() if isinstance(node, dict) else node):
+                    if isinstance(child, (dict, list)) and id(child) not in done:
+                        stack.append((child, False))
+                continue
+
+            if isinstance(node, dict):
+                parts = []
+                for key, child in node.items():
+                    if isinstance(child, (dict, list)):
+                        child_id = done[id(child)]
+                    else:
+                        child_id = self._leaf_id(child)
+                    node[key] = nodes[child_id]
+                    parts.append((key, child_id))
+                key = (dict, tuple(parts))
+            else:
+                parts = []
+                for index, child in enumerate(node):
+                    if isinstance(child, (dict, list)):
+                        child_id = done[id(child)]
+                    else:
+                        child_id = self._leaf_id(child)
+                    node[index] = nodes[child_id]
+                    parts.append(child_id)
+                key = (list, tuple(parts))
+            stats.total_nodes += len(parts)
+
+            node_id = ids.get(key)
+            if node_id is None:
+                node_id = ids[key] = len(nodes)
+                nodes.append(node)
+            done[id(node)] = node_id
+
+        stats.unique_nodes = len(nodes)
+        return nodes[done[id(root)]]
+
+
+def _containers_post_order(items: List[Any]) -> List[Any]:
+    """Distinct containers reachable from ``items``, children before parents."""
+    order: List[Any] = []
+    visited = set()
+    stack: List[Tuple[Any, bool]] = [(item, False) for item in reversed(items) if isinstance(item, (dict, list))]
+    while stack:
+        node, children_done = stack.pop()
+        if children_done:
+            order.append(node)
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        stack.append((node, True))
+        for child in (node.values() if isinstance(node, dict) else node):
+            if isinstance(child, (dict, list)) and id(child) not in visited:
+                stack.append((child, False))
+    return order
+
+
+def to_shared_output(
+    items: List[Any],
+    stats: Optional[DedupeStats] = None,
+    min_size: int = DEFAULT_MIN_SHARED_SIZE,
+) -> List[Any]:
+    """Build the output list for interned ``items``.
+
+    Dictionaries referenced from more than one place, and with at least
+    ``min_size`` nodes, are moved to a shared table that is emitted as the
+    first element. The top-level items themselves always stay in place.
+    Input objects are not modified.
+    """
+    order = _containers_post_order(items)
+
+    # Subtree sizes and reference counts over the distinct containers
+    sizes: Dict[int, int] = {}
+    refs: Dict[int, int] = {}
+    for node in order:
+        size = 1
+        for child in (node.values() if isinstance(node, dict) else node):
+            if isinstance(child, (dict, list)):
+                size += sizes[id(child)]
+                refs[id(child)] = refs.get(id(child), 0) + 1
+            else:
+                size += 1
+        sizes[id(node)] = size
+
+    top_level = {id(item) for item in items}
+    shared_index: Dict[int, int] = {}
+    for node in order:
+        if (
+            isinstance(node, dict)
+            and id(node) not in top_level
+            and refs.get(id(node), 0) > 1
+            and sizes[id(node)] >= min_size
+        ):
+            shared_index[id(node)] = len(shared_index)
+
+    # Rebuild bottom-up, copying only containers whose children change
+    emitted: Dict[int, Any] = {}
+    table: List[Any] = [None] * len(shared_index)
+
+    def replacement(child: Any) -> Any:
+        if not isinstance(child, (dict, list)):
+            return child
+        index = shared_index.get(id(child))
+        if index is not None:
+            return {"type": REF_TYPE, "index": index}
+        return emitted[id(child)]
+
+    for node in order:
+        if isinstance(node, dict):
+            new_values = {key: replacement(child) for key, child in node.items()}
+            changed = any(new_values[key] is not child for key, child in node.items())
+            out = new_values if changed else node
+        else:
+            new_items = [replacement(child) for child in node]
+            changed = any(new is not old for new, old in zip(new_items, node))
+            out = new_items if changed else node
+        emitted[id(node)] = out
+        index = shared_index.get(id(node))
+        if index is not None:
+            table[index] = out
+
+    if stats is not None:
+        stats.shared_subtrees = len(table)
+
+    result = [emitted[id(item)] if isinstance(item, (dict, list)) else item for item in items]
+    if table:
+        result.insert(0, {"type": SHARED_TYPE, "data": table})
+    return result
+
+
+__all__ = [
+    "DEFAULT_MIN_SHARED_SIZE",
+    "DedupeStats",
+    "HashConsTable",
+    "REF_TYPE",
+    "SHARED_TYPE",
+    "to_shared_output",
+]
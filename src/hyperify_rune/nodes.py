@@ -0,0 +1,103 @@
+"""Compact node representation used while parsing.
+
+Parsed HTML, Markdown and TSX elements would otherwise each be stored as a
+plain dictionary. A `Node` stores the same information in three slots:
+
+- ``type``: the tag name, interned with `sys.intern`
+- ``attrs``: a flat tuple of alternating attribute keys and values, with the
+  keys (and class name tokens) interned
+- ``body``: the tuple of children, or None
+
+which takes a fraction of the memory of a dictionary and lets every repeated
+tag, attribute and class name share one string object. List values such as
+``classes`` are stored as tuples too, and equal class tuples are shared
+through `intern_tuple`; they become lists again in `node_to_dict`.
+
+Nodes are converted to dictionaries only where the rest of the pipeline needs
+them: `node_to_dict` converts one node for the output writer, and `to_plain`
+converts whole trees before passes that rewrite them.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+
+class Node:
+    """One parsed element.
+
+    The dictionary form of a node is ``{"type": type, **attrs, "body": body}``,
+    with ``body`` omitted when it is None and tuples turned into lists.
+    """
+
+    __slots__ = ("type", "attrs", "body")
+
+    def __init__(self, type: str, attrs: Tuple[Any, ...] = (), body: Optional[Tuple[Any, ...]] = None) -> None:
+        self.type = type
+        self.attrs = attrs
+        self.body = body
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Node):
+            return NotImplemented
+        return self.type == other.type and self.attrs == other.attrs and self.body == other.body
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Node({self.type!r}, {self.attrs!r}, {self.body!r})"
+
+
+@lru_cache(maxsize=4096)
+def intern_tuple(value: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    """Return a shared tuple equal to ``value`` (e.g. for repeated class lists)."""
+    return value
+
+
+def node_to_dict(node: Node) -> Dict[str, Any]:
+    """Convert one node to a dictionary; children are left as they are."""
+    result = {"type": node.type}
+    attrs = node.attrs
+    for index in range(0, len(attrs), 2):
+        value = attrs[index + 1]
+        result[attrs[index]] = list(value) if type(value) is tuple else value
+    if node.body is not None:
+        result["body"] = list(node.body)
+    return result
+
+
+def to_plain(value: Any) -> Any:
+    """Convert all nodes in ``value`` to dictionaries.
+
+    Lists and dictionaries in ``value`` are updated in place and the tree is
+    walked with an explicit stack, so trees of any depth can be converted.
+    """
+    if isinstance(value, Node):
+        value = node_to_dict(value)
+    if not isinstance(value, (dict, list)):
+        return value
+
+    stack = [value]
+    while stack:
+        container = stack.pop()
+        entries = container.items() if isinstance(container, dict) else enumerate(container)
+        replacements = []
+        for key, child in entries:
+            if isinstance(child, Node):
+                child = node_to_dict(child)
+                replacements.append((key, child))
+                stack.append(child)
+            elif isinstance(child, (dict, list)):
+                stack.append(child)
+        for key, child in replacements:
+            container[key] = child
+    return value
+
+
+__all__ = [
+    "Node",
+    "intern_tuple",
+    "node_to_dict",
+    "to_plain",
+]
@@ -0,0 +1,231 @@
+"""Serialization of the merged Rune data to JSON or YAML.
+
+`write_output` produces the same text as ``json.dumps(data, indent=2)`` or
+`hyperify_rune.yaml_loader.dump_yaml`, but writes it to a stream piece by
+piece. Parsed `Node` objects are converted to dictionaries one at a time as
+they are reached. `DeferredAsset` values in the tree are emitted as placeholders and
+replaced on the fly with their data URLs, streamed from disk by
+`hyperify_rune.assets.stream_data_url`, so large assets are never held in
+memory as complete strings.
+
+Output written piece by piece while parsing continues goes through
+`spooled_output`, so a failed build does not leave partial output behind.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator, List, TextIO
+
+import yaml
+
+from .assets import DeferredAsset, stream_data_url
+from .nodes import Node, node_to_dict
+from .yaml_loader import SafeDumper
+
+
+OUTPUT_TYPES = ("json", "yml")
+
+_SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class _Placeholders:
+    """Numbered placeholder strings for the deferred assets of one write."""
+
+    def __init__(self) -> None:
+        # Random per write, so no string in the document can collide with it
+        self.prefix = f"rune-deferred-{os.urandom(8).hex()}-"
+        self.assets: List[DeferredAsset] = []
+
+    def add(self, asset: DeferredAsset) -> str:
+        self.assets.append(asset)
+        return f"{self.prefix}{len(self.assets) - 1}"
+
+    def pattern(self, quote: str) -> "re.Pattern[str]":
+        return re.compile(f"{quote}{re.escape(self.prefix)}(\\d+){quote}")
+
+
+def _write_with_assets(chunks, pattern, placeholders: _Placeholders, stream: TextIO, quote: str) -> None:
+    write = stream.write
+    prefix = placeholders.prefix
+    for chunk in chunks:
+        if prefix not in chunk:
+            write(chunk)
+            continue
+        pos = 0
+        for match in pattern.finditer(chunk):
+            write(chunk[pos:match.start()])
+            write(quote)
+            stream_data_url(placeholders.assets[int(match.group(1))], write)
+            write(quote)
+            pos = match.end()
+        write(chunk[pos:])
+
+
+def _json_encoder(placeholders: _Placeholders) -> json.JSONEncoder:
+    def default(value):
+        if isinstance(value, Node):
+            return node_to_dict(value)
+        if isinstance(value, DeferredAsset):
+            return placeholders.add(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    return json.JSONEncoder(indent=2, default=default)
+
+
+def write_json(data: Any, stream: TextIO) -> None:
+    """Write ``data`` as indented JSON, followed by a newline."""
+    placeholders = _Placeholders()
+    encoder = _json_encoder(placeholders)
+    _write_with_assets(encoder.iterencode(data), placeholders.pattern('"'), placeholders, stream, '"')
+    stream.write("\n")
+
+
+def _yaml_text(data: Any, placeholders: _Placeholders) -> str:
+    class _Dumper(SafeDumper):
+        # Passes such as --dedupe and --expand-components share subtrees in
+        # memory; write them out in full as the JSON writer does
+        def ignore_aliases(self, data):
+            return True
+
+    def represent_deferred_asset(dumper, value):
+        # A plain scalar; data URLs are valid plain YAML scalars as well
+        return dumper.represent_scalar("tag:yaml.org,2002:str", placeholders.add(value))
+
+    def represent_node(dumper, value):
+        return dumper.represent_dict(node_to_dict(value))
+
+    _Dumper.add_representer(DeferredAsset, represent_deferred_asset)
+    _Dumper.add_representer(Node, represent_node)
+    return yaml.dump(data, Dumper=_Dumper, default_flow_style=False)
+
+
+def write_yaml(data: Any, stream: TextIO) -> None:
+    """Write ``data`` as block-style YAML, followed by a newline."""
+    placeholders = _Placeholders()
+    text = _yaml_text(data, placeholders)
+    _write_with_assets([text], placeholders.pattern(""), placeholders, stream, "")
+    stream.write("\n")
+
+
+def write_output(data: Any, output_type: str, stream: TextIO) -> None:
+    """Write ``data`` to ``stream`` in the given output type ('json' or 'yml')."""
+    if output_type == 'json':
+        write_json(data, stream)
+    elif output_type == 'yml':
+        write_yaml(data, stream)
+    else:
+        raise ValueError(f"Unsupported output type: '{output_type}'. Please use 'json' or 'yml'.")
+
+
+class EncodedItems:
+    """Items encoded by `ListWriter.encode`, which can be written again without encoding them.
+
+    Attributes
+    -----------
+    text: str
+        The encoded items.
+    count: int
+        The number of items.
+    """
+
+    __slots__ = ("text", "count")
+
+    def __init__(self, text: str, count: int) -> None:
+        self.text = text
+        self.count = count
+
+
+class ListWriter:
+    """Writes a top-level list one item at a time.
+
+    The result is the same text `write_output` produces for the whole list,
+    so items can be written as soon as they are parsed. Call `close` after
+    the last item.
+    """
+
+    def __init__(self, output_type: str, stream: TextIO) -> None:
+        if output_type not in OUTPUT_TYPES:
+            raise ValueError(f"Unsupported output type: '{output_type}'. Please use 'json' or 'yml'.")
+        self.output_type = output_type
+        self.stream = stream
+        self.count = 0
+
+    def _separator(self, index: int) -> str:
+        if self.output_type != 'json':
+            return ""
+        return ",\n  " if index else "[\n  "
+
+    def _write_item(self, item: Any, stream: TextIO) -> None:
+        placeholders = _Placeholders()
+        if self.output_type == 'json':
+            # Nested one level deeper than when encoded on its own; JSON
+            # strings never contain raw newlines
+            chunks = (
+                chunk.replace("\n", "\n  ")
+                for chunk in _json_encoder(placeholders).iterencode(item)
+            )
+            _write_with_assets(chunks, placeholders.pattern('"'), placeholders, stream, '"')
+        else:
+            text = _yaml_text([item], placeholders)
+            _write_with_assets([text], placeholders.pattern(""), placeholders, stream, "")
+
+    def write(self, item: Any) -> None:
+        self.stream.write(self._separator(self.count))
+        self._write_item(item, self.stream)
+        self.count += 1
+
+    def encode(self, items: List[Any]) -> EncodedItems:
+        """Encode ``items`` for `write_encoded`; nothing is written.
+
+        Deferred assets are encoded in full, so the text may be large.
+        """
+        buffer = io.StringIO()
+        for index, item in enumerate(items):
+            if index:
+                buffer.write(self._separator(index))
+            self._write_item(item, buffer)
+        return EncodedItems(buffer.getvalue(), len(items))
+
+    def write_encoded(self, encoded: EncodedItems) -> None:
+        """Write items encoded with `encode` by a writer of the same output type."""
+        if encoded.count:
+            self.stream.write(self._separator(self.count))
+            self.stream.write(encoded.text)
+            self.count += encoded.count
+
+    def close(self) -> None:
+        if self.output_type == 'json':
+            self.stream.write("\n]\n" if self.count else "[]\n")
+        else:
+            self.stream.write("\n" if self.count else "[]\n\n")
+
+
+@contextmanager
+def spooled_output(stream: TextIO) -> Iterator[TextIO]:
+    """Yield a text stream whose content is copied to ``stream`` when the block succeeds.
+
+    The content is kept in an anonymous temporary file, not in memory. When
+    the block raises, nothing is written to ``stream``.
+    """
+    with io.TextIOWrapper(tempfile.TemporaryFile(), encoding="utf-8", newline="") as spool:
+        yield spool
+        spool.seek(0)
+        for chunk in iter(lambda: spool.read(_SPOOL_CHUNK_SIZE), ""):
+            stream.write(chunk)
+
+
+__all__ = [
+    "EncodedItems",
+    "ListWriter",
+    "OUTPUT_TYPES",
+    "spooled_output",
+    "write_json",
+    "write_output",
+    "write_yaml",
+]
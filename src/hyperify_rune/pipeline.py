@@ -0,0 +1,317 @@
+"""Pipelined reading and writing around the parse stage.
+
+A build reads every source file and the assets they reference, parses them,
+and writes the result. On network file systems most of that time is spent
+waiting for reads, so the stages are overlapped:
+
+- `Prefetcher` reads source files on a thread pool ahead of the parser,
+  together with the asset files they appear to reference (found with a
+  quick regular expression scan). At most ``window`` files and ``max_bytes``
+  of file content are held ahead of the parser; files and assets which do
+  not fit are read by the parser when it reaches them.
+- The parser runs on the calling thread. `read_asset_bytes` serves asset
+  reads from the prefetched data of the file being parsed.
+- `BackgroundWriter` passes parsed items through a bounded queue to a writer
+  thread, so output is written while the next files are parsed. When the
+  queue is full the parser waits for the writer.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from .asset_rules import AssetKeyMatcher, is_asset_path
+
+
+DEFAULT_READ_WORKERS = 8
+
+# Files read ahead of the parser
+DEFAULT_READ_WINDOW = 32
+
+# Bytes of source and asset content held ahead of the parser
+DEFAULT_READ_BUDGET = 64 * 1024 * 1024
+
+# Parsed items waiting for the writer
+DEFAULT_WRITE_QUEUE_SIZE = 64
+
+# Larger assets are read when they are used, not ahead of time
+PREFETCH_ASSET_LIMIT = 4 * 1024 * 1024
+
+# key="value" / key='value' attributes and `key: value` YAML mappings
+_ATTRIBUTE_RE = re.compile(r"""([A-Za-z_][\w.-]*)\s*=\s*(?:"([^"\n]*)"|'([^'\n]*)')""")
+_YAML_RE = re.compile(r"""^[\s-]*([A-Za-z_][\w.-]*):[ \t]+["']?([^"'\n#]+?)["']?[ \t]*$""", re.MULTILINE)
+_MARKDOWN_IMAGE_RE = re.compile(r"!\[[^\]\n]*\]\(([^)\s]+)")
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def scan_asset_references(path: str, content: bytes, matcher: AssetKeyMatcher) -> List[str]:
+    """Return the paths of files ``content`` appears to reference as assets.
+
+    This is a heuristic used for prefetching only; the parser decides which
+    values are actually assets.
+    """
+    if path.endswith(".tsx"):
+        # TSX attributes are not resolved as assets when parsed
+        return []
+    text = content.decode("utf-8", "replace")
+    values = []
+    if path.endswith((".yml", ".yaml")):
+        values.extend(value for key, value in _YAML_RE.findall(text) if matcher.matches(None, key))
+    else:
+        values.extend(
+            double or single for key, double, single in _ATTRIBUTE_RE.findall(text)
+            if matcher.matches(None, key)
+        )
+        if path.endswith(".md"):
+            values.extend(_MARKDOWN_IMAGE_RE.findall(text))
+    base_dir = os.path.dirname(path)
+    return list(dict.fromkeys(os.path.join(base_dir, value) for value in values if is_asset_path(value)))
+
+
+class PrefetchedFile:
+    """A source file read ahead of the parser.
+
+    Attributes
+    -----------
+    path: str
+        The source file.
+    content: Optional[bytes]
+        Its content, or None if it could not be read; the parser then reads
+        the file itself and reports the error.
+    assets: Dict[str, bytes]
+        Content of the asset files it references, by path.
+    size: int
+        Bytes charged to the read budget for ``content`` and ``assets``.
+    """
+
+    __slots__ = ("path", "content", "assets", "size")
+
+    def __init__(self, path: str, content: Optional[bytes], assets: Dict[str, bytes], size: int = 0) -> None:
+        self.path = path
+        self.content = content
+        self.assets = assets
+        self.size = size
+
+
+class _ReadBudget:
+    """Bytes of prefetched content which may be held at a time, shared by the reader threads."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int) -> bool:
+        """Reserve ``size`` bytes; returns False if they do not fit."""
+        with self._lock:
+            if self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.used -= size
+
+
+def _read_within_budget(path: str, budget: Optional[_ReadBudget], max_size: Optional[int] = None) -> Optional[bytes]:
+    """Read ``path`` if it fits in ``budget`` and ``max_size``, charging its size; None otherwise.
+
+    Raises OSError when the file cannot be read.
+    """
+    size = os.stat(path).st_size
+    if max_size is not None and size > max_size:
+        return None
+    if budget is None:
+        return _read_file(path)
+    if not budget.acquire(size):
+        return None
+    try:
+        data = _read_file(path)
+    except BaseException:
+        budget.release(size)
+        raise
+    # The file may have changed since stat(); charge what was read
+    budget.release(size - len(data))
+    return data
+
+
+def _prefetch(path: str, matcher: Optional[AssetKeyMatcher], budget: Optional[_ReadBudget] = None) -> PrefetchedFile:
+    try:
+        content = _read_within_budget(path, budget)
+    except OSError:
+        content = None
+    if content is None:
+        # Left to the parser, which reads the file and reports errors itself
+        return PrefetchedFile(path, None, {})
+    size = len(content)
+    assets: Dict[str, bytes] = {}
+    if matcher is not None:
+        for asset_path in scan_asset_references(path, content, matcher):
+            if asset_path in assets:
+                continue
+            try:
+                data = _read_within_budget(asset_path, budget, PREFETCH_ASSET_LIMIT)
+            except OSError:
+                # Missing files are reported by the parser
+                continue
+            if data is not None:
+                assets[asset_path] = data
+                size += len(data)
+    return PrefetchedFile(path, content, assets, size)
+
+
+class Prefetcher:
+    """Reads ``files`` in order on a thread pool, keeping up to ``window`` files ahead.
+
+    Iterating yields a `PrefetchedFile` per file, in order. The content of a
+    file counts against ``max_bytes`` until the next file is requested. With
+    ``workers=0`` the files are read on the calling thread as they are
+    reached.
+
+    :param files: Source files, in the order they are parsed.
+    :param matcher: Asset key rules for the asset scan; None disables asset prefetching.
+    :param workers: Number of reader threads.
+    :param window: Maximum number of files read ahead of the consumer.
+    :param max_bytes: Maximum bytes of source and asset content held ahead of the consumer.
+    """
+
+    def __init__(
+        self,
+        files: List[str],
+        matcher: Optional[AssetKeyMatcher] = None,
+        workers: int = DEFAULT_READ_WORKERS,
+        window: int = DEFAULT_READ_WINDOW,
+        max_bytes: int = DEFAULT_READ_BUDGET,
+    ) -> None:
+        self.files = files
+        self.matcher = matcher
+        self.workers = workers
+        self.window = max(1, window)
+        self.max_bytes = max_bytes
+
+    def __iter__(self) -> Iterator[PrefetchedFile]:
+        if self.workers <= 0:
+            for path in self.files:
+                yield _prefetch(path, self.matcher)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rune-read")
+        budget = _ReadBudget(self.max_bytes)
+        pending: Deque = deque()
+        remaining = iter(self.files)
+
+        def fill() -> None:
+            # Files which do not fit in the budget are passed on unread
+            while len(pending) < self.window and (not pending or budget.used < budget.limit):
+                path = next(remaining, None)
+                if path is None:
+                    return
+                pending.append(executor.submit(_prefetch, path, self.matcher, budget))
+
+        try:
+            fill()
+            while pending:
+                prefetched = pending.popleft().result()
+                # Keep the window full while the consumer parses this file
+                fill()
+                yield prefetched
+                budget.release(prefetched.size)
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+# Prefetched asset maps of the files currently being parsed
+_active_assets: List[Dict[str, bytes]] = []
+
+
+@contextmanager
+def using_prefetched_assets(assets: Dict[str, bytes]) -> Iterator[None]:
+    """Serve `read_asset_bytes` calls within the block from ``assets`` where possible."""
+    _active_assets.append(assets)
+    try:
+        yield
+    finally:
+        _active_assets.pop()
+
+
+def read_asset_bytes(path: str) -> bytes:
+    """Return the content of the asset file at ``path``, prefetched if available."""
+    for assets in reversed(_active_assets):
+        data = assets.get(path)
+        if data is not None:
+            return data
+    return _read_file(path)
+
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """Calls ``write(item)`` on a writer thread for every item passed to `put`.
+
+    Items are passed through a queue of at most ``max_queued`` items; `put`
+    blocks while it is full. An exception raised by ``write`` is raised again
+    from the next `put` or from `close`.
+    """
+
+    def __init__(self, write: Callable[[Any], None], max_queued: int = DEFAULT_WRITE_QUEUE_SIZE) -> None:
+        self._write = write
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queued))
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="rune-write", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                # Keep draining so that put() never blocks after a failure
+                continue
+            try:
+                self._write(item)
+            except BaseException as e:
+                self._error = e
+
+    def put(self, item: Any) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def close(self) -> None:
+        """Wait until all items are written."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+__all__ = [
+    "BackgroundWriter",
+    "DEFAULT_READ_BUDGET",
+    "DEFAULT_READ_WINDOW",
+    "DEFAULT_READ_WORKERS",
+    "DEFAULT_WRITE_QUEUE_SIZE",
+    "PREFETCH_ASSET_LIMIT",
+    "PrefetchedFile",
+    "Prefetcher",
+    "read_asset_bytes",
+    "scan_asset_references",
+    "using_prefetched_assets",
+]
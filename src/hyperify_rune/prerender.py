@@ -0,0 +1,171 @@
+"""Build-time translation of Rune data into per-language bundles.
+
+A normal build emits translation keys (e.g. ``app.title``) in ``body`` text and
+attributes, together with an ``i18n`` table for every language, and clients
+resolve each string at render time. `prerender` instead substitutes the keys
+for one language while the bundle is built.
+
+Strings in element text and in the user-visible attributes listed in
+`TRANSLATED_KEYS` (``title``, ``alt`` and so on) are translated; identifiers
+such as ``name`` or ``id`` are not, even when they equal a translation key.
+Such a string is treated as a translation key when it is a key in the table
+of any language. `TranslationLookup` precomputes the union of all keys and the table
+of the target language once, so each string costs one or two dictionary
+lookups and substitution stays linear in the size of the bundle. Keys which
+exist for other languages but not for the target one are left as they are
+and counted in `TranslationLookup.missing`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from .nodes import Node
+
+
+# Properties whose strings are translated: element text, and the attributes
+# which hold text shown to the user. Other properties, such as ``name``,
+# ``id`` or ``href``, are identifiers and are never translated.
+TRANSLATED_KEYS = frozenset(("body", "title", "alt", "placeholder", "label", "aria-label"))
+
+_CONTAINERS = (dict, list, tuple, Node)
+_SEQUENCES = (list, tuple)
+
+
+class TranslationLookup:
+    """Precomputed translation lookup for one language.
+
+    Attributes
+    -----------
+    language: str
+        The target language code.
+    missing: Dict[str, int]
+        Translation keys which have no translation in ``language``, with the
+        number of times each one was seen.
+    """
+
+    def __init__(self, translations: Dict[str, Dict[str, Any]], language: str) -> None:
+        if language not in translations:
+            raise ValueError(f"No translations found for language '{language}'")
+        self.language = language
+        self.missing: Dict[str, int] = {}
+        self._table = translations[language]
+        known = set()
+        for table in translations.values():
+            known.update(table)
+        self._untranslated = frozenset(known.difference(self._table))
+
+    def resolve(self, value: str) -> Any:
+        """Return the translation of ``value``, or ``value`` if it is not a translated key."""
+        table = self._table
+        if value in table:
+            return table[value]
+        if value in self._untranslated:
+            self.missing[value] = self.missing.get(value, 0) + 1
+        return value
+
+
+def _children(value: Any, translated: bool):
+    """Yield (child, translated) for the children of a container.
+
+    A string child is translated when ``translated`` is true. Items of a list
+    or tuple inherit the flag of the list, while properties of an element
+    are translated when their key is in `TRANSLATED_KEYS`.
+    """
+    if isinstance(value, dict):
+        for key, child in value.items():
+            yield child, key in TRANSLATED_KEYS
+    elif isinstance(value, Node):
+        attrs = value.attrs
+        for index in range(0, len(attrs), 2):
+            yield attrs[index + 1], attrs[index] in TRANSLATED_KEYS
+        if value.body is not None:
+            for child in value.body:
+                yield child, True
+    else:
+        for child in value:
+            yield child, translated
+
+
+def _done_key(value: Any, translated: bool):
+    # Lists are translated differently depending on their key; elements are not
+    return id(value), translated and isinstance(value, _SEQUENCES)
+
+
+def prerender(items: List[Any], lookup: TranslationLookup) -> List[Any]:
+    """Return a copy of ``items`` with translation keys replaced.
+
+    Keys are replaced in element text and in the attributes named in
+    `TRANSLATED_KEYS`. Only containers with a translated descendant are
+    copied; unchanged subtrees are shared with ``items``, which is not
+    modified. The tree is walked with an explicit stack, so trees of any
+    depth can be translated.
+    """
+    # (id(container), translated) -> translated container, for containers finished so far
+    done: Dict[Any, Any] = {}
+
+    def replacement(child: Any, translated: bool) -> Any:
+        if isinstance(child, str):
+            return lookup.resolve(child) if translated else child
+        if isinstance(child, _CONTAINERS):
+            return done[_done_key(child, translated)]
+        return child
+
+    stack = [(items, False, False)]
+    while stack:
+        value, translated, children_done = stack.pop()
+        key = _done_key(value, translated)
+        if key in done:
+            continue
+        if not children_done:
+            stack.append((value, translated, True))
+            for child, child_translated in _children(value, translated):
+                if isinstance(child, _CONTAINERS) and _done_key(child, child_translated) not in done:
+                    stack.append((child, child_translated, False))
+            continue
+
+        if isinstance(value, dict):
+            new = {
+                name: replacement(child, name in TRANSLATED_KEYS)
+                for name, child in value.items()
+            }
+            changed = any(new[name] is not child for name, child in value.items())
+        elif isinstance(value, Node):
+            attrs = list(value.attrs)
+            for index in range(0, len(attrs), 2):
+                attrs[index + 1] = replacement(attrs[index + 1], attrs[index] in TRANSLATED_KEYS)
+            body = value.body
+            if body is not None:
+                body = tuple(replacement(child, True) for child in body)
+            changed = (
+                any(new is not old for new, old in zip(attrs, value.attrs))
+                or (body is not None and any(new is not old for new, old in zip(body, value.body)))
+            )
+            new = Node(value.type, tuple(attrs), body)
+        else:
+            new = [replacement(child, translated) for child in value]
+            changed = any(new_child is not child for new_child, child in zip(new, value))
+            if isinstance(value, tuple):
+                new = tuple(new)
+        done[key] = new if changed else value
+
+    return done[_done_key(items, False)]
+
+
+def report_missing_translations(lookup: TranslationLookup, stream) -> None:
+    """Write one line per missing translation key to ``stream``."""
+    for key in sorted(lookup.missing):
+        count = lookup.missing[key]
+        print(
+            f"Missing translation for '{key}' in language '{lookup.language}' "
+            f"({count} use{'s' if count != 1 else ''})",
+            file=stream,
+        )
+
+
+__all__ = [
+    "TRANSLATED_KEYS",
+    "TranslationLookup",
+    "prerender",
+    "report_missing_translations",
+]
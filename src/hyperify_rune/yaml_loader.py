@@ -0,0 +1,62 @@
+"""Fast YAML loading with libyaml.
+
+PyYAML ships a pure-Python parser and, when compiled against libyaml, a C
+implementation that is many times faster. This module picks the C
+``CSafeLoader``/``CSafeDumper`` when available and falls back to the pure
+Python ``SafeLoader``/``SafeDumper`` otherwise.
+
+Parsed files are cached by the parse namespace of
+`hyperify_rune.cache.ArtifactCache`, not here.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import yaml
+
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def load_yaml(content: bytes | str, name: str | None = None) -> Any:
+    """Parse a YAML document using the fastest available safe loader.
+
+    Syntax errors name the document ``name``, when given, instead of
+    ``"<byte string>"``.
+    """
+    try:
+        return yaml.load(content, Loader=SafeLoader)
+    except yaml.MarkedYAMLError as e:
+        if name is not None:
+            # Marks of the libyaml loader are read-only, so they are replaced
+            if e.context_mark is not None:
+                e.context_mark = _renamed_mark(e.context_mark, name)
+            if e.problem_mark is not None:
+                e.problem_mark = _renamed_mark(e.problem_mark, name)
+        raise
+
+
+def _renamed_mark(mark: Any, name: str) -> yaml.Mark:
+    return yaml.Mark(name, mark.index, mark.line, mark.column, None, None)
+
+
+def dump_yaml(data: Any) -> str:
+    """Serialize ``data`` as block-style YAML using the fastest available safe dumper."""
+    return yaml.dump(data, Dumper=SafeDumper, default_flow_style=False)
+
+
+def load_yaml_file(path: str) -> Any:
+    """Load the YAML file at ``path``."""
+    with open(path, "rb") as f:
+        return load_yaml(f.read(), path)
+
+
+__all__ = [
+    "SafeLoader",
+    "SafeDumper",
+    "load_yaml",
+    "dump_yaml",
+    "load_yaml_file",
+]
@@ -0,0 +1,152 @@
+import os
+import sys
+import base64
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest.mock import patch
+
+from hyperify_rune import asset_optimizer
+from hyperify_rune.asset_optimizer import optimize_asset, optimize_png, optimize_svg
+
+
+SVG = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- Created with Inkscape -->
+<svg xmlns="http://www.w3.org/2000/svg"
+     xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"
+     xmlns:sodipodi="http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd"
+     width="10" height="10" inkscape:version="1.3">
+  <metadata>
+    <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"/>
+  </metadata>
+  <sodipodi:namedview id="view"/>
+  <g>
+    <rect width="1" height="1"/>
+    <text>a <tspan>b</tspan> c</text>
+  </g>
+</svg>
+"""
+
+
+def _chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def _make_png(raw):
+    ihdr = struct.pack(">IIBBBBB", 100, 100, 8, 2, 0, 0, 0)
+    idat = zlib.compress(raw, 1)
+    return (
+        asset_optimizer.PNG_SIGNATURE
+        + _chunk(b"IHDR", ihdr)
+        + _chunk(b"tEXt", b"Comment\x00Created by an editor")
+        + _chunk(b"tRNS", b"\x00\x00\x00\x00\x00\x00")
+        + _chunk(b"IDAT", idat[:20])
+        + _chunk(b"IDAT", idat[20:])
+        + _chunk(b"IEND", b"")
+    )
+
+
+# 100x100 RGB image, filter type 0 on each row
+RAW_PIXELS = (b"\x00" + b"\x10\x20\x30" * 100) * 100
+
+
+class TestSvgOptimization(unittest.TestCase):
+    def test_strips_comments_metadata_editor_data_and_whitespace(self):
+        result = optimize_svg(SVG)
+        self.assertEqual(
+            result,
+            b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10">'
+            b'<g><rect width="1" height="1"/><text>a <tspan>b</tspan> c</text></g></svg>',
+        )
+
+    def test_documents_declaring_entities_are_unchanged(self):
+        svg = (
+            b'<?xml version="1.0"?>\n'
+            b'<!DOCTYPE svg [<!ENTITY st0 "fill:#f00;">]>\n'
+            b'<svg xmlns="http://www.w3.org/2000/svg">\n  <rect style="&st0;"/>\n</svg>\n'
+        )
+        self.assertEqual(optimize_svg(svg), svg)
+
+    def test_keeps_whitespace_of_preserved_and_foreign_content(self):
+        svg = (
+            b'<svg xmlns="http://www.w3.org/2000/svg">\n'
+            b'  <g xml:space="preserve"> <rect/> </g>\n'
+            b'  <foreignObject><div xmlns="http://www.w3.org/1999/xhtml"><b>x</b> <i>y</i></div></foreignObject>\n'
+            b'</svg>'
+        )
+        self.assertEqual(
+            optimize_svg(svg),
+            b'<svg xmlns="http://www.w3.org/2000/svg"><g xml:space="preserve"> <rect/> </g>'
+            b'<foreignObject><div xmlns="http://www.w3.org/1999/xhtml"><b>x</b> <i>y</i></div></foreignObject></svg>',
+        )
+
+    def test_invalid_svg_raises(self):
+        with self.assertRaises(ValueError):
+            optimize_svg(b"<svg>")
+
+
+class TestPngOptimization(unittest.TestCase):
+    def test_recompresses_idat_and_strips_metadata_chunks(self):
+        png = _make_png(RAW_PIXELS)
+        result = optimize_png(png)
+        self.assertLess(len(result), len(png))
+
+        chunks = list(asset_optimizer._iter_png_chunks(result))
+        self.assertEqual([t for t, _ in chunks], [b"IHDR", b"tRNS", b"IDAT", b"IEND"])
+        idat = b"".join(d for t, d in chunks if t == b"IDAT")
+        self.assertEqual(zlib.decompress(idat), RAW_PIXELS)
+
+    def test_corrupt_png_raises(self):
+        png = bytearray(_make_png(RAW_PIXELS))
+        png[20] ^= 0xFF
+        with self.assertRaises(ValueError):
+            optimize_png(bytes(png))
+
+
+class TestOptimizeAsset(unittest.TestCase):
+    def setUp(self):
+        asset_optimizer.clear_cache()
+
+    def test_unsupported_and_invalid_inputs_are_returned_unchanged(self):
+        self.assertEqual(optimize_asset(b"GIF89a", "gif"), b"GIF89a")
+        self.assertEqual(optimize_asset(b"not a png", "png"), b"not a png")
+
+    def test_results_are_cached_by_content_hash(self):
+        with patch.dict(asset_optimizer._OPTIMIZERS, {"svg": lambda data: b"<svg/>"}):
+            optimize_asset(SVG, "SVG")
+            optimize_asset(SVG, "svg")
+        self.assertEqual(len(asset_optimizer._cache), 1)
+
+    def test_cache_is_bounded(self):
+        svgs = [SVG.replace(b'width="10"', f'width="{index}"'.encode("ascii")) for index in range(10)]
+        limit = 2 * len(optimize_svg(svgs[0]))
+        with patch.object(asset_optimizer, "CACHE_MAX_SIZE", limit):
+            for svg in svgs:
+                optimize_asset(svg, "svg")
+        self.assertEqual(len(asset_optimizer._cache), 2)
+        self.assertLessEqual(asset_optimizer._cache_size, limit)
+
+        asset_optimizer.clear_cache()
+        optimize_asset(SVG, "svg", cache=False)
+        self.assertEqual(len(asset_optimizer._cache), 0)
+
+    def test_embed_images_uses_optimized_bytes_when_enabled(self):
+        from hyperify_rune import embed_images
+        from hyperify_rune.config import config as rune_config
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "logo.svg"), "wb") as f:
+                f.write(SVG)
+            data = [{"type": "img", "src": "logo.svg"}]
+            with patch.object(rune_config, "optimizeAssets", True), \
+                    patch.object(sys, "stderr") as stderr:
+                embed_images(data, tmpdir, "view.yml")
+            self.assertIn("Optimized asset", "".join(c.args[0] for c in stderr.write.call_args_list))
+
+        encoded = data[0]["src"].split(",", 1)[1]
+        self.assertEqual(base64.b64decode(encoded), optimize_svg(SVG))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from hyperify_rune import embed_images, html_to_data_structure
+from hyperify_rune.asset_rules import AssetKeyMatcher, DEFAULT_ASSET_KEY_RULES, is_asset_path
+from hyperify_rune.config import config as rune_config
+from hyperify_rune.daemon import NO_DAEMON_VARIABLE
+
+
+class TestAssetKeyMatcher(unittest.TestCase):
+    def test_default_rules(self):
+        matcher = AssetKeyMatcher(DEFAULT_ASSET_KEY_RULES)
+        for key in ("image", "heroImage", "ImageLeft", "src"):
+            self.assertTrue(matcher.matches("div", key), key)
+        for key in ("images", "href", "title", "source"):
+            self.assertFalse(matcher.matches("div", key), key)
+
+    def test_node_type_rules_only_match_that_type(self):
+        matcher = AssetKeyMatcher(["a.href", "Card.*Icon"])
+        self.assertTrue(matcher.matches("a", "href"))
+        self.assertFalse(matcher.matches("link", "href"))
+        self.assertFalse(matcher.matches(None, "href"))
+        self.assertTrue(matcher.matches("Card", "leftIcon"))
+        self.assertFalse(matcher.matches("a", "leftIcon"))
+
+    def test_urls_are_not_asset_paths(self):
+        for value in ("https://example.com", "mailto:info@example.com", "data:image/png;base64,AA",
+                      "//cdn.example.com/a.png", "#top", "Component.Param.icon", ""):
+            self.assertFalse(is_asset_path(value), value)
+        for value in ("logo.png", "img/logo.png", "../logo.png", "C:/logo.png"):
+            self.assertTrue(is_asset_path(value), value)
+
+    def test_invalid_rules_raise(self):
+        for rule in ("", "img.", "a*b"):
+            with self.assertRaises(ValueError, msg=rule):
+                AssetKeyMatcher([rule])
+
+
+class TestAssetResolution(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.tmpdir.name, "manual.pdf"), "wb") as f:
+            f.write(b"pdf")
+        with open(os.path.join(self.tmpdir.name, "logo.png"), "wb") as f:
+            f.write(b"png")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_html_assets_are_resolved_while_parsing(self):
+        html = (
+            '<View><img src="logo.png"/><a href="manual.pdf">Manual</a>'
+            '<Foo href="manual.pdf" onClick=\'{"image": "logo.png"}\'/>'
+            '<img src="Component.Param.icon"/></View>'
+        )
+        with patch.object(rune_config, "assetKeyRules", list(DEFAULT_ASSET_KEY_RULES) + ["a.href"]):
+            data = html_to_data_structure(html, self.tmpdir.name, "view.html")
+        body = data[0]["body"]
+        self.assertEqual(body[0]["src"], "data:image/png;base64,cG5n")
+        self.assertEqual(body[1]["href"], "data:application/pdf;base64,cGRm")
+        self.assertEqual(body[2]["href"], "manual.pdf")
+        self.assertEqual(body[2]["onClick"], {"image": "data:image/png;base64,cG5n"})
+        self.assertEqual(body[3]["src"], "Component.Param.icon")
+
+    def test_html_onclick_array_assets_are_resolved(self):
+        html = '<View><Foo onClick=\'[{"image": "logo.png"}, "open"]\'/></View>'
+        data = html_to_data_structure(html, self.tmpdir.name, "view.html")
+        self.assertEqual(data[0]["body"][0]["onClick"], [{"image": "data:image/png;base64,cG5n"}, "open"])
+
+    def test_links_are_left_untouched(self):
+        html = (
+            '<View><a href="https://example.com">a</a><a href="mailto:info@example.com">b</a>'
+            '<a href="#top">c</a><a href="//example.com/x">d</a></View>'
+        )
+        with patch.object(rune_config, "assetKeyRules", ["a.href"]):
+            data = html_to_data_structure(html, self.tmpdir.name, "view.html")
+        self.assertEqual(
+            [item["href"] for item in data[0]["body"]],
+            ["https://example.com", "mailto:info@example.com", "#top", "//example.com/x"],
+        )
+
+    def test_html_is_left_untouched_without_base_dir(self):
+        data = html_to_data_structure('<img src="missing.png"/>')
+        self.assertEqual(data, [{"type": "img", "src": "missing.png"}])
+
+    def test_missing_asset_raises_file_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            html_to_data_structure('<div><img src="missing.png"/></div>', self.tmpdir.name, "view.html")
+
+    def test_yaml_data_uses_configured_rules(self):
+        data = [{"type": "Download", "file": "manual.pdf", "body": [{"type": "img", "src": "logo.png"}]}]
+        with patch.object(rune_config, "assetKeyRules", ["Download.file"]):
+            embed_images(data, self.tmpdir.name, "view.yml")
+        self.assertEqual(data[0]["file"], "data:application/pdf;base64,cGRm")
+        self.assertEqual(data[0]["body"][0]["src"], "logo.png")
+
+
+class TestAssetKeyCLI(unittest.TestCase):
+    def setUp(self):
+        # Build in-process even when a Rune daemon is running
+        environ = patch.dict(os.environ, {NO_DAEMON_VARIABLE: "1"})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def _run(self, argv):
+        from hyperify_rune import __main__ as cli
+        with patch.object(cli, "process_files", return_value=None):
+            with patch.object(sys, "argv", ["rune"] + argv + ["some_dir", "json"]):
+                cli.main()
+        return rune_config.assetKeyRules
+
+    def test_asset_keys_extend_defaults(self):
+        rules = self._run(["--asset-key", "a.href", "--asset-key", "*Icon"])
+        self.assertEqual(rules, list(DEFAULT_ASSET_KEY_RULES) + ["a.href", "*Icon"])
+
+    def test_defaults_can_be_disabled(self):
+        self.assertEqual(self._run(["--no-default-asset-keys", "--asset-key", "src"]), ["src"])
+        self.assertEqual(self._run([]), list(DEFAULT_ASSET_KEY_RULES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+import contextlib
+import io
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import unittest
+from collections import OrderedDict
+from unittest.mock import patch
+
+import hyperify_rune
+from hyperify_rune import get_all_files_with_extension, process_files
+from hyperify_rune.assets import DeferredAsset
+from hyperify_rune.cache import ArtifactCache, MemoryArtifactCache, parse_size, record_dependencies, record_dependency
+from hyperify_rune.config import config as rune_config
+from hyperify_rune.nodes import Node
+
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = ArtifactCache(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_keys_depend_on_every_part(self):
+        self.assertEqual(self.cache.key("a", b"x", [1]), self.cache.key("a", b"x", [1]))
+        self.assertNotEqual(self.cache.key("a", b"x"), self.cache.key("a", b"y"))
+        self.assertNotEqual(self.cache.key("ab", "c"), self.cache.key("a", "bc"))
+
+    def test_roundtrip_of_parse_results(self):
+        value = ([("a.png", "00")], [Node("p", ("classes", ("x",)), ("text",)), {"src": DeferredAsset("a.png", "image/png")}])
+        self.cache.put("parse", "k" * 64, value)
+        self.assertEqual(self.cache.get("parse", "k" * 64), value)
+        self.assertIsNone(self.cache.get("parse", "m" * 64))
+
+    def test_unexpected_classes_are_not_loaded(self):
+        self.cache.put_bytes("parse", "k" * 64, pickle.dumps(OrderedDict(a=1)))
+        self.assertIsNone(self.cache.get("parse", "k" * 64))
+
+    def test_tee_stores_entry_only_on_success(self):
+        out = io.StringIO()
+        with self.cache.tee("bundles", "a" * 64, out) as stream:
+            stream.write("hello ")
+            stream.write("wörld")
+        self.assertEqual(out.getvalue(), "hello wörld")
+        self.assertEqual(self.cache.get_bytes("bundles", "a" * 64), "hello wörld".encode("utf-8"))
+
+        with self.assertRaises(RuntimeError):
+            with self.cache.tee("bundles", "b" * 64, io.StringIO()) as stream:
+                stream.write("partial")
+                raise RuntimeError("failed")
+        self.assertIsNone(self.cache.get_bytes("bundles", "b" * 64))
+        leftovers = [name for _, _, names in os.walk(self._tmp.name) for name in names if name.endswith(".tmp")]
+        self.assertEqual(leftovers, [])
+
+    def test_tee_key_can_be_set_while_writing(self):
+        with self.cache.tee("bundles", None, io.StringIO()) as stream:
+            stream.write("streamed")
+            stream.key = "c" * 64
+        self.assertEqual(self.cache.get_bytes("bundles", "c" * 64), b"streamed")
+
+        # Without a key nothing is stored
+        with self.cache.tee("bundles", None, io.StringIO()) as stream:
+            stream.write("dropped")
+        entries = [name for _, _, names in os.walk(os.path.join(self._tmp.name, "bundles")) for name in names]
+        self.assertEqual(entries, ["c" * 64])
+
+    def test_evict_removes_least_recently_used(self):
+        cache = ArtifactCache(self._tmp.name, max_size=250)
+        for index, key in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+            cache.put_bytes("assets", key, b"x" * 100)
+            path = os.path.join(self._tmp.name, "assets", key[:2], key)
+            os.utime(path, (1000 + index, 1000 + index))
+        # Reading an entry makes it the most recently used one
+        self.assertIsNotNone(cache.get_bytes("assets", "a" * 64))
+        self.assertEqual(cache.evict(), 100)
+        self.assertIsNone(cache.get_bytes("assets", "b" * 64))
+        self.assertIsNotNone(cache.get_bytes("assets", "a" * 64))
+        self.assertIsNotNone(cache.get_bytes("assets", "c" * 64))
+
+    def test_dependencies(self):
+        path = os.path.join(self._tmp.name, "logo.svg")
+        with open(path, "wb") as f:
+            f.write(b"<svg/>")
+        with record_dependencies() as outer:
+            with record_dependencies() as inner:
+                record_dependency(path)
+        self.assertEqual(outer, [path])
+        self.assertEqual(inner, [path])
+        dependencies = self.cache.digest_dependencies(inner + inner)
+        self.assertEqual(len(dependencies), 1)
+        self.assertTrue(self.cache.dependencies_valid(dependencies))
+        with open(path, "wb") as f:
+            f.write(b"<svg></svg>")
+        self.assertFalse(self.cache.dependencies_valid(dependencies))
+
+    def test_memory_cache(self):
+        cache = MemoryArtifactCache(max_size=250)
+        cache.put("parse", "k" * 64, [Node("p", (), ("text",))])
+        self.assertEqual(cache.get("parse", "k" * 64), [Node("p", (), ("text",))])
+        with cache.tee("bundles", None, io.StringIO()) as stream:
+            stream.write("x" * 100)
+            stream.key = "a" * 64
+        self.assertEqual(cache.open("bundles", "a" * 64).read(), b"x" * 100)
+
+        cache.put_bytes("assets", "b" * 64, b"y" * 100)
+        # Reading an entry makes it the most recently used one
+        self.assertIsNotNone(cache.get_bytes("bundles", "a" * 64))
+        cache.put_bytes("assets", "c" * 64, b"z" * 100)
+        self.assertGreater(cache.evict(), 0)
+        self.assertIsNone(cache.get("parse", "k" * 64))
+        self.assertIsNone(cache.get_bytes("assets", "b" * 64))
+        self.assertIsNotNone(cache.get_bytes("bundles", "a" * 64))
+        self.assertIsNotNone(cache.get_bytes("assets", "c" * 64))
+
+    def test_memory_cache_does_not_buffer_outputs_larger_than_the_cache(self):
+        cache = MemoryArtifactCache(max_size=1000)
+        out = io.StringIO()
+        with patch("hyperify_rune.cache._TEE_BATCH_SIZE", 100):
+            with cache.tee("bundles", "a" * 64, out) as stream:
+                for _ in range(20):
+                    stream.write("x" * 100)
+                self.assertIsNone(stream.file)
+        self.assertEqual(out.getvalue(), "x" * 2000)
+        self.assertIsNone(cache.get_bytes("bundles", "a" * 64))
+
+    def test_memory_cache_size_is_kept_across_threads(self):
+        cache = MemoryArtifactCache(max_size=None)
+
+        def put(namespace):
+            for index in range(2000):
+                cache.put_bytes(namespace, f"{index % 50:064d}", b"x" * (index % 7))
+
+        threads = [threading.Thread(target=put, args=(namespace,)) for namespace in ("parse", "fragments", "assets")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache._size, sum(len(data) for data in cache._entries.values()))
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("1024"), 1024)
+        self.assertEqual(parse_size("500M"), 500 * 1024 ** 2)
+        self.assertEqual(parse_size("2gb"), 2 * 1024 ** 3)
+        with self.assertRaises(ValueError):
+            parse_size("lots")
+
+
+class TestCachedBuild(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        os.makedirs(os.path.join(self.src, "views", "img"))
+        with open(os.path.join(self.src, "views", "Home.html"), "w") as f:
+            f.write('<View name="Home"><img src="img/logo.svg"/><p>home.text</p></View>')
+        with open(os.path.join(self.src, "About.html"), "w") as f:
+            f.write('<View name="About"><p>about.text</p></View>')
+        self.write_logo(b"<svg/>")
+        self._saved = rune_config.cacheDir
+        rune_config.cacheDir = os.path.join(self._tmp.name, "cache")
+
+    def tearDown(self):
+        rune_config.cacheDir = self._saved
+        self._tmp.cleanup()
+
+    def write_logo(self, data):
+        with open(os.path.join(self.src, "views", "img", "logo.svg"), "wb") as f:
+            f.write(data)
+
+    def build(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out), patch.object(sys, "stderr", io.StringIO()):
+            process_files(self.src, "json", os.path.join(self.src, "translations"))
+        return out.getvalue()
+
+    def test_cached_build_output_is_identical(self):
+        first = self.build()
+        with patch.object(hyperify_rune, "parse_html_file", side_effect=AssertionError("not cached")):
+            self.assertEqual(self.build(), first)
+
+    def test_cached_build_is_reused_with_other_io_settings(self):
+        first = self.build()
+        with patch.object(rune_config, "ioWorkers", 0), patch.object(rune_config, "deferAssets", True), \
+                patch.object(hyperify_rune, "parse_html_file", side_effect=AssertionError("not cached")):
+            self.assertEqual(self.build(), first)
+        cache = ArtifactCache(rune_config.cacheDir)
+        key = hyperify_rune.build_cache_key(cache, [], self.src, "json")
+        with patch.object(rune_config, "assetsPrefix", "/static/"):
+            self.assertNotEqual(hyperify_rune.build_cache_key(cache, [], self.src, "json"), key)
+
+    def test_changed_asset_invalidates_cached_results(self):
+        first = self.build()
+        self.write_logo(b"<svg><rect/></svg>")
+        second = self.build()
+        self.assertNotEqual(first, second)
+        rune_config.cacheDir = None
+        self.assertEqual(self.build(), second)
+
+    def test_only_changed_files_are_parsed_again(self):
+        self.build()
+        with open(os.path.join(self.src, "About.html"), "w") as f:
+            f.write('<View name="About"><p>about.changed</p></View>')
+        parsed = []
+        original = hyperify_rune.parse_html_file
+
+        def parse_html_file(file, *args, **kwargs):
+            parsed.append(file)
+            return original(file, *args, **kwargs)
+
+        with patch.object(hyperify_rune, "parse_html_file", parse_html_file):
+            second = self.build()
+        self.assertEqual(parsed, [os.path.join(self.src, "About.html")])
+        rune_config.cacheDir = None
+        self.assertEqual(self.build(), second)
+
+    def test_files_are_collected_in_sorted_order(self):
+        files = get_all_files_with_extension(self.src, ".html")
+        self.assertEqual(files, [os.path.join(self.src, "About.html"), os.path.join(self.src, "views", "Home.html")])
+
+
+if __name__ == '__main__':
+    unittest.main()
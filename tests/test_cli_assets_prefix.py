@@ -1,9 +1,18 @@
+import os
 import sys
 import unittest
 from unittest.mock import patch
 
+from hyperify_rune.daemon import NO_DAEMON_VARIABLE
+
 
 class TestAssetsPrefixCLI(unittest.TestCase):
+    def setUp(self):
+        # Build in-process even when a Rune daemon is running
+        environ = patch.dict(os.environ, {NO_DAEMON_VARIABLE: "1"})
+        environ.start()
+        self.addCleanup(environ.stop)
+
     def test_parser_exposes_assets_prefix_option(self):
         from hyperify_rune import __main__ as cli
         self.assertTrue(hasattr(cli, "create_parser"), "CLI should expose create_parser()")
@@ -0,0 +1,119 @@
+import base64
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from hyperify_rune import html_to_data_structure, load_asset_data_url
+from hyperify_rune.asset_rules import AssetKeyMatcher, DEFAULT_ASSET_KEY_RULES
+from hyperify_rune.components import ComponentExpander
+
+
+NAV_ITEM = (
+    '<Component name="NavItem">'
+    '<Component.Param name="href"></Component.Param>'
+    '<li><a href="Component.Param.href"><Component.Children></Component.Children></a></li>'
+    '</Component>'
+)
+
+
+def expand(html, sources=None, matcher=None, resolve_asset=None):
+    items = html_to_data_structure(html)
+    expander = ComponentExpander(items, sources, matcher, resolve_asset)
+    return expander.expand(items, sources), expander.stats
+
+
+class TestComponentExpansion(unittest.TestCase):
+    def test_expands_params_and_children(self):
+        result, stats = expand(NAV_ITEM + '<View name="Home"><ul><NavItem href="/home">nav.home</NavItem></ul></View>')
+        # The definition is kept for clients
+        self.assertEqual(result[0]["type"], "Component")
+        self.assertEqual(result[1], {"type": "View", "name": "Home", "body": [
+            {"type": "ul", "body": [
+                {"type": "li", "body": [{"type": "a", "href": "/home", "body": ["nav.home"]}]},
+            ]},
+        ]})
+        self.assertEqual(stats.expanded, 1)
+
+    def test_param_elements_and_multiple_roots(self):
+        html = (
+            '<Component name="Pair"><Component.Param name="label"></Component.Param>'
+            '<dt><Component.Param.label></Component.Param.label></dt><dd><Component.Children></Component.Children></dd>'
+            '</Component>'
+            '<View name="V"><dl><Pair label="Name">Rune</Pair></dl></View>'
+        )
+        result, _ = expand(html)
+        self.assertEqual(result[1]["body"][0]["body"], [
+            {"type": "dt", "body": ["Name"]},
+            {"type": "dd", "body": ["Rune"]},
+        ])
+
+    def test_identical_usages_are_memoized(self):
+        html = NAV_ITEM + '<View name="V"><NavItem href="/a">one</NavItem><NavItem href="/a">two</NavItem></View>'
+        result, stats = expand(html)
+        first, second = result[1]["body"]
+        self.assertEqual(first["body"][0]["body"], ["one"])
+        self.assertEqual(second["body"][0]["body"], ["two"])
+        self.assertIs(first["body"][0]["href"], second["body"][0]["href"])
+        self.assertEqual((stats.expanded, stats.cached), (2, 1))
+
+    def test_nested_components(self):
+        html = NAV_ITEM + (
+            '<Component name="Menu"><Component.Param name="home"></Component.Param>'
+            '<ul><NavItem href="Component.Param.home">nav.home</NavItem><Component.Children></Component.Children></ul>'
+            '</Component>'
+            '<View name="V"><Menu home="/start"><li>extra</li></Menu></View>'
+        )
+        result, stats = expand(html)
+        self.assertEqual(result[2]["body"], [{"type": "ul", "body": [
+            {"type": "li", "body": [{"type": "a", "href": "/start", "body": ["nav.home"]}]},
+            {"type": "li", "body": ["extra"]},
+        ]}])
+        # The usage inside the Menu definition itself is not static
+        self.assertEqual(result[1]["body"][1]["body"][0]["type"], "NavItem")
+        self.assertEqual(stats.skipped, 0)
+
+    def test_non_static_usages_are_left_as_is(self):
+        html = NAV_ITEM + (
+            '<View name="V">'
+            '<NavItem href="/a" class="x">undeclared attribute</NavItem>'
+            '<NavItem>missing param</NavItem>'
+            '</View>'
+        )
+        items = html_to_data_structure(html)
+        expander = ComponentExpander(items)
+        result = expander.expand(items)
+        self.assertEqual(result[1], items[1])
+        self.assertEqual(expander.stats.skipped, 2)
+
+    def test_recursive_component_is_not_expanded_forever(self):
+        html = (
+            '<Component name="Loop"><div><Loop></Loop></div></Component>'
+            '<View name="V"><Loop></Loop></View>'
+        )
+        with patch.object(sys, "stderr", io.StringIO()) as stderr:
+            result, stats = expand(html)
+        self.assertEqual(result[1]["body"], [{"type": "div", "body": [{"type": "Loop"}]}])
+        self.assertIn("uses itself", stderr.getvalue())
+        self.assertEqual(stats.skipped, 1)
+
+    def test_asset_params_resolve_relative_to_the_usage(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "pages", "img"))
+            with open(os.path.join(tmpdir, "pages", "img", "logo.svg"), "wb") as f:
+                f.write(b"<svg/>")
+            html = (
+                '<Component name="Logo"><Component.Param name="file"></Component.Param>'
+                '<img src="Component.Param.file"/></Component>'
+                '<View name="V"><Logo file="img/logo.svg"></Logo></View>'
+            )
+            sources = [os.path.join(tmpdir, "common", "Logo.html"), os.path.join(tmpdir, "pages", "V.html")]
+            result, _ = expand(html, sources, AssetKeyMatcher(DEFAULT_ASSET_KEY_RULES), load_asset_data_url)
+        expected = "data:image/svg+xml;base64," + base64.b64encode(b"<svg/>").decode()
+        self.assertEqual(result[1]["body"], [{"type": "img", "src": expected}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from hyperify_rune import daemon as daemon_module
+from hyperify_rune.daemon import (
+    EXIT, NO_DAEMON_VARIABLE, REQUEST, STDOUT, BuildDaemon, code_fingerprint, recv_frame, run_in_daemon,
+    send_frame,
+)
+
+
+def rune(*args, cwd=None):
+    return subprocess.run(
+        [sys.executable, "-m", "hyperify_rune", *args],
+        cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60,
+    )
+
+
+@unittest.skipUnless(hasattr(os, "getuid"), "Unix domain sockets are required")
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.socket = os.path.join(self._tmp.name, "run", "daemon.sock")
+        self.src = os.path.join(self._tmp.name, "src")
+        os.makedirs(os.path.join(self.src, "translations"))
+        with open(os.path.join(self.src, "Home.html"), "w") as f:
+            f.write('<View name="Home"><h1>app.title</h1><img src="logo.svg"/></View>')
+        with open(os.path.join(self.src, "About.md"), "w") as f:
+            f.write("# About\n\nText\n")
+        with open(os.path.join(self.src, "logo.svg"), "w") as f:
+            f.write("<svg/>")
+        with open(os.path.join(self.src, "translations", "App.en.json"), "w") as f:
+            f.write('{"app.title": "Hello"}')
+
+        self.daemon = subprocess.Popen(
+            [sys.executable, "-m", "hyperify_rune", "daemon", "--socket", self.socket],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while not os.path.exists(self.socket):
+            self.assertIsNone(self.daemon.poll(), "daemon exited")
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            time.sleep(0.05)
+
+    def tearDown(self):
+        if self.daemon.poll() is None:
+            self.daemon.terminate()
+        self.daemon.wait(timeout=30)
+        self._tmp.cleanup()
+
+    def test_builds_match_in_process_builds(self):
+        expected = rune("--no-daemon", "src", "json", cwd=self._tmp.name)
+        self.assertEqual(expected.returncode, 0)
+        for _ in range(2):
+            result = rune("--daemon-socket", self.socket, "src", "json", cwd=self._tmp.name)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout, expected.stdout)
+
+        # Changed sources and assets are picked up
+        with open(os.path.join(self.src, "logo.svg"), "w") as f:
+            f.write('<svg width="1"/>')
+        with open(os.path.join(self.src, "About.md"), "w") as f:
+            f.write("# About us\n")
+        expected = rune("--no-daemon", "src", "yml", cwd=self._tmp.name)
+        result = rune("--daemon-socket", self.socket, "src", "yml", cwd=self._tmp.name)
+        self.assertEqual(result.stdout, expected.stdout)
+        self.assertIn(b"About us", result.stdout)
+
+    def test_errors_and_exit_status_are_forwarded(self):
+        result = rune("--daemon-socket", self.socket, "missing", "json", cwd=self._tmp.name)
+        self.assertEqual(result.returncode, 1)
+        self.assertIn(b"No .yml, .html, .md, or .tsx files found", result.stderr)
+        self.assertEqual(result.stdout, b"")
+
+    def test_environment_variable_keeps_cli_builds_in_process(self):
+        from hyperify_rune import __main__ as cli
+        with patch.object(daemon_module, "default_socket_path", return_value=self.socket), \
+                patch.object(cli, "process_files", return_value=None) as process_files, \
+                patch.object(sys, "argv", ["rune", "missing", "json"]):
+            # The running daemon takes the build, and fails it
+            with patch.dict(os.environ, {NO_DAEMON_VARIABLE: ""}), open(os.devnull, "w") as devnull:
+                saved, sys.stderr = sys.stderr, devnull
+                try:
+                    with self.assertRaises(SystemExit) as ctx:
+                        cli.main()
+                finally:
+                    sys.stderr = saved
+            self.assertEqual(ctx.exception.code, 1)
+            process_files.assert_not_called()
+
+            with patch.dict(os.environ, {NO_DAEMON_VARIABLE: "1"}):
+                cli.main()
+            process_files.assert_called_once()
+
+    def test_stop(self):
+        result = rune("daemon", "--stop", "--socket", self.socket)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(self.daemon.wait(timeout=30), 0)
+        self.assertFalse(os.path.exists(self.socket))
+
+        # Without a daemon the build runs in-process
+        result = rune("--daemon-socket", self.socket, "src", "json", cwd=self._tmp.name)
+        self.assertEqual(result.returncode, 0)
+        self.assertIn(b'"Hello"', result.stdout)
+        self.assertEqual(rune("daemon", "--stop", "--socket", self.socket).returncode, 1)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are required")
+class TestBuildDaemon(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.socket = os.path.join(self._tmp.name, "daemon.sock")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_socket_directory_must_be_private(self):
+        shared = os.path.join(self._tmp.name, "shared")
+        os.makedirs(shared)
+        os.chmod(shared, 0o755)
+        path = os.path.join(shared, "daemon.sock")
+        with self.assertRaises(RuntimeError):
+            BuildDaemon(path, lambda argv: None).serve()
+        self.assertFalse(os.path.exists(path))
+
+        # Clients do not connect to a socket in such a directory, and build in-process
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(path)
+            listener.listen(1)
+            # A connected client would wait for output forever
+            self.assertIsNone(run_in_daemon(["src", "json"], path))
+
+    def test_idle_client_is_dropped(self):
+        daemon = BuildDaemon(self.socket, lambda argv: None, client_timeout=0.1)
+        idle, conn = socket.socketpair()
+        with idle, conn:
+            start = time.monotonic()
+            self.assertTrue(daemon.handle(conn))
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_signal_fails_the_running_build_and_stops(self):
+        def build(argv):
+            print("[partial")
+            os.kill(os.getpid(), signal.SIGTERM)
+            time.sleep(10)
+
+        frames = []
+
+        def client():
+            while not os.path.exists(self.socket):
+                time.sleep(0.01)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.socket)
+                send_frame(sock, REQUEST, json.dumps({
+                    "argv": [], "cwd": os.getcwd(), "fingerprint": code_fingerprint(),
+                }).encode("utf-8"))
+                while not frames or frames[-1][0] != EXIT:
+                    frames.append(recv_frame(sock))
+
+        thread = threading.Thread(target=client)
+        thread.start()
+        daemon = BuildDaemon(self.socket, build)
+        with open(os.devnull, "w") as devnull:
+            saved, sys.stderr = sys.stderr, devnull
+            try:
+                daemon.serve()
+            finally:
+                sys.stderr = saved
+        thread.join(timeout=10)
+
+        self.assertEqual(frames[-1], (EXIT, b"1"))
+        self.assertIn((STDOUT, b"[partial\n"), frames)
+        self.assertFalse(os.path.exists(self.socket))
+
+    def test_output_waits_for_slow_readers_but_not_for_stopped_ones(self):
+        output = "x" * (4 * 1024 * 1024)
+        received = []
+        stalled = threading.Event()
+
+        def client(read):
+            while not os.path.exists(self.socket):
+                time.sleep(0.01)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(self.socket)
+                send_frame(sock, REQUEST, json.dumps({
+                    "argv": [], "cwd": os.getcwd(), "fingerprint": code_fingerprint(),
+                }).encode("utf-8"))
+                if not read:
+                    stalled.wait(30)
+                    return
+                # Read slower than the client timeout
+                time.sleep(0.5)
+                while not received or received[-1][0] != EXIT:
+                    received.append(recv_frame(sock))
+                    time.sleep(0.01)
+            stop = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            with stop:
+                stop.connect(self.socket)
+                send_frame(stop, REQUEST, json.dumps({"command": "stop"}).encode("utf-8"))
+                recv_frame(stop)
+
+        def serve(daemon):
+            with open(os.devnull, "w") as devnull:
+                saved, sys.stderr = sys.stderr, devnull
+                try:
+                    daemon.serve()
+                finally:
+                    sys.stderr = saved
+
+        thread = threading.Thread(target=client, args=(True,))
+        thread.start()
+        serve(BuildDaemon(self.socket, lambda argv: print(output), client_timeout=0.1))
+        thread.join(timeout=30)
+        self.assertEqual(received[-1], (EXIT, b"0"))
+        self.assertEqual(b"".join(payload for kind, payload in received if kind == STDOUT), output.encode() + b"\n")
+
+        # A client which never reads does not keep the daemon from stopping
+        thread = threading.Thread(target=client, args=(False,))
+        thread.start()
+        timer = threading.Timer(1, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        start = time.monotonic()
+        try:
+            serve(BuildDaemon(self.socket, lambda argv: print(output), client_timeout=0.1))
+        finally:
+            timer.cancel()
+            stalled.set()
+            thread.join(timeout=30)
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertFalse(os.path.exists(self.socket))
+
+
+if __name__ == '__main__':
+    unittest.main()
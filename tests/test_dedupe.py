@@ -0,0 +1,90 @@
+import copy
+import sys
+import unittest
+
+from hyperify_rune.dedupe import HashConsTable, to_shared_output
+
+
+def button(label):
+    return {"type": "button", "classes": ["btn", "btn-primary"], "body": [{"type": "span", "body": [label]}]}
+
+
+def resolve_refs(output):
+    """Expand ref nodes using the shared table, as a client would."""
+    table = []
+    if output and output[0].get("type") == "shared":
+        table = output[0]["data"]
+        output = output[1:]
+
+    def expand(value):
+        if isinstance(value, dict):
+            if value.get("type") == "ref":
+                return expand(table[value["index"]])
+            return {key: expand(child) for key, child in value.items()}
+        if isinstance(value, list):
+            return [expand(child) for child in value]
+        return value
+
+    return [expand(item) for item in output]
+
+
+class TestHashConsTable(unittest.TestCase):
+    def test_identical_subtrees_share_one_object(self):
+        data = [{"type": "View", "body": [button("ok"), button("ok"), button("cancel")]}]
+        table = HashConsTable()
+        result = table.intern(data)
+        body = result[0]["body"]
+        self.assertIs(body[0], body[1])
+        self.assertIsNot(body[0], body[2])
+        self.assertIs(body[0]["classes"], body[2]["classes"])
+        self.assertEqual(result, [{"type": "View", "body": [button("ok"), button("ok"), button("cancel")]}])
+        self.assertGreater(table.stats.ratio, 1.0)
+
+    def test_values_of_different_types_stay_distinct(self):
+        data = [{"a": 1}, {"a": True}, {"a": 1.0}, {"a": "1"}]
+        result = HashConsTable().intern(data)
+        self.assertEqual([type(item["a"]) for item in result], [int, bool, float, str])
+        self.assertEqual(len({id(item) for item in result}), 4)
+
+    def test_deep_trees_do_not_recurse(self):
+        node = {"type": "leaf"}
+        for _ in range(sys.getrecursionlimit() * 3):
+            node = {"type": "div", "body": [node]}
+        HashConsTable().intern([node])
+
+
+class TestSharedOutput(unittest.TestCase):
+    def test_repeated_subtrees_are_emitted_once(self):
+        data = [
+            {"type": "View", "name": "A", "body": [button("ok"), button("ok")]},
+            {"type": "View", "name": "B", "body": [button("ok"), {"type": "br"}, {"type": "br"}]},
+        ]
+        original = copy.deepcopy(data)
+        table = HashConsTable()
+        output = to_shared_output(table.intern(data), table.stats)
+
+        self.assertEqual(output[0], {"type": "shared", "data": [button("ok")]})
+        self.assertEqual(output[1]["body"], [{"type": "ref", "index": 0}, {"type": "ref", "index": 0}])
+        # Too small to be worth a reference
+        self.assertEqual(output[2]["body"][1:], [{"type": "br"}, {"type": "br"}])
+        self.assertEqual(table.stats.shared_subtrees, 1)
+        self.assertEqual(resolve_refs(output), original)
+
+    def test_nested_shared_subtrees_reference_each_other(self):
+        card = {"type": "div", "body": [button("ok"), button("ok"), {"type": "p", "body": ["x"]}]}
+        data = [{"type": "View", "body": [copy.deepcopy(card), copy.deepcopy(card)]}]
+        original = copy.deepcopy(data)
+        output = to_shared_output(HashConsTable().intern(data))
+        shared = output[0]["data"]
+        self.assertEqual(len(shared), 2)
+        self.assertEqual(shared[1]["body"][0], {"type": "ref", "index": 0})
+        self.assertEqual(resolve_refs(output), original)
+
+    def test_without_duplicates_output_is_unchanged(self):
+        data = [{"type": "View", "body": [button("a"), button("b")]}]
+        output = to_shared_output(HashConsTable().intern(copy.deepcopy(data)))
+        self.assertEqual(output, data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from bs4 import BeautifulSoup
+
+from hyperify_rune import (
+    embed_images,
+    html_to_data_structure,
+    parse_html_element,
+    parse_tsx_to_html,
+    transform_tsx_node,
+)
+
+
+# Comfortably beyond the default recursion limit
+DEPTH = sys.getrecursionlimit() * 5
+
+
+def _deep_jsx(depth):
+    def identifier(name):
+        return SimpleNamespace(type="JSXIdentifier", name=name)
+
+    node = SimpleNamespace(type="JSXText", value="leaf")
+    for _ in range(depth):
+        node = SimpleNamespace(
+            type="JSXElement",
+            openingElement=SimpleNamespace(type="JSXOpeningElement", name=identifier("b"), attributes=[]),
+            children=[node],
+            closingElement=SimpleNamespace(type="JSXClosingElement", name=identifier("b")),
+        )
+    return node
+
+
+class TestDeepTrees(unittest.TestCase):
+    def test_parse_html_element_handles_deep_documents(self):
+        html = "<div>" * DEPTH + "leaf" + "</div>" * DEPTH
+        result = html_to_data_structure(html)
+        depth = 0
+        node = result[0]
+        while isinstance(node, dict):
+            node = node["body"][0]
+            depth += 1
+        self.assertEqual(depth, DEPTH)
+        self.assertEqual(node, "leaf")
+
+    def test_parse_html_element_preserves_structure(self):
+        html = '<View name="v"><div class="a b">text <b onClick=\'{"x": 1}\'>bold</b> tail</div><p/></View>'
+        self.assertEqual(html_to_data_structure(html), [{
+            "type": "View",
+            "name": "v",
+            "body": [
+                {
+                    "type": "div",
+                    "classes": ["a", "b"],
+                    "body": ["text", {"type": "b", "onClick": {"x": 1}, "body": ["bold"]}, "tail"],
+                },
+                {"type": "p"},
+            ],
+        }])
+
+    def test_parse_html_element_error_names_only_the_failing_element(self):
+        html = "<root>" + "<div>" * 100 + "<p class='[broken]'>x</p>" + "</div>" * 100 + "</root>"
+        soup = BeautifulSoup(html, "lxml-xml")
+        with self.assertRaises(ValueError) as ctx:
+            parse_html_element(soup.root.div)
+        message = str(ctx.exception)
+        self.assertIn('<p class="[broken]">', message)
+        self.assertNotIn("<div>", message)
+
+    def test_embed_images_handles_deep_data(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "logo.png"), "wb") as f:
+                f.write(b"png")
+            leaf = {"type": "img", "src": "logo.png"}
+            node = leaf
+            for _ in range(DEPTH):
+                node = {"type": "div", "body": [node]}
+            embed_images([node], tmpdir, "view.yml")
+        self.assertEqual(leaf["src"], "data:image/png;base64,cG5n")
+
+    def test_transform_tsx_node_handles_deep_ast(self):
+        html = transform_tsx_node(_deep_jsx(DEPTH))
+        self.assertEqual(html, "<b >" * DEPTH + "leaf" + "</b>" * DEPTH)
+
+    def test_parse_tsx_to_html(self):
+        code = 'import x from "y";\n<div title="t" {...p}>hi {a + b} {f(1)}</div>;'
+        self.assertEqual(
+            parse_tsx_to_html(code),
+            "<!-- Import: y -->"
+            "<div title=t <!-- Spread attributes are not supported: {...props} -->>"
+            "hi<!-- JSX Expression: (a + b) --><!-- JSX Expression: <!-- Function call: f(1) --> --></div>",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import io
+import sys
+import unittest
+
+from hyperify_rune import html_to_data_structure
+from hyperify_rune.nodes import Node, node_to_dict, to_plain
+from hyperify_rune.output import write_output
+
+
+HTML = (
+    '<div class="card card-primary" id="a"><h2>Title</h2><p>Text</p></div>'
+    '<div class="card" onClick=\'{"action": "open"}\'><p>More</p></div>'
+)
+
+
+class TestCompactNodes(unittest.TestCase):
+    def test_compact_parse_matches_dict_parse(self):
+        plain = html_to_data_structure(HTML)
+        compact = html_to_data_structure(HTML, compact=True)
+        self.assertIsInstance(compact[0], Node)
+        self.assertIsInstance(compact[0].body[0], Node)
+        self.assertEqual(to_plain(compact), plain)
+
+    def test_names_are_interned(self):
+        first, second = html_to_data_structure(HTML, compact=True)
+        self.assertIs(first.type, second.type)
+        self.assertIs(first.type, sys.intern("div"))
+        self.assertIs(first.attrs[0], second.attrs[0])
+        self.assertIs(first.attrs[1][0], second.attrs[1][0])
+
+    def test_equal_class_lists_are_shared(self):
+        nodes = html_to_data_structure('<p class="a b">1</p><p class="a b">2</p>', compact=True)
+        self.assertIs(nodes[0].attrs[1], nodes[1].attrs[1])
+        self.assertEqual(node_to_dict(nodes[0])["classes"], ["a", "b"])
+
+    def test_node_to_dict_keeps_attribute_order(self):
+        node = Node("a", ("href", "/x", "classes", ("link",)), ("Go",))
+        self.assertEqual(node_to_dict(node), {"type": "a", "href": "/x", "classes": ["link"], "body": ["Go"]})
+        self.assertEqual(list(node_to_dict(node)), ["type", "href", "classes", "body"])
+        self.assertEqual(node_to_dict(Node("br")), {"type": "br"})
+
+    def test_to_plain_handles_deep_trees(self):
+        node = Node("span", (), ("leaf",))
+        for _ in range(5000):
+            node = Node("div", (), (node,))
+        plain = to_plain([node])
+        depth = 0
+        value = plain[0]
+        while value["type"] == "div":
+            value = value["body"][0]
+            depth += 1
+        self.assertEqual(depth, 5000)
+        self.assertEqual(value, {"type": "span", "body": ["leaf"]})
+
+    def test_output_writers_accept_nodes(self):
+        plain = html_to_data_structure(HTML)
+        compact = html_to_data_structure(HTML, compact=True)
+        for output_type in ("json", "yml"):
+            expected = io.StringIO()
+            actual = io.StringIO()
+            write_output(plain, output_type, expected)
+            write_output(compact, output_type, actual)
+            self.assertEqual(actual.getvalue(), expected.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
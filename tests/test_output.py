@@ -0,0 +1,89 @@
+import base64
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import yaml
+
+from hyperify_rune import embed_images
+from hyperify_rune.assets import DeferredAsset, stream_data_url
+from hyperify_rune.config import config as rune_config
+from hyperify_rune.output import write_output
+from hyperify_rune.yaml_loader import dump_yaml
+
+
+DATA = [
+    {"type": "View", "name": "Hello", "body": [{"type": "h1", "body": ["app.title"]}]},
+    {"type": "i18n", "data": {"en": {"app.title": "Hello, World!"}}},
+]
+
+
+class TestWriteOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.content = os.urandom(10_000)
+        self.path = os.path.join(self.tmpdir.name, "file.zip")
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+        self.data_url = "data:image/zip;base64," + base64.b64encode(self.content).decode("ascii")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, data, output_type):
+        stream = io.StringIO()
+        write_output(data, output_type, stream)
+        return stream.getvalue()
+
+    def test_json_matches_json_dumps(self):
+        self.assertEqual(self._write(DATA, "json"), json.dumps(DATA, indent=2) + "\n")
+
+    def test_yaml_matches_dump_yaml(self):
+        self.assertEqual(self._write(DATA, "yml"), dump_yaml(DATA) + "\n")
+
+    def test_unsupported_output_type_raises(self):
+        with self.assertRaises(ValueError):
+            self._write(DATA, "xml")
+
+    def test_deferred_assets_are_streamed_into_json(self):
+        asset = DeferredAsset(self.path, "image/zip")
+        data = [{"type": "Download", "image": asset, "body": [asset, "text"]}]
+        expected = [{"type": "Download", "image": self.data_url, "body": [self.data_url, "text"]}]
+        self.assertEqual(self._write(data, "json"), json.dumps(expected, indent=2) + "\n")
+
+    def test_deferred_assets_are_streamed_into_yaml(self):
+        data = [{"type": "Download", "image": DeferredAsset(self.path, "image/zip")}]
+        self.assertEqual(
+            yaml.safe_load(self._write(data, "yml")),
+            [{"type": "Download", "image": self.data_url}],
+        )
+
+    def test_stream_data_url_chunks_concatenate_to_the_full_url(self):
+        parts = []
+        stream_data_url(DeferredAsset(self.path, "image/zip"), parts.append, chunk_size=3 * 7)
+        self.assertGreater(len(parts), 2)
+        self.assertEqual("".join(parts), self.data_url)
+
+    def test_stream_data_url_handles_empty_files(self):
+        path = os.path.join(self.tmpdir.name, "empty.bin")
+        open(path, "wb").close()
+        parts = []
+        stream_data_url(DeferredAsset(path, "image/bin"), parts.append)
+        self.assertEqual("".join(parts), "data:image/bin;base64,")
+
+    def test_stream_data_url_rejects_chunks_that_need_padding(self):
+        with self.assertRaises(ValueError):
+            stream_data_url(DeferredAsset(self.path, "image/zip"), [].append, chunk_size=1000)
+
+    def test_embed_images_defers_assets_when_enabled(self):
+        data = [{"type": "Download", "image": "file.zip"}]
+        with patch.object(rune_config, "deferAssets", True):
+            embed_images(data, self.tmpdir.name, "view.yml")
+        self.assertEqual(data[0]["image"], DeferredAsset(self.path, "application/zip"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from hyperify_rune import process_files
+from hyperify_rune.asset_rules import compile_asset_key_rules, DEFAULT_ASSET_KEY_RULES
+from hyperify_rune.config import config as rune_config
+from hyperify_rune.output import ListWriter, write_output
+from hyperify_rune.pipeline import (
+    BackgroundWriter,
+    Prefetcher,
+    read_asset_bytes,
+    scan_asset_references,
+    using_prefetched_assets,
+)
+
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.paths = []
+        for index in range(20):
+            path = os.path.join(self._tmp.name, f"View{index}.html")
+            with open(path, "w") as f:
+                f.write(f'<View name="View{index}"><img src="logo.png"/></View>')
+            self.paths.append(path)
+        with open(os.path.join(self._tmp.name, "logo.png"), "wb") as f:
+            f.write(b"PNG")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_yields_files_in_order_with_assets(self):
+        matcher = compile_asset_key_rules(tuple(DEFAULT_ASSET_KEY_RULES))
+        for workers in (0, 4):
+            prefetched = list(Prefetcher(self.paths, matcher, workers=workers, window=3))
+            self.assertEqual([item.path for item in prefetched], self.paths)
+            self.assertEqual(prefetched[5].content, b'<View name="View5"><img src="logo.png"/></View>')
+            self.assertEqual(prefetched[5].assets, {os.path.join(self._tmp.name, "logo.png"): b"PNG"})
+
+    def test_reads_at_most_window_files_ahead(self):
+        read = []
+        lock = threading.Lock()
+
+        def read_file(path):
+            with lock:
+                read.append(path)
+            with open(path, "rb") as f:
+                return f.read()
+
+        with patch("hyperify_rune.pipeline._read_file", read_file):
+            prefetcher = iter(Prefetcher(self.paths, workers=4, window=3))
+            next(prefetcher)
+            # The window is refilled before the first file is handed out
+            self.assertLessEqual(len(read), 4)
+            prefetcher.close()
+
+    def test_holds_at_most_max_bytes_ahead(self):
+        matcher = compile_asset_key_rules(tuple(DEFAULT_ASSET_KEY_RULES))
+        file_size = os.path.getsize(self.paths[0])
+        max_bytes = 3 * file_size
+        read = []
+        lock = threading.Lock()
+
+        def read_file(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            with lock:
+                read.append(len(data))
+            return data
+
+        with patch("hyperify_rune.pipeline._read_file", read_file):
+            prefetcher = iter(Prefetcher(self.paths, matcher, workers=4, window=10, max_bytes=max_bytes))
+            first = next(prefetcher)
+            self.assertLessEqual(sum(read), max_bytes)
+            rest = list(prefetcher)
+        # Files which did not fit are left to the parser
+        self.assertEqual([item.path for item in [first] + rest], self.paths)
+        for item in [first] + rest:
+            if item.content is not None:
+                with open(item.path, "rb") as f:
+                    self.assertEqual(item.content, f.read())
+
+    def test_unreadable_files_are_left_to_the_parser(self):
+        missing = os.path.join(self._tmp.name, "missing.html")
+        prefetched = list(Prefetcher([missing], workers=2))
+        self.assertIsNone(prefetched[0].content)
+
+    def test_scan_asset_references(self):
+        matcher = compile_asset_key_rules(tuple(DEFAULT_ASSET_KEY_RULES))
+        base = self._tmp.name
+        html = b'<img src="a.png" alt="x.png"/><img src="Component.Param.logo"/><img src="data:image/png;base64,AA"/>'
+        self.assertEqual(scan_asset_references(os.path.join(base, "a.html"), html, matcher), [os.path.join(base, "a.png")])
+        yml = b"- type: img\n  src: 'b.svg'\n  alt: c.svg\n"
+        self.assertEqual(scan_asset_references(os.path.join(base, "a.yml"), yml, matcher), [os.path.join(base, "b.svg")])
+        md = b"# Title\n\n![Logo](d.png)\n"
+        self.assertEqual(scan_asset_references(os.path.join(base, "a.md"), md, matcher), [os.path.join(base, "d.png")])
+
+    def test_read_asset_bytes_prefers_prefetched_content(self):
+        path = os.path.join(self._tmp.name, "logo.png")
+        with using_prefetched_assets({path: b"prefetched"}):
+            self.assertEqual(read_asset_bytes(path), b"prefetched")
+        self.assertEqual(read_asset_bytes(path), b"PNG")
+
+
+class TestBackgroundWriter(unittest.TestCase):
+    def test_writes_items_in_order(self):
+        written = []
+        writer = BackgroundWriter(written.append, max_queued=2)
+        for item in range(100):
+            writer.put(item)
+        writer.close()
+        self.assertEqual(written, list(range(100)))
+
+    def test_writer_errors_are_raised(self):
+        def write(item):
+            raise OSError("disk full")
+
+        writer = BackgroundWriter(write, max_queued=1)
+        with self.assertRaises(OSError):
+            for item in range(100):
+                writer.put(item)
+            writer.close()
+
+
+class TestListWriter(unittest.TestCase):
+    def test_matches_write_output(self):
+        cases = [
+            [],
+            [{"type": "View", "body": [{"type": "p", "body": ["a\nb"]}], "classes": []}],
+            [1, "text", None, {}, [], {"type": "i18n", "data": {"en": {"a": "b"}}}],
+        ]
+        for output_type in ("json", "yml"):
+            for data in cases:
+                expected = io.StringIO()
+                write_output(data, output_type, expected)
+                stream = io.StringIO()
+                writer = ListWriter(output_type, stream)
+                for item in data:
+                    writer.write(item)
+                writer.close()
+                self.assertEqual(stream.getvalue(), expected.getvalue())
+
+    def test_encoded_items_match_written_items(self):
+        data = [{"type": "View", "body": ["a"]}, {"type": "p"}, "text", {"type": "i18n", "data": {}}]
+        for output_type in ("json", "yml"):
+            expected = io.StringIO()
+            write_output(data, output_type, expected)
+            stream = io.StringIO()
+            writer = ListWriter(output_type, stream)
+            writer.write_encoded(writer.encode(data[:2]))
+            writer.write_encoded(writer.encode([]))
+            writer.write(data[2])
+            writer.write_encoded(writer.encode(data[3:]))
+            writer.close()
+            self.assertEqual(stream.getvalue(), expected.getvalue())
+
+
+class TestPipelinedBuild(unittest.TestCase):
+    def setUp(self):
+        self._saved = rune_config.ioWorkers
+
+    def tearDown(self):
+        rune_config.ioWorkers = self._saved
+
+    def build(self, src):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout), patch.object(sys, "stderr", io.StringIO()):
+            process_files(src, "json", os.path.join(src, "translations"))
+        return stdout.getvalue()
+
+    def test_output_does_not_depend_on_workers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "logo.svg"), "w") as f:
+                f.write("<svg/>")
+            with open(os.path.join(tmpdir, "Data.yml"), "w") as f:
+                f.write("- type: Image\n  src: logo.svg\n")
+            for index in range(10):
+                with open(os.path.join(tmpdir, f"View{index}.html"), "w") as f:
+                    f.write(f'<View name="View{index}"><img src="logo.svg"/><p>view{index}.text</p></View>')
+            with open(os.path.join(tmpdir, "About.md"), "w") as f:
+                f.write("# About\n\n![Logo](logo.svg)\n")
+
+            rune_config.ioWorkers = 0
+            sequential = self.build(tmpdir)
+            rune_config.ioWorkers = 4
+            self.assertEqual(self.build(tmpdir), sequential)
+            self.assertIn("data:image/svg+xml;base64,", sequential)
+
+    def test_failed_build_writes_nothing(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "Data.yml"), "w") as f:
+                f.write("- type: p\n  body: [text]\n")
+            for index in range(10):
+                with open(os.path.join(tmpdir, f"View{index}.html"), "w") as f:
+                    f.write(f'<View name="View{index}"><p>view{index}.text</p></View>')
+            with open(os.path.join(tmpdir, "View9.html"), "w") as f:
+                f.write('<View name="View9"><img src="missing.png"/></View>')
+
+            for workers in (0, 4):
+                rune_config.ioWorkers = workers
+                stdout = io.StringIO()
+                with self.assertRaises(SystemExit):
+                    with redirect_stdout(stdout), patch.object(sys, "stderr", io.StringIO()):
+                        process_files(tmpdir, "json", os.path.join(tmpdir, "translations"))
+                self.assertEqual(stdout.getvalue(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
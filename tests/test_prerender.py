@@ -0,0 +1,117 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from hyperify_rune import process_files
+from hyperify_rune.config import config as rune_config
+from hyperify_rune.nodes import Node, to_plain
+from hyperify_rune.prerender import TranslationLookup, prerender, report_missing_translations
+
+
+TRANSLATIONS = {
+    "en": {"app.title": "Hello", "app.more": "More", "app.only_en": "English only"},
+    "fi": {"app.title": "Hei", "app.more": "Lisää"},
+}
+
+
+class TestPrerender(unittest.TestCase):
+    def test_replaces_keys_in_body_and_attributes(self):
+        data = [{"type": "View", "name": "Home", "body": [
+            {"type": "h1", "body": ["app.title"]},
+            {"type": "a", "title": "app.more", "href": "/more", "body": ["app.only_en"]},
+        ]}]
+        lookup = TranslationLookup(TRANSLATIONS, "fi")
+        result = prerender(data, lookup)
+        self.assertEqual(result[0]["body"][0]["body"], ["Hei"])
+        self.assertEqual(result[0]["body"][1]["title"], "Lisää")
+        self.assertEqual(result[0]["body"][1]["href"], "/more")
+        # Missing keys are kept and reported, not replaced with a placeholder
+        self.assertEqual(result[0]["body"][1]["body"], ["app.only_en"])
+        self.assertEqual(lookup.missing, {"app.only_en": 1})
+
+        stream = io.StringIO()
+        report_missing_translations(lookup, stream)
+        self.assertIn("'app.only_en' in language 'fi'", stream.getvalue())
+
+    def test_input_is_not_modified_and_unchanged_subtrees_are_shared(self):
+        static = {"type": "footer", "body": ["(c) 2025"]}
+        data = [{"type": "View", "body": [{"type": "h1", "body": ["app.title"]}, static]}]
+        result = prerender(data, TranslationLookup(TRANSLATIONS, "en"))
+        self.assertEqual(data[0]["body"][0]["body"], ["app.title"])
+        self.assertEqual(result[0]["body"][0]["body"], ["Hello"])
+        self.assertIs(result[0]["body"][1], static)
+
+    def test_type_is_never_translated(self):
+        data = [{"type": "app.title", "body": ["app.title"]}]
+        result = prerender(data, TranslationLookup(TRANSLATIONS, "en"))
+        self.assertEqual(result, [{"type": "app.title", "body": ["Hello"]}])
+
+    def test_identifiers_are_not_translated(self):
+        data = [{"type": "View", "name": "app.title", "body": [
+            {"type": "input", "id": "app.more", "classes": ["app.title"], "placeholder": "app.more"},
+        ]}]
+        result = prerender(data, TranslationLookup(TRANSLATIONS, "fi"))
+        self.assertEqual(result, [{"type": "View", "name": "app.title", "body": [
+            {"type": "input", "id": "app.more", "classes": ["app.title"], "placeholder": "Lisää"},
+        ]}])
+        node = Node("input", ("name", "app.title", "aria-label", "app.title"))
+        result = prerender([node], TranslationLookup(TRANSLATIONS, "fi"))
+        self.assertEqual(result[0].attrs, ("name", "app.title", "aria-label", "Hei"))
+
+    def test_compact_nodes(self):
+        node = Node("a", ("title", "app.more", "classes", ("btn",)), (Node("span", (), ("app.title",)),))
+        result = prerender([node], TranslationLookup(TRANSLATIONS, "fi"))
+        self.assertEqual(to_plain(result), [{
+            "type": "a", "title": "Lisää", "classes": ["btn"],
+            "body": [{"type": "span", "body": ["Hei"]}],
+        }])
+
+    def test_deep_tree(self):
+        node = {"type": "span", "body": ["app.title"]}
+        for _ in range(5000):
+            node = {"type": "div", "body": [node]}
+        result = prerender([node], TranslationLookup(TRANSLATIONS, "fi"))
+        for _ in range(5000):
+            result = result[0]["body"]
+        self.assertEqual(result, [{"type": "span", "body": ["Hei"]}])
+
+    def test_unknown_language(self):
+        with self.assertRaises(ValueError):
+            TranslationLookup(TRANSLATIONS, "sv")
+
+
+class TestPrerenderedBundles(unittest.TestCase):
+    def setUp(self):
+        self._saved = (rune_config.prerenderLanguages, rune_config.prerenderOutput)
+
+    def tearDown(self):
+        rune_config.prerenderLanguages, rune_config.prerenderOutput = self._saved
+
+    def test_writes_one_bundle_per_language(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            src = os.path.join(tmpdir, "src")
+            os.makedirs(os.path.join(src, "translations"))
+            with open(os.path.join(src, "Home.html"), "w") as f:
+                f.write('<View name="Home"><h1>app.title</h1></View>')
+            for lang, table in TRANSLATIONS.items():
+                with open(os.path.join(src, "translations", f"App.{lang}.json"), "w") as f:
+                    json.dump(table, f)
+
+            rune_config.prerenderLanguages = ["fi", "en"]
+            rune_config.prerenderOutput = os.path.join(tmpdir, "out.{lang}.{ext}")
+            with patch.object(sys, "stderr", io.StringIO()):
+                process_files(src, "json", os.path.join(src, "translations"))
+
+            for lang, title in (("fi", "Hei"), ("en", "Hello")):
+                with open(os.path.join(tmpdir, f"out.{lang}.json")) as f:
+                    bundle = json.load(f)
+                self.assertEqual(bundle[0]["body"][0]["body"], [title])
+                self.assertEqual(bundle[-1], {"type": "i18n", "data": {lang: TRANSLATIONS[lang]}})
+
+
+if __name__ == '__main__':
+    unittest.main()
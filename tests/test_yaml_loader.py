@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from hyperify_rune import yaml_loader
+from hyperify_rune import parse_yaml_file
+from hyperify_rune.yaml_loader import dump_yaml, load_yaml_file
+
+
+YAML = """
+- type: View
+  name: Hello
+  body:
+  - type: h1
+    body:
+    - app.title
+"""
+
+EXPECTED = [{"type": "View", "name": "Hello", "body": [{"type": "h1", "body": ["app.title"]}]}]
+
+
+class TestYamlLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "view.yml")
+        self._write(YAML)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write(self, content):
+        with open(self.path, "w") as f:
+            f.write(content)
+
+    def test_prefers_libyaml_when_available(self):
+        if getattr(yaml, "__with_libyaml__", False):
+            self.assertIs(yaml_loader.SafeLoader, yaml.CSafeLoader)
+            self.assertIs(yaml_loader.SafeDumper, yaml.CSafeDumper)
+        else:
+            self.assertIs(yaml_loader.SafeLoader, yaml.SafeLoader)
+
+    def test_loads_file(self):
+        self.assertEqual(load_yaml_file(self.path), EXPECTED)
+
+    def test_syntax_errors_name_the_file(self):
+        self._write("- type: View\n  body: [\n")
+        for load in (lambda: load_yaml_file(self.path),
+                     lambda: parse_yaml_file(self.path, content=b"- type: View\n  body: [\n")):
+            with self.assertRaises(yaml.YAMLError) as ctx:
+                load()
+            self.assertIn(f'in "{self.path}", line 3', str(ctx.exception))
+            self.assertNotIn("<byte string>", str(ctx.exception))
+
+    def test_dump_yaml_round_trips(self):
+        self.assertEqual(yaml.safe_load(dump_yaml(EXPECTED)), EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()